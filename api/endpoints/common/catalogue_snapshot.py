@@ -0,0 +1,140 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+On-disk snapshot of the project catalogue (see common.project_catalogue).
+
+File layout (little-endian):
+    header:  magic (4 bytes), format version (uint16), demo (bool), catalogue_modified (int64), catalogue_count (int64),
+             number of projects (uint32)
+    index:   one (offset (uint64), length (uint32)) entry per project, offsets relative to the start of the file
+    records: one UTF-8 JSON document per project, as returned by the catalogue SQL query
+
+The file is memory-mapped, so the header can be checked and individual projects decoded without reading the rest of the
+file, and processes on the same host share the same pages. Snapshots are written to a temporary file and renamed into
+place, so readers never see a partially written snapshot.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import thiscovery_lib.utilities as utils
+
+
+MAGIC = b'TCAT'
+FORMAT_VERSION = 2  # 2: catalogue version also covers external systems, task types and user groups
+HEADER = struct.Struct('<4sH?qqI')
+INDEX_ENTRY = struct.Struct('<QI')
+
+SNAPSHOT_DIR = os.environ.get('CATALOGUE_SNAPSHOT_DIR', tempfile.gettempdir())
+
+
+def snapshot_path(demo):
+    if demo:
+        return os.path.join(SNAPSHOT_DIR, 'project_catalogue_demo.bin')
+    return os.path.join(SNAPSHOT_DIR, 'project_catalogue.bin')
+
+
+def write_snapshot(project_list, demo, version):
+    """
+    Args:
+        project_list (list): output of the catalogue SQL query
+        demo (bool):
+        version (tuple): (catalogue_modified, catalogue_count) the project_list was read at
+
+    Returns:
+        Path of the snapshot file
+    """
+    records = [json.dumps(p).encode() for p in project_list]
+    offset = HEADER.size + INDEX_ENTRY.size * len(records)
+    index = list()
+    for r in records:
+        index.append(INDEX_ENTRY.pack(offset, len(r)))
+        offset += len(r)
+
+    path = snapshot_path(demo)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.project_catalogue')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, bool(demo), version[0], version[1], len(records)))
+            f.writelines(index)
+            f.writelines(records)
+        os.replace(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return path
+
+
+class CatalogueSnapshot:
+    """
+    Read-only view of a snapshot file; behaves as a sequence of project dictionaries, each decoded on access
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, format_version, demo, catalogue_modified, catalogue_count, length = HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            magic = None
+        if (magic != MAGIC) or (format_version != FORMAT_VERSION) or (len(self._mm) < HEADER.size + INDEX_ENTRY.size * length):
+            self.close()
+            raise ValueError(f'{path} is not a valid catalogue snapshot')
+        self.demo = demo
+        self.version = (catalogue_modified, catalogue_count)
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._length:
+            raise IndexError('catalogue snapshot index out of range')
+        offset, length = INDEX_ENTRY.unpack_from(self._mm, HEADER.size + INDEX_ENTRY.size * i)
+        return json.loads(self._mm[offset:offset + length])
+
+    def close(self):
+        self._mm.close()
+
+
+def read_snapshot(demo, version):
+    """
+    Returns:
+        CatalogueSnapshot for demo if a snapshot of version exists, otherwise None
+    """
+    try:
+        snapshot = CatalogueSnapshot(snapshot_path(demo))
+    except (OSError, ValueError):
+        return None
+    if (snapshot.demo != bool(demo)) or (snapshot.version != tuple(version)):
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def save_snapshot(project_list, demo, version, correlation_id=None):
+    """
+    Writes a snapshot, logging rather than raising errors, as the snapshot is only an optimisation
+    """
+    logger = utils.get_logger()
+    try:
+        write_snapshot(project_list, demo, version)
+    except OSError as err:
+        logger.warning('Could not write catalogue snapshot', extra={'error': repr(err), 'correlation_id': correlation_id})
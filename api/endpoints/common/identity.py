@@ -0,0 +1,163 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+Resolves the ids that identify users to the outside world (user ids, anon_project_specific_user_ids and anon_user_task_ids)
+to the user, user project and user task they belong to.
+
+Anon ids are looked up in the anon_id_map table (api/local/database-view-sql/anon_id_map_create.sql), which has a row
+per anon id and is kept current by database triggers on user project and user task creation. An id identifies the same
+records for as long as they exist, so resolved ids are kept in a bounded per-process LRU cache; ids that do not resolve are
+not cached, as the records they identify may be created later.
+
+Jobs that delete users (e.g. local/admin_tasks/general_admin/erase_users.py) call invalidate, which records a new generation
+in the shared cache (common.shared_cache). Each process compares its generation with the shared one at most once every
+GENERATION_CHECK_INTERVAL seconds and discards all its cached ids when they differ, so the ids of deleted users stop
+resolving within that interval in every Lambda container. If the shared generation cannot be read, ids are not cached.
+"""
+import collections
+import time
+
+import common.shared_cache as shared_cache
+import common.sql_queries as sql_q
+import thiscovery_lib.utilities as utils
+from common.pg_utilities import execute_query
+
+
+USER = 'user'
+USER_PROJECT = 'user_project'
+USER_TASK = 'user_task'
+ANON_KINDS = (USER_PROJECT, USER_TASK)
+
+MAX_CACHED_IDS = 4096
+GENERATION_CHECK_INTERVAL = 30  # seconds
+GENERATION_CACHE_NAME = 'identity_generation'
+GENERATION_TTL = 7 * 24 * 60 * 60  # seconds
+
+Identity = collections.namedtuple('Identity', ['kind', 'user_id', 'user_project_id', 'user_task_id'])
+
+_cache = collections.OrderedDict()
+_generation = {'value': None, 'checked_at': None}
+
+
+def _cache_get(id_):
+    try:
+        identity = _cache[id_]
+    except KeyError:
+        return None
+    _cache.move_to_end(id_)
+    return identity
+
+
+def _cache_put(id_, identity):
+    _cache[id_] = identity
+    _cache.move_to_end(id_)
+    while len(_cache) > MAX_CACHED_IDS:
+        _cache.popitem(last=False)
+
+
+def forget(ids):
+    """
+    Removes ids from the cache (e.g. after the records they identify are deleted)
+    """
+    for id_ in ids:
+        _cache.pop(str(id_), None)
+
+
+def clear_cache():
+    _cache.clear()
+    _generation['checked_at'] = None
+
+
+def _check_generation(correlation_id):
+    """
+    Returns:
+        True if cached ids can be used. False if the shared generation could not be read: deletions cannot be ruled out, so
+        the cache is cleared and ids are not cached until a read succeeds
+    """
+    now = time.monotonic()
+    if (_generation['checked_at'] is not None) and (now - _generation['checked_at'] < GENERATION_CHECK_INTERVAL):
+        return True
+    try:
+        generation = shared_cache.get(GENERATION_CACHE_NAME, 'all', correlation_id, use_l1=False, raise_errors=True)
+    except Exception:
+        _cache.clear()
+        _generation['checked_at'] = None
+        return False
+    _generation['checked_at'] = now
+    if generation != _generation['value']:
+        _cache.clear()
+        _generation['value'] = generation
+    return True
+
+
+def invalidate(ids=(), correlation_id=None):
+    """
+    Call after deleting users (or their user projects or user tasks)
+
+    Args:
+        ids: ids of the deleted records; they are removed immediately from this process's cache. Cached ids in other
+                processes are discarded whether or not ids are given
+        correlation_id:
+    """
+    forget(ids)
+    shared_cache.put(GENERATION_CACHE_NAME, 'all', time.time(), correlation_id, ttl=GENERATION_TTL)
+
+
+def _resolve(id_, kinds, sql, params, correlation_id):
+    try:
+        id_ = str(utils.validate_uuid(id_))
+    except utils.DetailedValueError as err:
+        err.add_correlation_id(correlation_id)
+        raise err
+
+    use_cache = _check_generation(correlation_id)
+    identity = _cache_get(id_) if use_cache else None
+    if identity is None:
+        result = execute_query(sql, params(id_), correlation_id)
+        if not result:
+            return None
+        identity = Identity(**result[0])
+        if use_cache:
+            _cache_put(id_, identity)
+
+    if identity.kind not in kinds:
+        return None
+    return identity
+
+
+def resolve(anon_id, kinds=ANON_KINDS, correlation_id=None):
+    """
+    Args:
+        anon_id: an anon_project_specific_user_id or anon_user_task_id
+        kinds (tuple): kinds of anon id accepted; ids of other kinds resolve to None
+        correlation_id:
+
+    Returns:
+        Identity, or None if anon_id does not match any id of kinds
+    """
+    return _resolve(anon_id, kinds, sql_q.RESOLVE_ANON_ID_SQL, lambda x: (x,), correlation_id)
+
+
+def resolve_any_id(id_, kinds=(USER, *ANON_KINDS), correlation_id=None):
+    """
+    Like resolve, but also accepts user ids (kind USER), using a single query whatever the kind of id_
+
+    Returns:
+        Identity, or None if id_ does not match any id of kinds
+    """
+    return _resolve(id_, kinds, sql_q.RESOLVE_USER_OR_ANON_ID_SQL, lambda x: (x, x), correlation_id)
@@ -0,0 +1,107 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+Short-lived, per-process cache of lookups that found nothing (e.g. requests for user ids that do not exist), so that
+repeated requests for the same missing object do not each cost a database query.
+
+Creating objects of a kind invalidates all cached misses of that kind, in every Lambda container: invalidate records the
+time of the creation in the shared cache (common.shared_cache), and a cached miss is only trusted if it was looked up
+after the latest creation of its kind. That check costs a Dynamodb read, but is only made when a miss is found in the
+cache; if the read fails, the miss is not trusted. Objects created outside this API (e.g. projects, which are created in the admin site) become visible when cached
+misses expire, after at most TTL seconds.
+"""
+import collections
+import time
+
+import common.shared_cache as shared_cache
+
+
+USER_ID = 'user_id'
+USER_EMAIL = 'user_email'
+ANON_USER_TASK_ID = 'anon_user_task_id'
+PROJECT_ID = 'project_id'
+
+TTL = 60  # seconds
+MAX_ENTRIES = 4096
+CLOCK_SKEW_ALLOWANCE = 1  # seconds; clocks of Lambda containers may differ slightly
+
+GENERATION_CACHE_NAME = 'negative_cache_generation'
+
+_misses = collections.OrderedDict()  # (kind, key): time of lookup
+
+
+def _normalise(key):
+    return str(key).strip().lower()
+
+
+def lookup_time():
+    """
+    Returns:
+        Value to pass to add if the lookup about to be made finds nothing. Taken before the lookup, so that objects created
+        while the lookup runs invalidate its result
+    """
+    return time.time()
+
+
+def add(kind, key, looked_up_at):
+    _misses[(kind, _normalise(key))] = looked_up_at
+    _misses.move_to_end((kind, _normalise(key)))
+    while len(_misses) > MAX_ENTRIES:
+        _misses.popitem(last=False)
+
+
+def is_known_missing(kind, key, correlation_id=None):
+    """
+    Returns:
+        True if a recent lookup of key found nothing and no object of kind has been created since
+    """
+    cache_key = (kind, _normalise(key))
+    looked_up_at = _misses.get(cache_key)
+    if looked_up_at is None:
+        return False
+    if looked_up_at < time.time() - TTL:
+        del _misses[cache_key]
+        return False
+    try:
+        last_created = shared_cache.get(GENERATION_CACHE_NAME, kind, correlation_id, use_l1=False, raise_errors=True)
+    except Exception:
+        # objects may have been created since the lookup, so the miss cannot be trusted
+        return False
+    if (last_created is not None) and (last_created >= looked_up_at - CLOCK_SKEW_ALLOWANCE):
+        del _misses[cache_key]
+        return False
+    return True
+
+
+def invalidate(kind, keys=(), correlation_id=None):
+    """
+    Call after creating objects of kind (or changing the keys of existing ones, e.g. user emails)
+
+    Args:
+        kind:
+        keys: keys of the new objects; their cached misses are removed immediately from this process's cache. Cached misses
+                in other processes are invalidated whether or not keys are given
+        correlation_id:
+    """
+    for key in keys:
+        _misses.pop((kind, _normalise(key)), None)
+    shared_cache.put(GENERATION_CACHE_NAME, kind, time.time(), correlation_id, ttl=TTL + 60)
+
+
+def clear():
+    _misses.clear()
@@ -0,0 +1,112 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+Keyset pagination of list endpoints.
+
+Paginated queries order rows by (created, id) and return the rows after a given (created, id) pair, which they expose
+as page_created and page_id columns. Clients get an opaque cursor encoding the key of the last row of a page and pass it
+back to get the next page. Pagination is opt-in: list endpoints only return pages if a page_size or cursor query
+parameter is present.
+"""
+import base64
+import json
+
+import thiscovery_lib.utilities as utils
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# key preceding all rows; used for the first page
+FIRST_KEY = ('-infinity', '00000000-0000-0000-0000-000000000000')
+
+
+def encode_cursor(created, id):
+    return base64.urlsafe_b64encode(json.dumps([created, id]).encode()).decode()
+
+
+def decode_cursor(cursor, correlation_id=None):
+    try:
+        created, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        id = str(utils.validate_uuid(id))
+        assert isinstance(created, str)
+    except Exception as err:
+        errorjson = {'cursor': cursor, 'correlation_id': str(correlation_id)}
+        raise utils.DetailedValueError('invalid cursor', errorjson) from err
+    return created, id
+
+
+class PageRequest:
+
+    def __init__(self, page_size=DEFAULT_PAGE_SIZE, cursor=None, correlation_id=None):
+        self.page_size = page_size
+        self.after = FIRST_KEY
+        if cursor:
+            self.after = decode_cursor(cursor, correlation_id)
+
+    @classmethod
+    def from_parameters(cls, parameters, correlation_id=None):
+        """
+        Args:
+            parameters (dict): query string parameters of the request
+            correlation_id:
+
+        Returns:
+            PageRequest, or None if the request is not paginated
+        """
+        parameters = parameters or dict()
+        page_size = parameters.get('page_size')
+        cursor = parameters.get('cursor')
+        if (page_size is None) and (cursor is None):
+            return None
+        if page_size is None:
+            page_size = DEFAULT_PAGE_SIZE
+        try:
+            page_size = int(page_size)
+            assert 0 < page_size <= MAX_PAGE_SIZE
+        except (ValueError, AssertionError):
+            errorjson = {'page_size': page_size, 'max_page_size': MAX_PAGE_SIZE, 'correlation_id': str(correlation_id)}
+            raise utils.DetailedValueError('invalid page_size', errorjson)
+        return cls(page_size, cursor, correlation_id)
+
+    @property
+    def params(self):
+        """
+        Parameters to append to those of a paginated query: the key to start after and the page size plus one, so that
+        the query reveals whether there is a next page
+        """
+        return (*self.after, self.page_size + 1)
+
+    def page(self, rows):
+        """
+        Args:
+            rows (list): result of a paginated query run with self.params
+
+        Returns:
+            Dictionary containing the items of this page (without their page_created and page_id fields) and the cursor
+            of the next page (None if this is the last page)
+        """
+        items = rows[:self.page_size]
+        next_cursor = None
+        if len(rows) > self.page_size:
+            last = items[-1]
+            next_cursor = encode_cursor(last['page_created'], last['page_id'])
+        for item in items:
+            del item['page_created']
+            del item['page_id']
+        return {'items': items, 'next': next_cursor}
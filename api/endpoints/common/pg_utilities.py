@@ -16,7 +16,9 @@
 #   docs folder of this project.  It is also available www.gnu.org/licenses/
 #
 import functools
+import json
 import psycopg2
+import uuid
 
 from thiscovery_lib.utilities import minimise_white_space, get_file_as_string, get_logger, ObjectDoesNotExistError, PatchOperationNotSupportedError, \
     PatchAttributeNotRecognisedError, PatchInvalidJsonError, DetailedIntegrityError, get_secret, new_correlation_id
@@ -151,6 +153,152 @@ def execute_non_query(sql, params, correlation_id=new_correlation_id()):
     return rowcount
 
 
+def execute_non_query_returning(sql, params, correlation_id=new_correlation_id()):
+    """
+    Use this method for statements that make changes and return rows (e.g. INSERT ... RETURNING, or a WITH query containing
+    an INSERT). Changes are committed. Statements like these cannot be wrapped by row_to_json, so rows are returned as
+    dictionaries keyed by column name, with values as converted by psycopg2
+
+    Returns:
+        List of dictionaries, one per row returned by sql
+    """
+    logger = get_logger()
+    conn = _get_connection(correlation_id)
+    sql = minimise_white_space(sql)
+    param_str = str(params)
+    logger.info('postgres query', extra={
+        'query': sql,
+        'parameters': param_str,
+        'correlation_id': correlation_id
+    })
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            records = cursor.fetchall()
+            conn.commit()
+        except psycopg2.IntegrityError as err:
+            conn.rollback()
+            errorjson = {'error': err.args[0], 'correlation_id': str(correlation_id)}
+            raise DetailedIntegrityError('Database integrity error', errorjson)
+    logger.info('postgres result', extra={'rows returned': str(len(records)), 'correlation_id': correlation_id})
+    return [dict(zip(columns, r)) for r in records]
+
+
+def execute_non_query_returning_multiple(sql_iterable, params_iterable, correlation_id=new_correlation_id()):
+    """
+    As execute_non_query_returning, but for several statements executed in a single transaction: either all changes are
+    committed or none is
+
+    Returns:
+        List containing, for each input sql statement, the list of dictionaries returned by that statement
+    """
+    logger = get_logger()
+    conn = _get_connection(correlation_id)
+    results = []
+    with conn.cursor() as cursor:
+        try:
+            for (sql, params) in zip(sql_iterable, params_iterable):
+                sql = minimise_white_space(sql)
+                logger.info('postgres query', extra={'query': sql, 'parameters': str(params), 'correlation_id': correlation_id})
+                cursor.execute(sql, params)
+                columns = [c[0] for c in cursor.description]
+                results.append([dict(zip(columns, r)) for r in cursor.fetchall()])
+            conn.commit()
+        except psycopg2.IntegrityError as err:
+            conn.rollback()
+            errorjson = {'error': err.args[0], 'correlation_id': str(correlation_id)}
+            raise DetailedIntegrityError('Database integrity error', errorjson)
+        except Exception:
+            conn.rollback()
+            raise
+    logger.info('postgres result', extra={'rows returned': str([len(r) for r in results]), 'correlation_id': correlation_id})
+    return results
+
+
+def execute_non_query_returning_with_follow_up(sql, params, follow_up, correlation_id=new_correlation_id()):
+    """
+    As execute_non_query_returning, but the transaction is only committed once follow_up has been called with the rows
+    returned by sql. This lets callers combine the results of sql with work done elsewhere in the meantime (e.g. a
+    Dynamodb lookup) before deciding whether to keep the changes
+
+    Args:
+        sql:
+        params:
+        follow_up (function): called with the list of dictionaries returned by sql; returns either None or a (sql, params)
+                tuple of a further statement to execute in the same transaction. If it raises an exception, the transaction
+                is rolled back
+        correlation_id:
+
+    Returns:
+        List of dictionaries, one per row returned by sql
+    """
+    logger = get_logger()
+    conn = _get_connection(correlation_id)
+    sql = minimise_white_space(sql)
+    logger.info('postgres query', extra={'query': sql, 'parameters': str(params), 'correlation_id': correlation_id})
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            rows = [dict(zip(columns, r)) for r in cursor.fetchall()]
+            follow_up_statement = follow_up(rows)
+            if follow_up_statement is not None:
+                follow_up_sql, follow_up_params = follow_up_statement
+                follow_up_sql = minimise_white_space(follow_up_sql)
+                logger.info('postgres query', extra={'query': follow_up_sql, 'parameters': str(follow_up_params), 'correlation_id': correlation_id})
+                cursor.execute(follow_up_sql, follow_up_params)
+            conn.commit()
+        except psycopg2.IntegrityError as err:
+            conn.rollback()
+            errorjson = {'error': err.args[0], 'correlation_id': str(correlation_id)}
+            raise DetailedIntegrityError('Database integrity error', errorjson)
+        except Exception:
+            conn.rollback()
+            raise
+    logger.info('postgres result', extra={'rows returned': str(len(rows)), 'correlation_id': correlation_id})
+    return rows
+
+
+def execute_copy_and_non_query_returning(setup_sql, copy_sql, source_file, sql, params, correlation_id=new_correlation_id()):
+    """
+    Loads data into a staging table and processes it in a single transaction: runs setup_sql (e.g. to create a temporary
+    table), then copy_sql (a COPY ... FROM STDIN statement) reading source_file and finally sql. Changes are committed.
+
+    Args:
+        setup_sql:
+        copy_sql:
+        source_file: file-like object to read the data from
+        sql:
+        params: parameters of sql
+        correlation_id:
+
+    Returns:
+        List of dictionaries, one per row returned by sql
+    """
+    logger = get_logger()
+    conn = _get_connection(correlation_id)
+    sql = minimise_white_space(sql)
+    logger.info('postgres query', extra={'query': sql, 'parameters': str(params), 'correlation_id': correlation_id})
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(setup_sql)
+            cursor.copy_expert(copy_sql, source_file)
+            cursor.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            records = cursor.fetchall()
+            conn.commit()
+        except psycopg2.IntegrityError as err:
+            conn.rollback()
+            errorjson = {'error': err.args[0], 'correlation_id': str(correlation_id)}
+            raise DetailedIntegrityError('Database integrity error', errorjson)
+        except Exception:
+            conn.rollback()
+            raise
+    logger.info('postgres result', extra={'rows returned': str(len(records)), 'correlation_id': correlation_id})
+    return [dict(zip(columns, r)) for r in records]
+
+
 def execute_non_query_multiple(sql_iterable, params_iterable, correlation_id=new_correlation_id()):
     """
     
@@ -352,6 +500,259 @@ def execute_jsonpatch(id_column, id_to_update, mappings, patch_json, modified_ti
         raise ex
 
 
+def create_sql_from_jsonpatch_with_entity_update(entity_name, mappings, patch_json, id_column, correlation_id=new_correlation_id()):
+    """
+    Creates a single statement that reads the current values of the patched columns, updates them and saves an entity
+    update record containing the patch and its reverse. All attributes in mappings must belong to the same table.
+
+    Returns:
+        Tuple (sql, params); params still need values for keys id, modified, entity_update_id and json_patch
+    """
+    tables_to_update, columns_to_update = create_updates_list_from_jsonpatch(mappings, patch_json, correlation_id)
+    (table_name,) = tables_to_update
+    # attribute names as used in patch paths; later operations on the same attribute replace earlier ones
+    attributes = {mapping['column_name']: attribute for attribute, mapping in mappings.items()}
+    new_values = dict()
+    for update in columns_to_update:
+        new_values[update['column_name']] = update['value']
+
+    params = {'entity_name': entity_name, 'new_values': json.dumps({attributes[c]: v for c, v in new_values.items()})}
+    old_values_sql = ', '.join(f"'{attributes[c]}', {c}" for c in new_values)
+    set_sql = ''
+    for i, (column, value) in enumerate(new_values.items()):
+        set_sql += f'{column} = %(value_{i})s, '
+        params[f'value_{i}'] = value
+
+    sql = f'''
+        WITH old AS (
+            SELECT {id_column} AS id, json_build_object({old_values_sql}) AS old_values
+            FROM {table_name}
+            WHERE {id_column} = %(id)s
+            FOR UPDATE
+        ), updated AS (
+            UPDATE {table_name} t
+            SET {set_sql}modified = %(modified)s
+            FROM old
+            WHERE t.{id_column} = old.id
+            RETURNING t.{id_column} AS id
+        ), saved_update AS (
+            INSERT INTO public.projects_entityupdate (
+                id, created, modified, entity_name, entity_id, json_patch, json_reverse_patch
+            )
+            SELECT
+                %(entity_update_id)s,
+                %(modified)s,
+                %(modified)s,
+                %(entity_name)s,
+                updated.id,
+                %(json_patch)s,
+                (
+                    SELECT COALESCE(json_agg(json_build_object('op', 'replace', 'path', '/' || o.key, 'value', o.value) ORDER BY o.position), '[]')::text
+                    FROM json_each(old.old_values) WITH ORDINALITY AS o(key, value, position)
+                    WHERE o.value::jsonb IS DISTINCT FROM (%(new_values)s::jsonb -> o.key)
+                )
+            FROM updated JOIN old ON old.id = updated.id
+            RETURNING entity_id
+        )
+        SELECT count(*) AS updated_rows
+        FROM saved_update
+    '''
+    return sql, params
+
+
+def execute_jsonpatch_with_entity_update(entity_name, id_column, id_to_update, mappings, patch_json, modified_time,
+                                         correlation_id=new_correlation_id()):
+    """
+    Applies patch_json and saves the corresponding entity update record (including the reverse patch) in one statement,
+    so both are committed together
+
+    Returns:
+        Number of rows updated in RDS database
+    """
+    sql, params = create_sql_from_jsonpatch_with_entity_update(entity_name, mappings, patch_json, id_column, correlation_id)
+    params.update({
+        'id': id_to_update,
+        'modified': str(modified_time),
+        'entity_update_id': str(uuid.uuid4()),
+        'json_patch': patch_json.to_string(),
+    })
+    updated_rows = execute_non_query_returning(sql, params, correlation_id)[0]['updated_rows']
+    if updated_rows == 0:
+        errorjson = {'id_column': id_column, 'id_to_update': id_to_update, 'correlation_id': str(correlation_id)}
+        raise ObjectDoesNotExistError(f'{entity_name} does not exist', errorjson)
+    return updated_rows
+
+
+def create_sql_from_bulk_jsonpatch_with_entity_update(entity_name, table_name, id_column, column_attributes, patches, modified_time,
+                                                     save_entity_updates=True):
+    """
+    Creates a single statement that patches the same columns of several rows, by joining the table to a VALUES list, and
+    saves an entity update record for each updated row
+
+    Args:
+        entity_name:
+        table_name:
+        id_column:
+        column_attributes (dict): patched columns and the attribute names they are mapped to
+        patches (list): tuples (id_to_update, patch_json, new_values), where new_values is a dictionary of column values
+        modified_time:
+        save_entity_updates (bool): if False, rows are patched without saving entity update records
+
+    Returns:
+        Tuple (sql, params)
+    """
+    values_sql = ', '.join(['(%s::uuid, %s::uuid, %s, %s::jsonb)'] * len(patches))
+    params = list()
+    for id_to_update, patch_json, new_values in patches:
+        params += [str(id_to_update), str(uuid.uuid4()), patch_json.to_string(), json.dumps(new_values)]
+    params.append(str(modified_time))
+
+    def json_object_sql(alias):
+        return ', '.join(f"'{a}', {alias}.{c}" for c, a in column_attributes.items())
+
+    set_sql = ''
+    for column in column_attributes:
+        set_sql += f'{column} = v.{column}, '
+
+    sql = f'''
+        WITH data (id, entity_update_id, json_patch, new_values) AS (
+            VALUES {values_sql}
+        ), old AS (
+            SELECT t.{id_column} AS id, json_build_object({json_object_sql('t')}) AS old_values
+            FROM {table_name} t
+                JOIN data ON data.id = t.{id_column}
+            FOR UPDATE OF t
+        ), updated AS (
+            UPDATE {table_name} t
+            SET {set_sql}modified = %s
+            FROM data
+                CROSS JOIN LATERAL jsonb_populate_record(NULL::{table_name}, data.new_values) v
+            WHERE t.{id_column} = data.id
+            RETURNING t.{id_column} AS id, json_build_object({json_object_sql('v')}) AS new_values
+        )
+    '''
+    if not save_entity_updates:
+        sql += '''
+            SELECT id
+            FROM updated
+        '''
+        return sql, tuple(params)
+
+    params += [str(modified_time)] * 2 + [entity_name]
+    sql += '''
+        , saved_update AS (
+            INSERT INTO public.projects_entityupdate (
+                id, created, modified, entity_name, entity_id, json_patch, json_reverse_patch
+            )
+            SELECT
+                data.entity_update_id,
+                %s,
+                %s,
+                %s,
+                updated.id,
+                data.json_patch,
+                (
+                    SELECT COALESCE(json_agg(json_build_object('op', 'replace', 'path', '/' || o.key, 'value', o.value) ORDER BY o.position), '[]')::text
+                    FROM json_each(old.old_values) WITH ORDINALITY AS o(key, value, position)
+                    WHERE o.value::jsonb IS DISTINCT FROM (updated.new_values::jsonb -> o.key)
+                )
+            FROM updated
+                JOIN old ON old.id = updated.id
+                JOIN data ON data.id = updated.id
+            RETURNING entity_id
+        )
+        SELECT entity_id AS id
+        FROM saved_update
+    '''
+    return sql, tuple(params)
+
+
+def execute_bulk_jsonpatch_with_entity_update(entity_name, id_column, mappings, patches, modified_time, correlation_id=new_correlation_id(),
+                                              save_entity_updates=True):
+    """
+    Applies many jsonpatches and saves an entity update record for each of them in a single transaction. Patches changing
+    the same set of columns are applied by the same statement. Ids must be unique and all attributes in mappings must
+    belong to the same table.
+
+    If the database rejects the transaction because of the values of some patches (an integrity or data error, e.g. a null
+    value in a column that does not allow nulls), the patches are applied again one by one, each in its own transaction, so
+    that only the offending ones fail.
+
+    Args:
+        entity_name:
+        id_column:
+        mappings:
+        patches (list): tuples (id_to_update, patch_json)
+        modified_time:
+        correlation_id:
+        save_entity_updates (bool): if False, rows are patched without saving entity update records
+
+    Returns:
+        Tuple (updated_ids, rejected_ids): sets of the ids (as strings) of updated rows and of rows whose patch was rejected
+        by the database. Other ids do not exist
+    """
+    attributes = {mapping['column_name']: attribute for attribute, mapping in mappings.items()}
+    patches_by_columns = dict()
+    table_names = set()
+    for id_to_update, patch_json in patches:
+        tables_to_update, columns_to_update = create_updates_list_from_jsonpatch(mappings, patch_json, correlation_id)
+        table_names.update(tables_to_update)
+        # later operations on the same column replace earlier ones
+        new_values = dict()
+        for update in columns_to_update:
+            new_values[update['column_name']] = update['value']
+        patches_by_columns.setdefault(tuple(sorted(new_values)), list()).append((id_to_update, patch_json, new_values))
+
+    if not patches_by_columns:
+        return set(), set()
+    (table_name,) = table_names
+
+    def create_sql(columns, column_patches):
+        return create_sql_from_bulk_jsonpatch_with_entity_update(
+            entity_name, table_name, id_column, {c: attributes[c] for c in columns}, column_patches, modified_time, save_entity_updates
+        )
+
+    sql_list, params_list = list(), list()
+    for columns, column_patches in patches_by_columns.items():
+        sql, params = create_sql(columns, column_patches)
+        sql_list.append(sql)
+        params_list.append(params)
+
+    try:
+        results = execute_non_query_returning_multiple(sql_list, params_list, correlation_id)
+        return {str(row['id']) for rows in results for row in rows}, set()
+    except (DetailedIntegrityError, psycopg2.DataError) as err:
+        get_logger().warning('Bulk jsonpatch rejected; applying patches one by one', extra={
+            'error': repr(err), 'correlation_id': correlation_id
+        })
+
+    updated_ids, rejected_ids = set(), set()
+    for columns, column_patches in patches_by_columns.items():
+        for patch in column_patches:
+            sql, params = create_sql(columns, [patch])
+            try:
+                (rows,) = execute_non_query_returning_multiple([sql], [params], correlation_id)
+            except (DetailedIntegrityError, psycopg2.DataError):
+                rejected_ids.add(str(patch[0]))
+            else:
+                updated_ids.update(str(row['id']) for row in rows)
+    return updated_ids, rejected_ids
+
+
+def json_timestamp(value):
+    """
+    Formats a timestamp returned by psycopg2 as row_to_json would: in ISO format, without trailing zeros in fractions of
+    seconds (e.g. 2018-11-06T12:48:46.46246+00:00)
+    """
+    if value is None:
+        return None
+    if not value.microsecond:
+        return value.isoformat()
+    iso_value = value.isoformat(timespec='microseconds')
+    seconds_end = iso_value.index('.') + 7
+    return iso_value[:seconds_end].rstrip('0') + iso_value[seconds_end:]
+
+
 def dict_from_dataset(dataset, key_name):
     dataset_as_dict = {}
     for datarow in dataset:
@@ -0,0 +1,294 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+User-independent part of the project status document (projects and their non-planned tasks).
+
+The catalogue is loaded once per warm container and reused for as long as its version (see project.ProjectStatusVersion)
+does not change. Each catalogue read from the database is also saved as an on-disk snapshot (see common.catalogue_snapshot),
+from which other processes on the same host, or this one after its in-memory copy is discarded, can load it. The user-independent fields of each project and task are kept pre-serialised as JSON bytes fragments,
+so that rendering the document for a user only requires splicing in the per-user fields. Catalogue objects are shared
+between requests and must be treated as read-only.
+"""
+import json
+
+import common.catalogue_snapshot as catalogue_snapshot
+import common.shared_cache as shared_cache
+import common.sql_queries as sql_q
+import thiscovery_lib.utilities as utils
+from common.pg_utilities import execute_query
+
+
+PROJECT_FIELDS = ('id', 'name', 'short_name', 'description', 'project_page_url', 'visibility', 'status')
+PROJECT_USER_FIELDS = ('project_is_visible',)
+TASK_FIELDS = ('id', 'name', 'short_name', 'description', 'task_page_url', 'signup_status', 'visibility', 'external_task_id', 'status',
+               'task_provider_name', 'display_method', 'user_specific_url', 'anonymise_url', 'task_type_name')
+TASK_USER_FIELDS = ('task_is_visible', 'user_is_signedup', 'signup_available', 'user_task_status', 'url')
+
+# catalogue versions never change, so entries can be kept in the shared cache for as long as they might be requested
+SHARED_CACHE_TTL = 24 * 60 * 60
+
+# bumped whenever the tables covered by the catalogue version change, so that entries saved under an earlier definition of
+# the version are never mistaken for current ones
+VERSION_FORMAT = 2
+
+# number of different field projections for which fragments are kept by each catalogue item
+MAX_CACHED_FRAGMENTS = 16
+
+JSON_TRUE = b'true'
+JSON_FALSE = b'false'
+JSON_NULL = b'null'
+
+
+def encode_fragment(d):
+    """
+    Serialises a dictionary as a JSON object without its enclosing braces, so that further members can be appended to it
+    """
+    return json.dumps(d)[1:-1].encode()
+
+
+def encode_bool(value):
+    return JSON_TRUE if value else JSON_FALSE
+
+
+def encode_value(value):
+    if value is None:
+        return JSON_NULL
+    return json.dumps(value).encode()
+
+
+class Projection:
+    """
+    Fields of the project status document requested by a client
+    """
+
+    def __init__(self, project_fields=None, task_fields=None):
+        """
+        Args:
+            project_fields (iterable): names of project fields to include; all fields if None
+            task_fields (iterable): names of task fields to include; all fields if None. If empty, the tasks of projects
+                    are not included in the document
+        """
+        if project_fields is None:
+            project_fields = (*PROJECT_FIELDS, *PROJECT_USER_FIELDS)
+        if task_fields is None:
+            task_fields = (*TASK_FIELDS, *TASK_USER_FIELDS)
+        self.project_data_fields = tuple(f for f in PROJECT_FIELDS if f in project_fields)
+        self.project_user_fields = tuple(f for f in PROJECT_USER_FIELDS if f in project_fields)
+        self.task_data_fields = tuple(f for f in TASK_FIELDS if f in task_fields)
+        self.task_user_fields = tuple(f for f in TASK_USER_FIELDS if f in task_fields)
+        self.include_tasks = bool(self.task_data_fields or self.task_user_fields)
+
+    @property
+    def key(self):
+        """
+        Canonical form of the projection; projections that select the same fields have the same key
+        """
+        task_fields = [f'tasks.{x}' for x in (*self.task_data_fields, *self.task_user_fields)]
+        return ','.join((*self.project_data_fields, *self.project_user_fields, *task_fields))
+
+    @classmethod
+    def from_query_parameter(cls, fields, correlation_id=None):
+        """
+        Args:
+            fields (str): comma-separated list of field names. Task fields are prefixed with 'tasks.' (e.g. 'tasks.url');
+                    'tasks' on its own selects all task fields
+            correlation_id:
+
+        Returns:
+            Projection instance
+        """
+        project_fields, task_fields = set(), set()
+        for field in [x.strip() for x in fields.split(',') if x.strip()]:
+            if field == 'tasks':
+                task_fields.update(TASK_FIELDS, TASK_USER_FIELDS)
+            elif field.startswith('tasks.'):
+                task_fields.add(field[len('tasks.'):])
+            else:
+                project_fields.add(field)
+        invalid_fields = sorted(
+            (project_fields - {*PROJECT_FIELDS, *PROJECT_USER_FIELDS}) |
+            {f'tasks.{x}' for x in task_fields - {*TASK_FIELDS, *TASK_USER_FIELDS}}
+        )
+        if invalid_fields or not (project_fields or task_fields):
+            errorjson = {'fields': fields, 'invalid_fields': invalid_fields, 'correlation_id': str(correlation_id)}
+            raise utils.DetailedValueError('invalid fields parameter', errorjson)
+        return cls(project_fields, task_fields)
+
+
+FULL_PROJECTION = Projection()
+
+
+class CatalogueItem:
+    """
+    Base class of catalogue projects and tasks. Fragments of projections other than the full one are encoded on first use
+    and kept for subsequent requests
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.fragment = encode_fragment(self.data)
+        self._fragments = dict()
+
+    def get_fragment(self, fields):
+        """
+        Args:
+            fields (tuple): names of the data fields to include, in document order
+
+        Returns:
+            JSON bytes fragment (see encode_fragment) containing only fields; empty if fields is empty
+        """
+        if len(fields) == len(self.data):
+            return self.fragment
+        try:
+            return self._fragments[fields]
+        except KeyError:
+            fragment = encode_fragment({k: self.data[k] for k in fields})
+            if len(self._fragments) < MAX_CACHED_FRAGMENTS:
+                self._fragments[fields] = fragment
+            return fragment
+
+
+class CatalogueTask(CatalogueItem):
+
+    def __init__(self, task_dict):
+        self.id = task_dict['id']
+        self.status = task_dict['status']
+        self.visibility = task_dict['visibility']
+        self.signup_status = task_dict['signup_status']
+        self.base_url = task_dict['url']
+        self.external_task_id = task_dict['external_task_id']
+        self.user_specific_url = task_dict['user_specific_url']
+        self.anonymise_url = task_dict['anonymise_url']
+        self.task_type_name = task_dict['task_type_name']
+        super().__init__({k: v for k, v in task_dict.items() if k not in TASK_USER_FIELDS})
+
+
+class CatalogueProject(CatalogueItem):
+
+    def __init__(self, project_dict):
+        self.id = project_dict['id']
+        self.status = project_dict['status']
+        self.visibility = project_dict['visibility']
+        self.tasks = [CatalogueTask(t) for t in project_dict['tasks']]
+        super().__init__({k: v for k, v in project_dict.items() if k not in (*PROJECT_USER_FIELDS, 'tasks')})
+
+
+class SnapshotProjects:
+    """
+    Sequence of CatalogueProject backed by a catalogue_snapshot.CatalogueSnapshot; projects are decoded on first access
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._projects = [None] * len(snapshot)
+
+    def __len__(self):
+        return len(self._projects)
+
+    def __getitem__(self, i):
+        project = self._projects[i]
+        if project is None:
+            project = CatalogueProject(self._snapshot[i])
+            self._projects[i] = project
+        return project
+
+    def __iter__(self):
+        for i in range(len(self._projects)):
+            yield self[i]
+
+
+def cache_version(demo, version):
+    """
+    Args:
+        demo (bool): whether this is the catalogue of demo projects
+        version (tuple): catalogue version (see project.ProjectStatusVersion.catalogue_version)
+
+    Returns:
+        Version string under which the catalogue is kept in the shared cache
+    """
+    catalogue_modified, catalogue_count = version
+    return f'{VERSION_FORMAT}.{int(bool(demo))}.{catalogue_modified}.{catalogue_count}'
+
+
+class ProjectCatalogue:
+
+    def __init__(self, project_list, demo, version):
+        """
+        Args:
+            project_list (list): output of sql_q.PROJECT_USER_SELECT_SQL_NON_DEMO_ONLY or sql_q.PROJECT_USER_SELECT_SQL_DEMO_ONLY
+            demo (bool): whether this is the catalogue of demo projects
+            version (tuple): catalogue version the project_list was read at
+        """
+        self.demo = bool(demo)
+        self.version = version
+        self.projects = [CatalogueProject(p) for p in project_list]
+
+    @classmethod
+    def from_db(cls, demo, version, correlation_id=None):
+        """
+        Loads the catalogue from the shared cache (see common.shared_cache), which falls back to querying the database
+        """
+        def query_project_list():
+            project_list_sql = sql_q.PROJECT_USER_SELECT_SQL_NON_DEMO_ONLY
+            if demo:
+                project_list_sql = sql_q.PROJECT_USER_SELECT_SQL_DEMO_ONLY
+            return execute_query(project_list_sql, None, correlation_id, True, False)
+
+        project_list = shared_cache.get_or_compute(
+            name='project_catalogue',
+            version=cache_version(demo, version),
+            compute=query_project_list,
+            correlation_id=correlation_id,
+            ttl=SHARED_CACHE_TTL,
+            use_l1=False,
+        )
+        catalogue_snapshot.save_snapshot(project_list, demo, version, correlation_id)
+        return cls(project_list, demo, version)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Args:
+            snapshot (catalogue_snapshot.CatalogueSnapshot):
+        """
+        catalogue = cls(list(), snapshot.demo, snapshot.version)
+        catalogue.projects = SnapshotProjects(snapshot)
+        return catalogue
+
+
+_catalogue_cache = dict()
+
+
+def get_catalogue(demo, version, correlation_id=None):
+    """
+    Returns the cached catalogue for demo. If its version does not match version, the catalogue is reloaded from the
+    on-disk snapshot or, if there is no snapshot of that version, from the database
+    """
+    catalogue = _catalogue_cache.get(bool(demo))
+    if (catalogue is None) or (catalogue.version != version):
+        snapshot = catalogue_snapshot.read_snapshot(demo, version)
+        if snapshot is None:
+            catalogue = ProjectCatalogue.from_db(demo, version, correlation_id)
+        else:
+            catalogue = ProjectCatalogue.from_snapshot(snapshot)
+        _catalogue_cache[bool(demo)] = catalogue
+    return catalogue
+
+
+def clear_catalogue_cache():
+    _catalogue_cache.clear()
@@ -0,0 +1,265 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+Read-through cache of derived documents shared by all Lambda containers, backed by the lookups Dynamodb table.
+
+Lookups go to a small per-process cache (L1) first, then to the lookups table (L2) and only then to the function that
+computes the document (usually a database query). Keys include the name and version of the document, so a new version
+is simply a different item. When a document is missing from L2, the first container to notice takes a short lease on it
+(a conditional write), and the others wait for it to appear rather than all running the same query. Expired entries are
+removed by the table's time to live setting. Cache errors are logged and never fail the request: the document is then
+computed locally.
+"""
+import base64
+import collections
+import json
+import time
+import zlib
+
+import thiscovery_lib.utilities as utils
+from thiscovery_lib.dynamodb_utilities import Dynamodb
+
+
+CACHE_TABLE = 'lookups'
+CACHE_FORMAT_VERSION = 1
+ENTRY_ITEM_TYPE = 'shared_cache_entry'
+LEASE_ITEM_TYPE = 'shared_cache_lease'
+EXPIRY_ATTRIBUTE = 'cache_expires'
+
+DEFAULT_TTL = 300  # seconds
+LEASE_DURATION = 10  # seconds
+LEASE_WAIT_INTERVAL = 0.1  # seconds
+LEASE_WAIT_ATTEMPTS = 20
+
+L1_MAX_ENTRIES = 256
+
+_l1 = collections.OrderedDict()
+_ddb_client = None
+
+
+def _get_ddb_client(correlation_id=None):
+    global _ddb_client
+    if _ddb_client is None:
+        _ddb_client = Dynamodb(correlation_id=correlation_id)
+    return _ddb_client
+
+
+def cache_key(name, version):
+    return f'cache:{CACHE_FORMAT_VERSION}:{name}:{version}'
+
+
+def encode_payload(value):
+    return base64.b64encode(zlib.compress(json.dumps(value).encode())).decode()
+
+
+def decode_payload(payload):
+    return json.loads(zlib.decompress(base64.b64decode(payload)))
+
+
+def _is_conditional_check_failure(err):
+    response = getattr(err, 'response', None) or dict()
+    return response.get('Error', dict()).get('Code') == 'ConditionalCheckFailedException'
+
+
+# region L1
+def _l1_get(key):
+    try:
+        expires, value = _l1[key]
+    except KeyError:
+        return None
+    if expires < time.monotonic():
+        del _l1[key]
+        return None
+    _l1.move_to_end(key)
+    return value
+
+
+def _l1_put(key, value, ttl):
+    _l1[key] = (time.monotonic() + ttl, value)
+    _l1.move_to_end(key)
+    while len(_l1) > L1_MAX_ENTRIES:
+        _l1.popitem(last=False)
+
+
+def clear_l1():
+    _l1.clear()
+# endregion
+
+
+# region L2
+def _l2_get(key, correlation_id):
+    item = _get_ddb_client(correlation_id).get_item(table_name=CACHE_TABLE, key=key, correlation_id=correlation_id)
+    if (item is None) or (int(item.get(EXPIRY_ATTRIBUTE, 0)) < time.time()):
+        return None
+    return decode_payload(item['details']['payload'])
+
+
+def _l2_put(key, value, ttl, correlation_id):
+    _get_ddb_client(correlation_id).put_item(
+        CACHE_TABLE, key, ENTRY_ITEM_TYPE, {'payload': encode_payload(value)}, {EXPIRY_ATTRIBUTE: int(time.time() + ttl)}, True,
+        correlation_id
+    )
+
+
+def _take_lease(key, correlation_id):
+    """
+    Conditional write: returns False if another container holds an unexpired lease on key. Expired leases (e.g. of a
+    container that crashed while computing the document) are taken over rather than left until the table's time to live
+    setting removes them
+    """
+    now = int(time.time())
+    created = str(utils.now_with_tz())
+    table = _get_ddb_client(correlation_id).get_table(CACHE_TABLE)
+    try:
+        table.put_item(
+            Item={
+                'id': f'{key}:lease',
+                'type': LEASE_ITEM_TYPE,
+                'details': dict(),
+                'created': created,
+                'modified': created,
+                EXPIRY_ATTRIBUTE: now + LEASE_DURATION,
+            },
+            ConditionExpression=f'attribute_not_exists(id) OR {EXPIRY_ATTRIBUTE} < :now',
+            ExpressionAttributeValues={':now': now},
+        )
+    except Exception as err:
+        if _is_conditional_check_failure(err):
+            return False
+        raise
+    return True
+
+
+def _release_lease(key, correlation_id):
+    _get_ddb_client(correlation_id).delete_item(CACHE_TABLE, f'{key}:lease', correlation_id=correlation_id)
+
+
+def _wait_for_l2(key, correlation_id):
+    for _ in range(LEASE_WAIT_ATTEMPTS):
+        time.sleep(LEASE_WAIT_INTERVAL)
+        value = _l2_get(key, correlation_id)
+        if value is not None:
+            return value
+# endregion
+
+
+def get(name, version, correlation_id=None, use_l1=True, raise_errors=False):
+    """
+    Args:
+        raise_errors: if True, errors reading the shared table are raised (after being logged) instead of being treated as
+                a cache miss; for callers that must not mistake an unreadable document for a missing one
+
+    Returns:
+        The cached document, or None if it is not cached (or the cache could not be read)
+    """
+    key = cache_key(name, version)
+    if use_l1:
+        value = _l1_get(key)
+        if value is not None:
+            return value
+    try:
+        value = _l2_get(key, correlation_id)
+    except Exception as err:
+        utils.get_logger().warning('Shared cache read failed', extra={'key': key, 'error': repr(err), 'correlation_id': correlation_id})
+        if raise_errors:
+            raise
+        return None
+    if use_l1 and (value is not None):
+        _l1_put(key, value, DEFAULT_TTL)
+    return value
+
+
+def put(name, version, value, correlation_id=None, ttl=DEFAULT_TTL):
+    """
+    Stores a document computed ahead of time (e.g. to warm the cache); errors are logged and otherwise ignored
+
+    Returns:
+        True if the document was stored, False otherwise
+    """
+    key = cache_key(name, version)
+    try:
+        _l2_put(key, value, ttl, correlation_id)
+    except Exception as err:
+        utils.get_logger().warning('Shared cache write failed', extra={'key': key, 'error': repr(err), 'correlation_id': correlation_id})
+        return False
+    return True
+
+
+def delete(name, version, correlation_id=None):
+    """
+    Removes a document from this process's cache and from the shared table (e.g. because it holds personal data of a user
+    who has been erased). Unlike reads and writes, errors are raised to the caller
+    """
+    key = cache_key(name, version)
+    _l1.pop(key, None)
+    _get_ddb_client(correlation_id).delete_item(CACHE_TABLE, key, correlation_id=correlation_id)
+
+
+def get_or_compute(name, version, compute, correlation_id=None, ttl=DEFAULT_TTL, use_l1=True):
+    """
+    Args:
+        name (str): name of the document (e.g. 'project_catalogue')
+        version (str): version of the document (or, for lookups that are cached for a fixed time, the lookup value); entries
+                of different versions are independent
+        compute (function): called without arguments to produce the document if it is not cached. The document must be
+                JSON serialisable. None is returned to the caller but not cached
+        correlation_id:
+        ttl (int): seconds the document is kept in the cache
+        use_l1 (bool): set to False if the caller already keeps the document in memory
+
+    Returns:
+        The cached or computed document
+    """
+    logger = utils.get_logger()
+    key = cache_key(name, version)
+    if use_l1:
+        value = _l1_get(key)
+        if value is not None:
+            return value
+
+    value = None
+    lease_taken = False
+    try:
+        value = _l2_get(key, correlation_id)
+        if value is None:
+            lease_taken = _take_lease(key, correlation_id)
+            if not lease_taken:
+                # another container is computing this document; if it does not finish in time (or failed without releasing
+                # its lease), compute the document here
+                value = _wait_for_l2(key, correlation_id)
+    except Exception as err:
+        logger.warning('Shared cache read failed', extra={'key': key, 'error': repr(err), 'correlation_id': correlation_id})
+
+    if value is None:
+        try:
+            value = compute()
+        finally:
+            try:
+                if value is not None:
+                    _l2_put(key, value, ttl, correlation_id)
+                if lease_taken:
+                    # only the holder releases the lease; other containers would delete a lease still in use
+                    _release_lease(key, correlation_id)
+            except Exception as err:
+                logger.warning('Shared cache write failed', extra={'key': key, 'error': repr(err), 'correlation_id': correlation_id})
+        if value is None:
+            return None
+
+    if use_l1:
+        _l1_put(key, value, ttl)
+    return value
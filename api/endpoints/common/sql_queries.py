@@ -76,50 +76,9 @@ UPDATE_PROJECT_TASK_PROGRESS_SQL = f'''
 
 
 # region project
-BASE_PROJECT_SELECT_SQL = '''
-    SELECT row_to_json(project_row) 
-    from (
-        select 
-            id, 
-            name,
-            short_name,
-            description,
-            project_page_url,
-            created,
-            modified,
-            visibility,
-            status,
-            (
-                select coalesce(json_agg(task_row), '[]'::json)
-                from (
-                    select 
-                        id,
-                        name,
-                        short_name,
-                        description,
-                        task_page_url,
-                        created,
-                        modified,
-                        task_type_id,
-                        earliest_start_date,
-                        closing_date,
-                        signup_status,
-                        visibility,
-                        external_system_id,                       
-                        external_task_id, 
-                        base_url,                      
-                        status                         
-                    from public.projects_projecttask task
-                    where task.project_id = project.id
-                        AND task.status != 'planned'
-                    order by created
-                    ) task_row
-            ) as tasks
-        from public.projects_project project
-        where project.status != 'planned'
-        order by created
-        ) project_row
-'''
+BASE_PROJECT_SELECT_SQL = sql_t.base_project_select_template.render()
+
+LIST_PROJECTS_PAGE_SQL = sql_t.base_project_select_template.render(paginated=True)
 
 MINIMAL_PROJECT_SELECT_SQL = '''
     SELECT row_to_json(project_row) 
@@ -163,6 +122,7 @@ TASKS_BY_EXTERNAL_ID_SQL = sql_t.project_tasks_by_external_id.render(extra_colum
 
 TASK_INVITE_OR_REMIND_BASE = '''
     SELECT
+        pt.id as project_task_id,
         description as task_description,
         tt.short_name as task_type_name,
         p.short_name as project_short_name
@@ -275,6 +235,216 @@ get_project_status_for_user_sql = {
 }
 
 
+PROJECT_STATUS_VERSION_SQL = """
+    SELECT
+        (extract(epoch FROM cat.modified) * 1000000)::bigint AS catalogue_modified,
+        cat.row_count AS catalogue_count,
+        (extract(epoch FROM usr.modified) * 1000000)::bigint AS user_modified,
+        usr.row_count AS user_count,
+        (SELECT version FROM public.project_status_warmed WHERE user_id = %s) AS warmed_version
+    FROM
+        (
+            SELECT COALESCE(max(modified), 'epoch'::timestamptz) AS modified, count(*) AS row_count
+            FROM (
+                SELECT modified FROM public.projects_project
+                UNION ALL
+                SELECT modified FROM public.projects_projecttask
+                UNION ALL
+                SELECT modified FROM public.projects_projectgroupvisibility
+                UNION ALL
+                SELECT modified FROM public.projects_projecttaskgroupvisibility
+                UNION ALL
+                SELECT modified FROM public.projects_externalsystem
+                UNION ALL
+                SELECT modified FROM public.projects_tasktype
+                UNION ALL
+                SELECT modified FROM public.projects_usergroup
+            ) catalogue_rows
+        ) cat,
+        (
+            SELECT COALESCE(max(modified), 'epoch'::timestamptz) AS modified, count(*) AS row_count
+            FROM (
+                SELECT modified FROM public.projects_user WHERE id = %s
+                UNION ALL
+                SELECT modified FROM public.projects_usergroupmembership WHERE user_id = %s
+                UNION ALL
+                SELECT modified FROM public.projects_userproject WHERE user_id = %s
+                UNION ALL
+                SELECT ut.modified
+                FROM public.projects_usertask ut
+                JOIN public.projects_userproject up ON ut.user_project_id = up.id
+                WHERE up.user_id = %s
+            ) user_rows
+        ) usr
+"""
+
+# Records the version of the project status document saved in the shared cache for a user; parameters: user_id, version
+MARK_PROJECT_STATUS_WARMED_SQL = """
+    INSERT INTO public.project_status_warmed (user_id, version, modified)
+    VALUES (%s, %s, now())
+    ON CONFLICT (user_id) DO UPDATE SET version = EXCLUDED.version, modified = EXCLUDED.modified
+"""
+
+DELETE_PROJECT_STATUS_WARMED_SQL = """
+    DELETE FROM public.project_status_warmed
+    WHERE user_id = ANY(%s::uuid[])
+"""
+
+
+# Rows of the catalogue and of a user's data modified after given watermarks (microseconds since epoch, as in
+# PROJECT_STATUS_VERSION_SQL). Parameters: catalogue watermark (x14), then (user watermark, user watermark, user_id) for each of
+# the four user subqueries
+PROJECT_STATUS_CHANGES_SQL = """
+    SELECT 'catalogue' AS scope, 'project' AS kind, id AS project_id, NULL::uuid AS project_task_id,
+        (extract(epoch FROM created) * 1000000)::bigint > %s AS is_new
+    FROM public.projects_project
+    WHERE (extract(epoch FROM modified) * 1000000)::bigint > %s
+    UNION ALL
+    SELECT 'catalogue', 'project_task', project_id, id,
+        (extract(epoch FROM created) * 1000000)::bigint > %s
+    FROM public.projects_projecttask
+    WHERE (extract(epoch FROM modified) * 1000000)::bigint > %s
+    UNION ALL
+    SELECT 'catalogue', 'project_visibility', project_id, NULL::uuid,
+        (extract(epoch FROM created) * 1000000)::bigint > %s
+    FROM public.projects_projectgroupvisibility
+    WHERE (extract(epoch FROM modified) * 1000000)::bigint > %s
+    UNION ALL
+    SELECT 'catalogue', 'project_task_visibility', pt.project_id, ptgv.project_task_id,
+        (extract(epoch FROM ptgv.created) * 1000000)::bigint > %s
+    FROM public.projects_projecttaskgroupvisibility ptgv
+    JOIN public.projects_projecttask pt ON ptgv.project_task_id = pt.id
+    WHERE (extract(epoch FROM ptgv.modified) * 1000000)::bigint > %s
+    UNION ALL
+    SELECT 'catalogue', 'external_system', NULL::uuid, NULL::uuid,
+        (extract(epoch FROM created) * 1000000)::bigint > %s
+    FROM public.projects_externalsystem
+    WHERE (extract(epoch FROM modified) * 1000000)::bigint > %s
+    UNION ALL
+    SELECT 'catalogue', 'task_type', NULL::uuid, NULL::uuid,
+        (extract(epoch FROM created) * 1000000)::bigint > %s
+    FROM public.projects_tasktype
+    WHERE (extract(epoch FROM modified) * 1000000)::bigint > %s
+    UNION ALL
+    SELECT 'catalogue', 'user_group', NULL::uuid, NULL::uuid,
+        (extract(epoch FROM created) * 1000000)::bigint > %s
+    FROM public.projects_usergroup
+    WHERE (extract(epoch FROM modified) * 1000000)::bigint > %s
+    UNION ALL
+    SELECT 'user', 'user', NULL::uuid, NULL::uuid,
+        (extract(epoch FROM created) * 1000000)::bigint > %s
+    FROM public.projects_user
+    WHERE (extract(epoch FROM modified) * 1000000)::bigint > %s AND id = %s
+    UNION ALL
+    SELECT 'user', 'user_group_membership', NULL::uuid, NULL::uuid,
+        (extract(epoch FROM created) * 1000000)::bigint > %s
+    FROM public.projects_usergroupmembership
+    WHERE (extract(epoch FROM modified) * 1000000)::bigint > %s AND user_id = %s
+    UNION ALL
+    SELECT 'user', 'user_project', project_id, NULL::uuid,
+        (extract(epoch FROM created) * 1000000)::bigint > %s
+    FROM public.projects_userproject
+    WHERE (extract(epoch FROM modified) * 1000000)::bigint > %s AND user_id = %s
+    UNION ALL
+    SELECT 'user', 'user_task', up.project_id, ut.project_task_id,
+        (extract(epoch FROM ut.created) * 1000000)::bigint > %s
+    FROM public.projects_usertask ut
+    JOIN public.projects_userproject up ON ut.user_project_id = up.id
+    WHERE (extract(epoch FROM ut.modified) * 1000000)::bigint > %s AND up.user_id = %s
+"""
+
+
+# Evaluates the rules of ProjectStatusForUser (calculate_project_visibility, calculate_task_visibility and calculate_task_signup)
+# for every user at once and aggregates the ids of users for whom a project task is visible, open for signup or signed up
+PROJECT_TASK_AUDIENCE_SQL = """
+    WITH task AS (
+        SELECT
+            pt.id,
+            pt.status,
+            pt.visibility,
+            pt.signup_status,
+            pt.testing_group_id,
+            p.id AS project_id,
+            p.status AS project_status,
+            p.visibility AS project_visibility,
+            p.testing_group_id AS project_testing_group_id
+        FROM public.projects_projecttask pt
+        JOIN public.projects_project p ON pt.project_id = p.id
+        WHERE pt.id = %s
+            AND pt.status != 'planned'
+            AND p.status != 'planned'
+    ),
+    project_testgroup_users AS (
+        SELECT DISTINCT ugm.user_id
+        FROM task
+        JOIN public.projects_usergroupmembership ugm ON ugm.user_group_id = task.project_testing_group_id
+    ),
+    project_group_users AS (
+        SELECT DISTINCT ugm.user_id
+        FROM task
+        JOIN public.projects_projectgroupvisibility pgv ON pgv.project_id = task.project_id
+        JOIN public.projects_usergroupmembership ugm ON ugm.user_group_id = pgv.user_group_id
+    ),
+    projecttask_testgroup_users AS (
+        SELECT DISTINCT ugm.user_id
+        FROM task
+        JOIN public.projects_usergroupmembership ugm ON ugm.user_group_id = task.testing_group_id
+    ),
+    projecttask_group_users AS (
+        SELECT DISTINCT ugm.user_id
+        FROM task
+        JOIN public.projects_projecttaskgroupvisibility ptgv ON ptgv.project_task_id = task.id
+        JOIN public.projects_usergroupmembership ugm ON ugm.user_group_id = ptgv.user_group_id
+    ),
+    signedup_users AS (
+        SELECT DISTINCT up.user_id
+        FROM task
+        JOIN public.projects_usertask ut ON ut.project_task_id = task.id
+        JOIN public.projects_userproject up ON ut.user_project_id = up.id
+    ),
+    project_visibility AS (
+        SELECT
+            u.id AS user_id,
+            (
+                (task.project_status IN ('testing', 'active') AND ptu.user_id IS NOT NULL) OR
+                (task.project_status IN ('active', 'complete') AND (task.project_visibility = 'public' OR pgu.user_id IS NOT NULL))
+            ) AS project_is_visible,
+            pttu.user_id IS NOT NULL AS in_task_testgroup,
+            ptgu.user_id IS NOT NULL AS in_task_group,
+            su.user_id IS NOT NULL AS user_is_signedup
+        FROM task
+        CROSS JOIN public.projects_user u
+        LEFT JOIN project_testgroup_users ptu ON ptu.user_id = u.id
+        LEFT JOIN project_group_users pgu ON pgu.user_id = u.id
+        LEFT JOIN projecttask_testgroup_users pttu ON pttu.user_id = u.id
+        LEFT JOIN projecttask_group_users ptgu ON ptgu.user_id = u.id
+        LEFT JOIN signedup_users su ON su.user_id = u.id
+    ),
+    task_visibility AS (
+        SELECT
+            pv.user_id,
+            (
+                (pv.project_is_visible AND task.status = 'testing' AND pv.in_task_testgroup) OR
+                (task.status IN ('active', 'complete') AND (pv.in_task_group OR task.visibility = 'public'))
+            ) AS task_is_visible,
+            pv.user_is_signedup
+        FROM project_visibility pv
+        CROSS JOIN task
+    )
+    SELECT
+        task.id AS project_task_id,
+        COALESCE(array_agg(tv.user_id) FILTER (WHERE tv.task_is_visible), '{}') AS visible_user_ids,
+        COALESCE(array_agg(tv.user_id) FILTER (
+            WHERE tv.task_is_visible AND NOT tv.user_is_signedup AND
+                ((task.status = 'active' AND task.signup_status = 'open') OR task.status = 'testing')
+        ), '{}') AS signup_available_user_ids,
+        COALESCE(array_agg(tv.user_id) FILTER (WHERE tv.task_is_visible AND tv.user_is_signedup), '{}') AS signedup_user_ids
+    FROM task
+    LEFT JOIN task_visibility tv ON TRUE
+    GROUP BY task.id
+"""
+
+
 GET_PROJECT_BY_PROJECT_TASK_ID_SQL = '''
     SELECT project_id 
     FROM public.projects_projecttask
@@ -297,43 +467,35 @@ BASE_USER_SELECT_SQL = '''
         u.auth0_id,
         u.crm_id,
         u.status,
-        (
-            SELECT EXISTS (
-				SELECT 1 FROM projects_usergroupmembership ugm
-				JOIN projects_usergroup ug ON ug.id = ugm.user_group_id
-				WHERE ugm.user_id = u.id AND ug.demo = TRUE
-			)
-		) as has_demo_project,
-		(
-		    SELECT EXISTS (
-				SELECT 1 FROM projects_usergroupmembership ugm
-				JOIN projects_usergroup ug ON ug.id = ugm.user_group_id
-				WHERE ugm.user_id = u.id AND ug.demo = FALSE
-			)
-		) as has_live_project
+        COALESCE(f.has_demo_project, FALSE) as has_demo_project,
+        COALESCE(f.has_live_project, FALSE) as has_live_project
     FROM
         public.projects_user u
+        LEFT JOIN public.user_project_flags f ON f.user_id = u.id
     '''
 
 
-GET_USER_BY_ANON_PROJECT_SPECIFIC_USER_ID_SQL = f'''
+GET_USERS_BY_IDS_SQL = f'''
     {BASE_USER_SELECT_SQL}
-        JOIN public.projects_userproject as up on up.user_id = u.id
-    WHERE
-        up.anon_project_specific_user_id = (%s)
+    WHERE u.id = ANY(%s::uuid[])
 '''
 
 
-GET_USER_BY_ANY_ANON_ID_SQL = f'''
+GET_USERS_BY_EMAILS_SQL = f'''
     {BASE_USER_SELECT_SQL}
-        JOIN public.projects_userproject as up on up.user_id = u.id
-        JOIN public.projects_usertask as ut on ut.user_project_id = up.id
-    WHERE
-        up.anon_project_specific_user_id = (%s) OR
-        ut.anon_user_task_id = (%s)
+    WHERE u.email = ANY(%s)
 '''
 
 
+GET_USERS_BY_ANON_IDS_SQL = f'''
+    SELECT
+        m.anon_id,
+        users.*
+    FROM public.anon_id_map m
+        JOIN ({BASE_USER_SELECT_SQL}) users ON users.id = m.user_id
+    WHERE m.anon_id = ANY(%s::uuid[]) AND m.kind = ANY(%s)
+'''
+
 CREATE_USER_SQL = '''
     INSERT INTO public.projects_user (
         id,
@@ -346,7 +508,74 @@ CREATE_USER_SQL = '''
         country_code,
         auth0_id,
         status
-    ) VALUES ( %s, %s, %s, %s, %s, %s, %s, %s, %s, %s );
+    ) VALUES ( %s, %s, %s, %s, %s, %s, %s, %s, %s, %s )
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id;
+'''
+
+USER_IMPORT_COLUMNS = ('id', 'email', 'title', 'first_name', 'last_name', 'country_code', 'auth0_id', 'status')
+
+CREATE_USER_IMPORT_STAGING_SQL = f'''
+    CREATE TEMPORARY TABLE user_import_staging (
+        row_number integer PRIMARY KEY,
+        {', '.join(f'{c} text' for c in USER_IMPORT_COLUMNS)}
+    ) ON COMMIT DROP;
+'''
+
+COPY_USER_IMPORT_STAGING_SQL = f'''
+    COPY user_import_staging (row_number, {', '.join(USER_IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)
+'''
+
+IMPORT_USERS_FROM_STAGING_SQL = '''
+    WITH staged AS (
+        SELECT
+            s.row_number,
+            s.id,
+            CASE WHEN s.id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$' THEN s.id::uuid END AS user_id,
+            lower(trim(s.email)) AS email,
+            NULLIF(trim(s.title), '') AS title,
+            NULLIF(trim(s.first_name), '') AS first_name,
+            NULLIF(trim(s.last_name), '') AS last_name,
+            NULLIF(trim(s.country_code), '') AS country_code,
+            NULLIF(trim(s.auth0_id), '') AS auth0_id,
+            NULLIF(trim(s.status), '') AS status
+        FROM user_import_staging s
+    ), validated AS (
+        SELECT
+            staged.*,
+            CASE
+                WHEN user_id IS NULL THEN 'invalid id'
+                WHEN email IS NULL OR email !~ '^[^@[:space:]]+@[^@[:space:]]+[.][^@[:space:]]+$' THEN 'invalid email'
+                WHEN country_code IS NULL OR NOT (country_code = ANY(%(country_codes)s::text[])) THEN 'invalid country_code'
+                WHEN row_number() OVER (PARTITION BY user_id ORDER BY row_number) > 1 THEN 'duplicate id in import'
+                WHEN row_number() OVER (PARTITION BY email ORDER BY row_number) > 1 THEN 'duplicate email in import'
+                WHEN EXISTS (SELECT 1 FROM public.projects_user u WHERE u.id = staged.user_id OR u.email = staged.email) THEN 'user already exists'
+            END AS error
+        FROM staged
+    ), inserted AS (
+        INSERT INTO public.projects_user (
+            id, created, modified, email, title, first_name, last_name, country_code, auth0_id, status
+        )
+        SELECT user_id, %(created)s, %(created)s, email, title, first_name, last_name, country_code, auth0_id, status
+        FROM validated
+        WHERE error IS NULL
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    )
+    SELECT
+        v.row_number,
+        COALESCE(v.user_id::text, v.id) AS id,
+        v.email,
+        v.title,
+        v.first_name,
+        v.last_name,
+        v.country_code,
+        v.auth0_id,
+        v.status,
+        CASE WHEN i.id IS NULL THEN COALESCE(v.error, 'user already exists') END AS error
+    FROM validated v
+        LEFT JOIN inserted i ON i.id = v.user_id
+    ORDER BY v.row_number
 '''
 # endregion
 
@@ -361,15 +590,31 @@ WHERE
 '''
 
 CREATE_USER_EXTERNAL_ACCOUNT_SQL = '''
-    INSERT INTO public.projects_userexternalaccount (
-        id,
-        created,
-        modified,
-        external_system_id,
-        user_id,
-        external_user_id,
-        status
-    ) VALUES ( %s, %s, %s, %s, %s, %s, %s );
+    WITH parent AS (
+        SELECT EXISTS (SELECT 1 FROM public.projects_user WHERE id = %(user_id)s) AS user_exists
+    ), inserted AS (
+        INSERT INTO public.projects_userexternalaccount (
+            id,
+            created,
+            modified,
+            external_system_id,
+            user_id,
+            external_user_id,
+            status
+        )
+        SELECT %(id)s, %(created)s, %(created)s, %(external_system_id)s, %(user_id)s, %(external_user_id)s, %(status)s
+        FROM parent
+        WHERE parent.user_exists AND NOT EXISTS (
+            SELECT 1 FROM public.projects_userexternalaccount
+            WHERE user_id = %(user_id)s AND external_system_id = %(external_system_id)s
+        )
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    )
+    SELECT
+        parent.user_exists,
+        EXISTS (SELECT 1 FROM inserted) AS inserted
+    FROM parent;
 '''
 # endregion
 
@@ -402,24 +647,6 @@ CREATE_USER_GROUP_SQL = '''
 
 
 # region user_group_membership
-SQL_USER = """
-    SELECT id
-    FROM public.projects_user
-    WHERE id = %s
-"""
-
-SQL_USER_GROUP = """
-    SELECT id
-    FROM public.projects_usergroup
-    WHERE id = %s
-"""
-
-SQL_USER_GROUP_MEMBERSHIP = """
-    SELECT id
-    FROM public.projects_usergroupmembership
-    WHERE user_id = %s and user_group_id = %s
-"""
-
 SQL_USER_IDS_IN_USER_GROUP = """
     SELECT user_id
     FROM public.projects_usergroupmembership
@@ -434,6 +661,36 @@ INSERT_USER_GROUP_MEMBERSHIP_SQL = '''
         user_id,
         user_group_id
     ) VALUES ( %s, %s, %s, %s, %s );'''
+
+
+CREATE_USER_GROUP_MEMBERSHIP_SQL = '''
+    WITH parent AS (
+        SELECT
+            EXISTS (SELECT 1 FROM public.projects_user WHERE id = %(user_id)s) AS user_exists,
+            EXISTS (SELECT 1 FROM public.projects_usergroup WHERE id = %(user_group_id)s) AS user_group_exists
+    ), inserted AS (
+        INSERT INTO public.projects_usergroupmembership (
+            id,
+            created,
+            modified,
+            user_id,
+            user_group_id
+        )
+        SELECT %(id)s, %(created)s, %(created)s, %(user_id)s, %(user_group_id)s
+        FROM parent
+        WHERE parent.user_exists AND parent.user_group_exists AND NOT EXISTS (
+            SELECT 1 FROM public.projects_usergroupmembership
+            WHERE user_id = %(user_id)s AND user_group_id = %(user_group_id)s
+        )
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    )
+    SELECT
+        parent.user_exists,
+        parent.user_group_exists,
+        EXISTS (SELECT 1 FROM inserted) AS inserted
+    FROM parent;
+'''
 # endregion
 
 
@@ -452,6 +709,25 @@ LIST_USER_PROJECTS_SQL = '''
     WHERE user_id = %s
 '''
 
+LIST_USER_PROJECTS_PAGE_SQL = '''
+    SELECT 
+        id,
+        user_id,
+        project_id,
+        created,
+        modified,               
+        status,
+        anon_project_specific_user_id,
+        created as page_created,
+        id as page_id
+    FROM 
+        public.projects_userproject
+    WHERE user_id = %s
+        AND (created, id) > (%s, %s)
+    ORDER BY created, id
+    LIMIT %s
+'''
+
 GET_EXISTING_USER_PROJECT_ID_SQL = """
 SELECT 
     id,
@@ -463,18 +739,83 @@ WHERE
 """
 
 CREATE_USER_PROJECT_SQL = '''
-    INSERT INTO public.projects_userproject (
-        id,
-        created,
-        modified,
-        user_id,
-        project_id,
-        status,
-        anon_project_specific_user_id
-    ) VALUES ( %s, %s, %s, %s, %s, %s, %s );
+    WITH parent AS (
+        SELECT EXISTS (SELECT 1 FROM public.projects_user WHERE id = %(user_id)s) AS user_exists
+    ), existing AS (
+        SELECT id, anon_project_specific_user_id
+        FROM public.projects_userproject
+        WHERE project_id = %(project_id)s AND user_id = %(user_id)s
+    ), inserted AS (
+        INSERT INTO public.projects_userproject (
+            id,
+            created,
+            modified,
+            user_id,
+            project_id,
+            status,
+            anon_project_specific_user_id
+        )
+        SELECT %(id)s, %(created)s, %(created)s, %(user_id)s, %(project_id)s, %(status)s, %(anon_project_specific_user_id)s
+        FROM parent
+        WHERE parent.user_exists AND NOT EXISTS (SELECT 1 FROM existing)
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    )
+    SELECT
+        parent.user_exists,
+        EXISTS (SELECT 1 FROM inserted) AS inserted,
+        (SELECT row_to_json(e) FROM existing e LIMIT 1) AS existing
+    FROM parent;
 '''
 
 
+CREATE_USER_PROJECTS_IF_NOT_EXIST_SQL = '''
+    WITH input AS (
+        SELECT *
+        FROM unnest(
+            %(user_ids)s::uuid[],
+            %(user_project_ids)s::uuid[],
+            %(anon_project_specific_user_ids)s::uuid[]
+        ) AS i (user_id, user_project_id, anon_project_specific_user_id)
+    ), u AS (
+        SELECT i.*
+        FROM input i
+        JOIN public.projects_user u on u.id = i.user_id
+    ), existing AS (
+        SELECT up.user_id, up.id, up.anon_project_specific_user_id
+        FROM public.projects_userproject up
+        JOIN u on up.user_id = u.user_id
+        WHERE up.project_id = %(project_id)s
+    ), inserted AS (
+        INSERT INTO public.projects_userproject (
+            id,
+            created,
+            modified,
+            user_id,
+            project_id,
+            status,
+            anon_project_specific_user_id
+        )
+        SELECT u.user_project_id, %(created)s, %(created)s, u.user_id, %(project_id)s, 'active', u.anon_project_specific_user_id
+        FROM u
+        WHERE NOT EXISTS (SELECT 1 FROM existing e WHERE e.user_id = u.user_id)
+        ON CONFLICT DO NOTHING
+        RETURNING user_id, id, anon_project_specific_user_id
+    ), up AS (
+        SELECT user_id, id, anon_project_specific_user_id FROM existing
+        UNION ALL
+        SELECT user_id, id, anon_project_specific_user_id FROM inserted
+    )
+    SELECT
+        i.user_id,
+        u.user_id IS NOT NULL AS user_exists,
+        up.id,
+        up.anon_project_specific_user_id
+    FROM input i
+    LEFT JOIN u on u.user_id = i.user_id
+    LEFT JOIN up on up.user_id = i.user_id
+'''
+
 LIST_USERS_BY_PROJECT_SQL = '''
     SELECT 
         up.anon_project_specific_user_id,
@@ -489,19 +830,30 @@ LIST_USERS_BY_PROJECT_SQL = '''
         public.projects_user u on up.user_id = u.id
     WHERE up.project_id = %s
 '''
-# endregion
 
-
-# region user_task
-ANON_USER_TASK_ID_2_ID_SQL = '''
+LIST_USERS_BY_PROJECT_PAGE_SQL = '''
     SELECT 
-        ut.id, up.user_id              
+        up.anon_project_specific_user_id,
+        up.user_id,
+        u.email,
+        u.first_name,
+        u.last_name,
+        up.project_id,
+        up.created as page_created,
+        up.id as page_id
     FROM 
-        public.projects_usertask ut
-    JOIN public.projects_userproject up on up.id = ut.user_project_id
-    WHERE ut.anon_user_task_id = %s
+        public.projects_userproject up
+    JOIN 
+        public.projects_user u on up.user_id = u.id
+    WHERE up.project_id = %s
+        AND (up.created, up.id) > (%s, %s)
+    ORDER BY up.created, up.id
+    LIMIT %s
 '''
+# endregion
+
 
+# region user_task
 GET_USER_TASK_SQL = '''
     SELECT 
         ut.id,
@@ -534,8 +886,18 @@ UPDATE_USER_TASK_STATUS = '''
     WHERE id = (%s);
 '''
 
-LIST_USER_TASKS_SQL = '''
-    SELECT 
+LIST_USER_TASKS_COLUMNS = '''
+    SELECT
+        u.first_name,
+        u.last_name,
+        u.email,
+        pt.base_url,
+        pt.user_specific_url,
+        ut.user_task_url,
+        pt.anonymise_url,
+        tt.short_name as task_type_name,
+        pt.external_task_id,
+        up.anon_project_specific_user_id,
         up.user_id,
         ut.user_project_id,
         up.status as user_project_status,
@@ -543,28 +905,61 @@ LIST_USER_TASKS_SQL = '''
         pt.description as task_description,
         ut.id as user_task_id,
         ut.created,
-        ut.modified,               
+        ut.modified,
         ut.status,
         ut.consented,
         ut.anon_user_task_id,
         es.short_name as task_provider_name,
-        ut.progress_info,
-        pt.base_url,
-        pt.external_task_id,
-        pt.user_specific_url,
-        ut.user_task_url,
-        pt.anonymise_url,
-        up.anon_project_specific_user_id
-    FROM 
-        public.projects_usertask ut
-        inner join public.projects_projecttask pt on pt.id = ut.project_task_id
-        inner join public.projects_externalsystem es on pt.external_system_id = es.id
-        inner join public.projects_userproject up on up.id = ut.user_project_id
-    WHERE up.user_id = %s
+        ut.progress_info
+'''
+
+LIST_USER_TASKS_SELECT = f'''
+    {LIST_USER_TASKS_COLUMNS}
+    FROM
+        (SELECT id, first_name, last_name, email FROM public.projects_user WHERE id = %s) u
+        left join (
+            public.projects_usertask ut
+            inner join public.projects_projecttask pt on pt.id = ut.project_task_id
+            inner join public.projects_externalsystem es on pt.external_system_id = es.id
+            inner join public.projects_tasktype tt on pt.task_type_id = tt.id
+            inner join public.projects_userproject up on up.id = ut.user_project_id
+        ) on up.user_id = u.id
+'''
+
+# rows are returned as tuples, in the column order above; a user without user tasks gets a single row with null user task
+# columns, and a user that does not exist gets no rows
+LIST_USER_TASKS_SQL = f'''
+    {LIST_USER_TASKS_SELECT}
     ORDER BY ut.created
 '''
 
 
+# each user project's tasks are read in (created, id) order from projects_usertask_userproject_created_id_idx, up to a page
+# per user project, and only those are merged and sorted. Parameters: user_id, created and id to start after, page size
+# plus one (twice)
+LIST_USER_TASKS_PAGE_SQL = f'''
+    {LIST_USER_TASKS_COLUMNS}
+    FROM
+        (SELECT id, first_name, last_name, email FROM public.projects_user WHERE id = %s) u
+        left join (
+            public.projects_userproject up
+            cross join lateral (
+                SELECT *
+                FROM public.projects_usertask
+                WHERE user_project_id = up.id
+                    AND (created, id) > (%s, %s)
+                ORDER BY created, id
+                LIMIT %s
+            ) ut
+            inner join public.projects_projecttask pt on pt.id = ut.project_task_id
+            inner join public.projects_externalsystem es on pt.external_system_id = es.id
+            inner join public.projects_tasktype tt on pt.task_type_id = tt.id
+        ) on up.user_id = u.id
+    ORDER BY ut.created, ut.id
+    LIMIT %s
+'''
+
+
 CHECK_IF_USER_TASK_EXISTS_SQL = '''
 SELECT 
     ut.id
@@ -589,6 +984,135 @@ CREATE_USER_TASK_SQL = '''
     ) VALUES ( %s, %s, %s, %s, %s, %s, %s, %s, %s );
 '''
 
+CREATE_USER_TASK_PIPELINE_SQL = '''
+    WITH pt AS (
+        SELECT
+            pt.id,
+            pt.project_id,
+            pt.base_url,
+            pt.external_task_id,
+            pt.user_specific_url,
+            pt.anonymise_url,
+            es.short_name as task_provider_name,
+            tt.short_name as task_type_name
+        FROM public.projects_projecttask pt
+        JOIN public.projects_externalsystem es on pt.external_system_id = es.id
+        JOIN public.projects_tasktype tt on pt.task_type_id = tt.id
+        WHERE pt.id = %(project_task_id)s
+    ), u AS (
+        SELECT id, first_name, last_name, email
+        FROM public.projects_user
+        WHERE id = %(user_id)s
+    ), existing_up AS (
+        SELECT up.id, up.anon_project_specific_user_id
+        FROM public.projects_userproject up
+        JOIN pt on up.project_id = pt.project_id
+        WHERE up.user_id = %(user_id)s
+    ), inserted_up AS (
+        INSERT INTO public.projects_userproject (
+            id,
+            created,
+            modified,
+            user_id,
+            project_id,
+            status,
+            anon_project_specific_user_id
+        )
+        SELECT %(user_project_id)s, %(user_project_created)s, %(user_project_created)s, u.id, pt.project_id, 'active',
+            %(anon_project_specific_user_id)s
+        FROM u, pt
+        WHERE NOT EXISTS (SELECT 1 FROM existing_up)
+        ON CONFLICT DO NOTHING
+        RETURNING id, anon_project_specific_user_id
+    ), up AS (
+        SELECT id, anon_project_specific_user_id FROM existing_up
+        UNION ALL
+        SELECT id, anon_project_specific_user_id FROM inserted_up
+    ), existing_ut AS (
+        SELECT ut.id
+        FROM public.projects_usertask ut
+        JOIN existing_up on ut.user_project_id = existing_up.id
+        WHERE ut.project_task_id = %(project_task_id)s
+    ), inserted_ut AS (
+        INSERT INTO public.projects_usertask (
+            id,
+            created,
+            modified,
+            user_project_id,
+            project_task_id,
+            status,
+            consented,
+            anon_user_task_id
+        )
+        SELECT %(id)s, %(created)s, %(created)s, up.id, pt.id, %(status)s, %(consented)s, %(anon_user_task_id)s
+        FROM up, pt
+        WHERE NOT EXISTS (SELECT 1 FROM existing_ut)
+        RETURNING id
+    )
+    SELECT
+        (SELECT row_to_json(pt) FROM pt) AS project_task,
+        (SELECT row_to_json(u) FROM u) AS user_details,
+        (SELECT row_to_json(up) FROM up LIMIT 1) AS user_project,
+        (SELECT id FROM existing_ut LIMIT 1) AS existing_user_task_id,
+        EXISTS (SELECT 1 FROM inserted_ut) AS inserted
+'''
+
+SET_USER_TASK_URL_SQL = '''
+    UPDATE public.projects_usertask
+    SET user_task_url = %s
+    WHERE id = %s
+'''
+
+CREATE_USER_TASKS_FOR_PROJECT_TASK_SQL = '''
+    WITH input AS (
+        SELECT *
+        FROM unnest(
+            %(user_ids)s::uuid[],
+            %(user_task_ids)s::uuid[],
+            %(anon_user_task_ids)s::uuid[],
+            %(user_task_urls)s::text[]
+        ) AS i (user_id, user_task_id, anon_user_task_id, user_task_url)
+    ), up AS (
+        SELECT i.*, up.id AS user_project_id, u.first_name, u.last_name, u.email
+        FROM input i
+        JOIN public.projects_userproject up on up.user_id = i.user_id
+        JOIN public.projects_user u on u.id = i.user_id
+        WHERE up.project_id = %(project_id)s
+    ), existing AS (
+        SELECT DISTINCT ON (up.user_id) up.user_id, ut.id
+        FROM public.projects_usertask ut
+        JOIN up on ut.user_project_id = up.user_project_id
+        WHERE ut.project_task_id = %(project_task_id)s
+    ), inserted AS (
+        INSERT INTO public.projects_usertask (
+            id,
+            created,
+            modified,
+            user_project_id,
+            project_task_id,
+            status,
+            consented,
+            anon_user_task_id,
+            user_task_url
+        )
+        SELECT up.user_task_id, %(created)s, %(created)s, up.user_project_id, %(project_task_id)s, %(status)s, %(consented)s,
+            up.anon_user_task_id, up.user_task_url
+        FROM up
+        WHERE NOT EXISTS (SELECT 1 FROM existing e WHERE e.user_id = up.user_id)
+        RETURNING id
+    )
+    SELECT
+        up.user_id,
+        up.first_name,
+        up.last_name,
+        up.email,
+        e.id AS existing_user_task_id,
+        ins.id IS NOT NULL AS inserted
+    FROM up
+    LEFT JOIN existing e on e.user_id = up.user_id
+    LEFT JOIN inserted ins on ins.id = up.user_task_id
+'''
+
 DELETE_USER_TASKS_FOR_PROJECT_TASK_SQL = '''
     DELETE FROM public.projects_usertask
     WHERE project_task_id = %s
@@ -643,3 +1167,97 @@ USER_GROUP_FOR_PROJECT_TASK = '''
     WHERE project_task_id = %s
 '''
 # endregion
+
+
+# region search
+# these expressions must match those of the indexes in api/local/database-view-sql/indexes_search_create.sql
+PROJECT_SEARCH_VECTOR = "to_tsvector('english', coalesce(p.name, '') || ' ' || coalesce(p.description, ''))"
+PROJECT_TASK_SEARCH_VECTOR = "to_tsvector('english', coalesce(pt.description, ''))"
+USER_SEARCH_VECTOR = "to_tsvector('simple', coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '') || ' ' || coalesce(u.email, ''))"
+
+SEARCH_PROJECTS_SQL = f'''
+    WITH search AS (
+        SELECT to_tsquery('english', %s) AS query, %s::text AS term, %s::text AS pattern
+    )
+    SELECT
+        p.id,
+        p.name,
+        p.short_name,
+        p.description,
+        p.status,
+        p.visibility,
+        ts_rank({PROJECT_SEARCH_VECTOR}, search.query) + similarity(p.name, search.term) AS rank
+    FROM public.projects_project p, search
+    WHERE {PROJECT_SEARCH_VECTOR} @@ search.query
+        OR p.name ILIKE search.pattern
+    ORDER BY rank DESC, p.created
+    LIMIT %s
+'''
+
+SEARCH_PROJECT_TASKS_SQL = f'''
+    WITH search AS (
+        SELECT to_tsquery('english', %s) AS query, %s::text AS term, %s::text AS pattern
+    )
+    SELECT
+        pt.id,
+        pt.project_id,
+        p.name AS project_name,
+        pt.description,
+        pt.status,
+        pt.external_task_id,
+        ts_rank({PROJECT_TASK_SEARCH_VECTOR}, search.query) + similarity(pt.description, search.term) AS rank
+    FROM public.projects_projecttask pt
+        JOIN public.projects_project p ON pt.project_id = p.id,
+        search
+    WHERE {PROJECT_TASK_SEARCH_VECTOR} @@ search.query
+        OR pt.description ILIKE search.pattern
+    ORDER BY rank DESC, pt.created
+    LIMIT %s
+'''
+
+SEARCH_USERS_SQL = f'''
+    WITH search AS (
+        SELECT to_tsquery('simple', %s) AS query, %s::text AS term, %s::text AS pattern
+    )
+    SELECT
+        u.id,
+        u.email,
+        u.first_name,
+        u.last_name,
+        u.status,
+        ts_rank({USER_SEARCH_VECTOR}, search.query)
+            + greatest(similarity(u.email, search.term), similarity(u.first_name || ' ' || u.last_name, search.term)) AS rank
+    FROM public.projects_user u, search
+    WHERE {USER_SEARCH_VECTOR} @@ search.query
+        OR u.email ILIKE search.pattern
+        OR u.first_name ILIKE search.pattern
+        OR u.last_name ILIKE search.pattern
+    ORDER BY rank DESC, u.created
+    LIMIT %s
+'''
+# endregion
+
+
+# region identity
+RESOLVE_ANON_ID_SQL = '''
+    SELECT
+        kind,
+        user_id,
+        user_project_id,
+        user_task_id
+    FROM public.anon_id_map
+    WHERE anon_id = %s
+'''
+
+RESOLVE_USER_OR_ANON_ID_SQL = f'''
+    {RESOLVE_ANON_ID_SQL}
+    UNION ALL
+    SELECT
+        'user',
+        id,
+        NULL,
+        NULL
+    FROM public.projects_user
+    WHERE id = %s
+'''
+# endregion
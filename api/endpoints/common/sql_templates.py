@@ -15,6 +15,64 @@ project_tasks_by_external_id = Template(
 )
 
 
+base_project_select_template = Template(
+    '''
+    SELECT row_to_json(project_row) 
+    from (
+        select 
+            id, 
+            name,
+            short_name,
+            description,
+            project_page_url,
+            created,
+            modified,
+            visibility,
+            status,
+            {%- if paginated %}
+            created as page_created,
+            id as page_id,
+            {%- endif %}
+            (
+                select coalesce(json_agg(task_row), '[]'::json)
+                from (
+                    select 
+                        id,
+                        name,
+                        short_name,
+                        description,
+                        task_page_url,
+                        created,
+                        modified,
+                        task_type_id,
+                        earliest_start_date,
+                        closing_date,
+                        signup_status,
+                        visibility,
+                        external_system_id,                       
+                        external_task_id, 
+                        base_url,                      
+                        status                         
+                    from public.projects_projecttask task
+                    where task.project_id = project.id
+                        AND task.status != 'planned'
+                    order by created
+                    ) task_row
+            ) as tasks
+        from public.projects_project project
+        where project.status != 'planned'
+        {%- if paginated %}
+            AND (created, id) > (%s, %s)
+        order by created, id
+        limit %s
+        {%- else %}
+        order by created
+        {%- endif %}
+        ) project_row
+'''
+)
+
+
 project_user_select_template = Template(
     '''
     SELECT row_to_json(project_row) 
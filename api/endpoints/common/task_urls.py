@@ -0,0 +1,228 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+Builds the user-specific urls of tasks.
+
+The layout of a task url (base url, parameter names and order, env parameter) is the same for every user of a project task.
+compile_task_url works that layout out once per project task, by calling the thiscovery_lib url helpers with placeholder
+values, and caches the result. Rendering the url for a user is then a matter of joining the literal parts of the template
+with that user's values. Each template is checked against the url helpers with a set of sample values before it is used,
+so that a helper that transforms values (e.g. url encodes them) makes compile_task_url fall back to calling the helpers.
+"""
+import functools
+import re
+
+import thiscovery_lib.utilities as utils
+
+
+USER_FIELDS = ('user_id', 'first_name', 'last_name', 'email')
+USER_TASK_FIELDS = ('user_task_id', 'anon_project_specific_user_id', 'anon_user_task_id')
+
+# values containing characters that a url helper might encode or otherwise transform
+SAMPLE_VALUES = {
+    'user_id': 'd1070e81-557e-40eb-a7ba-b951ddb7ebdc',
+    'first_name': "Zoë Anne-O'Neil",
+    'last_name': 'Smith & Sons/Jones',
+    'email': 'zoe.o+test@email.co.uk',
+    'user_task_id': '615ff0e6-0b41-4870-b9db-527345d1d9e5',
+    'anon_project_specific_user_id': '1406c523-6d1a-4a16-9b7a-c5a6e5e6a6f6',
+    'anon_user_task_id': '2a8b4c3e-1f2d-4e5a-9b6c-7d8e9f0a1b2c',
+}
+
+_MARKER = 'ThiscoveryUrlField'
+_MARKER_RE = re.compile(f'{_MARKER}([a-z_]+){_MARKER}')
+
+
+def _placeholder(field_name):
+    return f'{_MARKER}{field_name}{_MARKER}'
+
+
+class TaskUrlTemplate:
+    """
+    Compiled url of a project task: literal parts interleaved with the names of the user-specific values
+    """
+    __slots__ = ('literals', 'fields')
+
+    def __init__(self, url_with_placeholders):
+        parts = _MARKER_RE.split(url_with_placeholders)
+        self.literals = tuple(parts[0::2])
+        self.fields = tuple(parts[1::2])
+
+    def render(self, values):
+        """
+        Args:
+            values (dict): must contain a value for each name in self.fields
+
+        Returns:
+            Url string
+        """
+        literals = self.literals
+        chunks = [literals[0]]
+        for i, field in enumerate(self.fields, start=1):
+            chunks.append(str(values[field]))
+            chunks.append(literals[i])
+        return ''.join(chunks)
+
+
+class UncompiledTaskUrl:
+    """
+    Fallback used if the url helpers transform their input in a way that prevents compilation (e.g. url encoding)
+    """
+    __slots__ = ('base_url', 'anonymise_url', 'interview', 'external_task_id', 'project_task_id')
+
+    def __init__(self, base_url, anonymise_url, interview, external_task_id, project_task_id):
+        self.base_url = base_url
+        self.anonymise_url = anonymise_url
+        self.interview = interview
+        self.external_task_id = external_task_id
+        self.project_task_id = project_task_id
+
+    def render(self, values):
+        return _build_url(self.base_url, self.anonymise_url, self.interview, self.external_task_id, self.project_task_id, values)
+
+
+def _build_url(base_url, anonymise_url, interview, external_task_id, project_task_id, values):
+    if anonymise_url:
+        params = utils.create_anonymous_url_params(
+            base_url=base_url,
+            anon_project_specific_user_id=values['anon_project_specific_user_id'],
+            user_first_name=values['first_name'],
+            anon_user_task_id=values['anon_user_task_id'],
+            external_task_id=external_task_id,
+            project_task_id=project_task_id,
+        )
+    else:
+        params = utils.create_url_params(
+            base_url=base_url,
+            user_id=values['user_id'],
+            user_first_name=values['first_name'],
+            user_task_id=values['user_task_id'],
+            external_task_id=external_task_id,
+        )
+
+    if interview:
+        # add last name and email for use with Acuity Scheduler
+        params = f"{params}" \
+                 f"&last_name={values['last_name']}" \
+                 f"&email={values['email']}"
+
+    return f"{base_url}{params}{utils.non_prod_env_url_param()}"
+
+
+@functools.lru_cache(maxsize=2048)
+def compile_task_url(base_url, anonymise_url, interview, external_task_id, project_task_id):
+    """
+    Args:
+        base_url (str): base url of the project task (or user task url, for tasks with user-specific urls)
+        anonymise_url (bool):
+        interview (bool): whether task is an interview (url includes last name and email)
+        external_task_id:
+        project_task_id:
+
+    Returns:
+        TaskUrlTemplate, or UncompiledTaskUrl if compilation was not possible or the template does not reproduce the output
+        of the url helpers for SAMPLE_VALUES
+    """
+    uncompiled = UncompiledTaskUrl(base_url, anonymise_url, interview, external_task_id, project_task_id)
+    placeholders = {f: _placeholder(f) for f in (*USER_FIELDS, *USER_TASK_FIELDS)}
+    url_with_placeholders = _build_url(base_url, anonymise_url, interview, external_task_id, project_task_id, placeholders)
+    template = TaskUrlTemplate(url_with_placeholders)
+    if _MARKER in ''.join(template.literals) or not template.fields:
+        return uncompiled
+    if template.render(SAMPLE_VALUES) != uncompiled.render(SAMPLE_VALUES):
+        return uncompiled
+    return template
+
+
+def user_url_values(user_id, first_name, last_name, email):
+    """
+    Returns a dictionary of user values that can be passed to task_url; task_url updates its user task values in place, so the
+    same dictionary can be reused for all tasks of a user
+    """
+    return {
+        'user_id': user_id,
+        'first_name': first_name,
+        'last_name': last_name,
+        'email': email,
+        'user_task_id': None,
+        'anon_project_specific_user_id': None,
+        'anon_user_task_id': None,
+    }
+
+
+def task_url(values, base_url, user_specific_url, user_task_url, anonymise_url, task_type_name, external_task_id, project_task_id,
+             user_task_id, anon_project_specific_user_id, anon_user_task_id):
+    """
+    Args:
+        values (dict): output of user_url_values for the user the url is for
+        base_url: base url of the project task
+        user_specific_url (bool): if True, user_task_url is used instead of base_url
+        user_task_url:
+        anonymise_url (bool):
+        task_type_name:
+        external_task_id:
+        project_task_id:
+        user_task_id:
+        anon_project_specific_user_id:
+        anon_user_task_id:
+
+    Returns:
+        User-specific url of task or None if task has no url
+    """
+    if user_specific_url:
+        base_url = user_task_url
+    if not base_url:
+        return None
+    values['user_task_id'] = user_task_id
+    values['anon_project_specific_user_id'] = anon_project_specific_user_id
+    values['anon_user_task_id'] = anon_user_task_id
+    template = compile_task_url(base_url, bool(anonymise_url), task_type_name == 'interview', external_task_id, project_task_id)
+    return template.render(values)
+
+
+def append_task_urls(user_tasks, user_id, first_name, last_name, email):
+    """
+    Adds a 'url' key to each dictionary in user_tasks
+
+    Args:
+        user_tasks (list): dictionaries containing base_url, user_specific_url, user_task_url, anonymise_url, task_type_name,
+                external_task_id, project_task_id, user_task_id, anon_project_specific_user_id and anon_user_task_id
+        user_id:
+        first_name:
+        last_name:
+        email:
+
+    Returns:
+        user_tasks
+    """
+    values = user_url_values(user_id, first_name, last_name, email)
+    for ut in user_tasks:
+        ut['url'] = task_url(
+            values,
+            base_url=ut['base_url'],
+            user_specific_url=ut['user_specific_url'],
+            user_task_url=ut['user_task_url'],
+            anonymise_url=ut['anonymise_url'],
+            task_type_name=ut['task_type_name'],
+            external_task_id=ut['external_task_id'],
+            project_task_id=ut['project_task_id'],
+            user_task_id=ut['user_task_id'],
+            anon_project_specific_user_id=ut['anon_project_specific_user_id'],
+            anon_user_task_id=ut['anon_user_task_id'],
+        )
+    return user_tasks
@@ -31,10 +31,12 @@ from thiscovery_lib.notifications import get_notifications, NotificationType, No
 from common.pg_utilities import execute_query
 from common.sql_queries import SIGNUP_DETAILS_SELECT_SQL
 from thiscovery_lib.utilities import get_logger, new_correlation_id, now_with_tz, DetailedValueError
-from user import patch_user
+from project import warm_project_status_for_user
+from user import patch_users, MAX_BULK_PATCH_ITEMS
 
 
 # region processing
+@pg_utils.db_connection_handler
 def process_notifications(event, context):
     logger = get_logger()
     notifications = c_notif.get_notifications_to_process()
@@ -42,13 +44,14 @@ def process_notifications(event, context):
     logger.info('process_notifications', extra={'count': str(len(notifications))})
 
     # note that we need to process all registrations first, then do task signups (otherwise we might try to process a signup for someone not yet registered)
+    registration_notifications = list()
     signup_notifications = list()
     login_notifications = list()
     transactional_emails = list()
     for notification in notifications:
         notification_type = notification['type']
         if notification_type == NotificationType.USER_REGISTRATION.value:
-            process_user_registration(notification)
+            registration_notifications.append(notification)
         elif notification_type == NotificationType.TASK_SIGNUP.value:
             # add to list for later processing
             signup_notifications.append(notification)
@@ -62,6 +65,8 @@ def process_notifications(event, context):
             logger.error(error_message)
             raise NotImplementedError(error_message)
 
+    process_user_registrations(registration_notifications)
+
     for signup_notification in signup_notifications:
         process_task_signup(signup_notification)
 
@@ -72,35 +77,75 @@ def process_notifications(event, context):
         process_transactional_email(email)
 
 
-def process_user_registration(notification):
+def post_user_registration_to_crm(notification, correlation_id):
+    """
+    Returns:
+        Tuple (user_id, hubspot_id)
+    """
     logger = get_logger()
-    correlation_id = new_correlation_id()
-    try:
-        notification_id = notification['id']
-        details = notification['details']
-        user_id = details['id']
-        logger.info('process_user_registration: post to hubspot',
-                    extra={'notification_id': str(notification_id), 'user_id': str(user_id), 'email': details['email'], 'correlation_id': str(correlation_id)})
-        hs_client = HubSpotClient(correlation_id=correlation_id)
-        hubspot_id, is_new = hs_client.post_new_user_to_crm(details)
-        logger.info('process_user_registration: hubspot details',
-                    extra={'notification_id': str(notification_id), 'hubspot_id': str(hubspot_id), 'isNew': str(is_new), 'correlation_id': str(correlation_id)})
+    notification_id = notification['id']
+    details = notification['details']
+    user_id = details['id']
+    logger.info('process_user_registration: post to hubspot',
+                extra={'notification_id': str(notification_id), 'user_id': str(user_id), 'email': details['email'], 'correlation_id': str(correlation_id)})
+    hs_client = HubSpotClient(correlation_id=correlation_id)
+    hubspot_id, is_new = hs_client.post_new_user_to_crm(details)
+    logger.info('process_user_registration: hubspot details',
+                extra={'notification_id': str(notification_id), 'hubspot_id': str(hubspot_id), 'isNew': str(is_new), 'correlation_id': str(correlation_id)})
 
-        if hubspot_id == -1:
-            errorjson = {'user_id': user_id, 'correlation_id': str(correlation_id)}
-            raise DetailedValueError('could not find user in HubSpot', errorjson)
+    if hubspot_id == -1:
+        errorjson = {'user_id': user_id, 'correlation_id': str(correlation_id)}
+        raise DetailedValueError('could not find user in HubSpot', errorjson)
 
+    return user_id, hubspot_id
+
+
+def process_user_registrations(notifications):
+    """
+    Posts new users to HubSpot, then saves their HubSpot ids using bulk user patches (one database transaction per
+    MAX_BULK_PATCH_ITEMS users). As with patch_user, no audit records are created for these updates
+
+    Returns:
+        List containing, for each notification, a tuple (number of updated rows in database, marking result), or None if
+        the notification could not be processed
+    """
+    correlation_id = new_correlation_id()
+    outcomes = [None] * len(notifications)
+    pending = list()  # (index of notification, user patch)
+    for i, notification in enumerate(notifications):
+        try:
+            user_id, hubspot_id = post_user_registration_to_crm(notification, correlation_id)
+        except Exception as ex:
+            mark_notification_failure(notification, str(ex), correlation_id)
+            continue
         user_jsonpatch = [
             {'op': 'replace', 'path': '/crm_id', 'value': str(hubspot_id)},
         ]
+        pending.append((i, {'id': user_id, 'jsonpatch': user_jsonpatch}))
 
-        number_of_updated_rows_in_db = patch_user(user_id, user_jsonpatch, now_with_tz(), correlation_id)
-        marking_result = mark_notification_processed(notification, correlation_id)
-        return number_of_updated_rows_in_db, marking_result
+    for start in range(0, len(pending), MAX_BULK_PATCH_ITEMS):
+        batch = pending[start:start + MAX_BULK_PATCH_ITEMS]
+        try:
+            patch_results = patch_users([user_patch for _, user_patch in batch], now_with_tz(), correlation_id, save_entity_updates=False)
+        except Exception as ex:
+            for i, _ in batch:
+                mark_notification_failure(notifications[i], str(ex), correlation_id)
+            continue
+        for (i, _), patch_result in zip(batch, patch_results):
+            try:
+                if patch_result['status'] != http.HTTPStatus.NO_CONTENT:
+                    errorjson = {'user_id': patch_result['id'], 'correlation_id': str(correlation_id)}
+                    raise DetailedValueError(patch_result['message'], errorjson)
+                # patch_users only reports success for an item if the row of its user (ids are unique) was updated
+                number_of_updated_rows_in_db = 1
+                outcomes[i] = (number_of_updated_rows_in_db, mark_notification_processed(notifications[i], correlation_id))
+            except Exception as ex:
+                mark_notification_failure(notifications[i], str(ex), correlation_id)
+    return outcomes
 
-    except Exception as ex:
-        error_message = str(ex)
-        mark_notification_failure(notification, error_message, correlation_id)
+
+def process_user_registration(notification):
+    return process_user_registrations([notification])[0]
 
 
 def get_task_signup_data_for_crm(user_task_id, correlation_id):
@@ -166,9 +211,23 @@ def process_user_login(notification):
         error_message = str(ex)
         marking_result = mark_notification_failure(notification, error_message, correlation_id)
     finally:
+        warm_caches_on_login(notification, correlation_id)
         return posting_result, marking_result
 
 
+def warm_caches_on_login(notification, correlation_id):
+    """
+    Precomputes the project status document of a user who has just logged in, so that their first dashboard request is
+    served from the shared cache. Failures are logged but do not affect the processing of the notification.
+    """
+    logger = get_logger()
+    try:
+        user_id = notification['details']['id']
+        warm_project_status_for_user(user_id, correlation_id=correlation_id)
+    except Exception as ex:
+        logger.warning('Failed to warm caches on login', extra={'error': repr(ex), 'notification': notification, 'correlation_id': correlation_id})
+
+
 def process_transactional_email(notification, mock_server=False):
     logger = get_logger()
     correlation_id = new_correlation_id()
@@ -16,11 +16,18 @@
 #   docs folder of this project.  It is also available www.gnu.org/licenses/
 #
 
+import base64
+import hashlib
 import json
 from http import HTTPStatus
 
+import common.negative_cache as negative_cache
+import common.pagination as pagination
 import common.pg_utilities as pg_utils
+import common.project_catalogue as project_catalogue
+import common.shared_cache as shared_cache
 import common.sql_queries as sql_q
+import common.task_urls as task_urls
 import thiscovery_lib.utilities as utils
 from common.pg_utilities import execute_query, execute_query_multiple, dict_from_dataset, execute_non_query
 
@@ -29,7 +36,14 @@ def list_projects(correlation_id):
     return execute_query(sql_q.LIST_PROJECTS_SQL, None, correlation_id)
 
 
-def list_projects_with_tasks(correlation_id):
+def list_projects_with_tasks(correlation_id, page_request=None):
+    """
+    Returns:
+        List of projects, or a page of projects (see common.pagination) if page_request is provided
+    """
+    if page_request is not None:
+        rows = execute_query(sql_q.LIST_PROJECTS_PAGE_SQL, page_request.params, correlation_id, True, False)
+        return page_request.page(rows)
     result = execute_query(sql_q.BASE_PROJECT_SELECT_SQL, None, correlation_id, True, False)
     return result
 
@@ -42,9 +56,10 @@ def list_projects_api(event, context):
     correlation_id = event['correlation_id']
 
     logger.info('API call', extra={'correlation_id': correlation_id, 'event': event})
+    page_request = pagination.PageRequest.from_parameters(event.get('queryStringParameters'), correlation_id)
     return {
         "statusCode": HTTPStatus.OK,
-        "body": json.dumps(list_projects_with_tasks(correlation_id))
+        "body": json.dumps(list_projects_with_tasks(correlation_id, page_request))
     }
 
 
@@ -70,7 +85,15 @@ def get_project_with_tasks(project_uuid, correlation_id):
 
 
 def get_project_task_by_external_task_id(external_task_id, correlation_id=None):
-    return execute_query(sql_q.TASKS_BY_EXTERNAL_ID_SQL, (str(external_task_id),), correlation_id)
+    def query_project_tasks():
+        return execute_query(sql_q.TASKS_BY_EXTERNAL_ID_SQL, (str(external_task_id),), correlation_id) or None
+
+    return shared_cache.get_or_compute(
+        name='project_tasks_by_external_task_id',
+        version=str(external_task_id),
+        compute=query_project_tasks,
+        correlation_id=correlation_id,
+    ) or list()
 
 
 @utils.lambda_wrapper
@@ -83,7 +106,13 @@ def get_project_api(event, context):
     project_id = event['pathParameters']['id']
     logger.info('API call', extra={'project_id': project_id, 'correlation_id': correlation_id, 'event': event})
 
-    result = get_project_with_tasks(project_id, correlation_id)
+    result = list()
+    # projects are created (and published) in the admin site, so cached misses are only discarded when they expire
+    if not negative_cache.is_known_missing(negative_cache.PROJECT_ID, project_id, correlation_id):
+        looked_up_at = negative_cache.lookup_time()
+        result = get_project_with_tasks(project_id, correlation_id)
+        if not result:
+            negative_cache.add(negative_cache.PROJECT_ID, project_id, looked_up_at)
 
     if len(result) > 0:
         return {"statusCode": HTTPStatus.OK, "body": json.dumps(result)}
@@ -92,26 +121,113 @@ def get_project_api(event, context):
         raise utils.ObjectDoesNotExistError('project is planned or does not exist', errorjson)
 
 
+class ProjectStatusVersion:
+    """
+    Cheap version token for the project status document of a single user.
+
+    The token is derived from the catalogue version (latest modified timestamp and row count of projects, project
+    tasks, their group visibility rows and the external systems, task types and user groups they refer to) plus the latest modified timestamp and row count of that user's row,
+    group memberships, user projects and user tasks. Any change that could alter the document changes the token.
+
+    Versions read from the database also record whether a document of that version was saved in the shared cache by
+    warm_project_status_for_user (warmed).
+    """
+    def __init__(self, demo, catalogue_modified, catalogue_count, user_modified, user_count):
+        self.demo = bool(demo)
+        self.catalogue_modified = int(catalogue_modified)
+        self.catalogue_count = int(catalogue_count)
+        self.user_modified = int(user_modified)
+        self.user_count = int(user_count)
+        self.warmed = False
+
+    @property
+    def catalogue_version(self):
+        return self.catalogue_modified, self.catalogue_count
+
+    @property
+    def token(self):
+        raw = f"{int(self.demo)}.{self.catalogue_modified}.{self.catalogue_count}.{self.user_modified}.{self.user_count}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @property
+    def etag(self):
+        return f'"{self.token}"'
+
+    def variant_etag(self, variant):
+        """
+        Args:
+            variant (str): identifies the representation of the document (e.g. its field projection); None or empty for the
+                    full document
+
+        Returns:
+            ETag of that representation at this version. The token is kept as its first part, so the value can still be
+            used as a since token
+        """
+        if not variant:
+            return self.etag
+        return f'"{self.token}.{hashlib.sha1(variant.encode()).hexdigest()[:16]}"'
+
+    @classmethod
+    def from_token(cls, token, correlation_id=None):
+        """
+        Args:
+            token (str): version token, or ETag value (without quotes) of any representation of the document
+            correlation_id:
+        """
+        try:
+            token = token.split('.')[0]
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+            demo, catalogue_modified, catalogue_count, user_modified, user_count = raw.split('.')
+            return cls(
+                demo=int(demo),
+                catalogue_modified=catalogue_modified,
+                catalogue_count=catalogue_count,
+                user_modified=user_modified,
+                user_count=user_count,
+            )
+        except (ValueError, TypeError, UnicodeDecodeError):
+            errorjson = {'token': token, 'correlation_id': str(correlation_id)}
+            raise utils.DetailedValueError('invalid project status version token', errorjson)
+
+    @classmethod
+    def from_db(cls, user_id, demo, correlation_id=None):
+        version_row = execute_query(sql_q.PROJECT_STATUS_VERSION_SQL, (str(user_id),) * 5, correlation_id)[0]
+        warmed_version = version_row.pop('warmed_version')
+        version = cls(demo=demo, **version_row)
+        version.warmed = (warmed_version == version.token)
+        return version
+
+
+def get_project_status_version(user_id, demo, correlation_id=None):
+    return ProjectStatusVersion.from_db(user_id=user_id, demo=demo, correlation_id=correlation_id)
+
+
 class ProjectStatusForUser:
 
-    def __init__(self, user_id, correlation_id=None, demo=None):
+    def __init__(self, user_id, correlation_id=None, demo=None, version=None, user=None):
+        """
+        Args:
+            user_id:
+            correlation_id:
+            demo:
+            version (ProjectStatusVersion): if not provided, it will be fetched from the database. It is used to decide whether
+                    the cached catalogue of projects is still current.
+            user (dict): user record (as returned by user.get_user_by_id), if the caller has already fetched it; saves
+                    reading the user row again
+        """
         self.user_id = user_id
         self.correlation_id = correlation_id
-        project_list_sql = sql_q.PROJECT_USER_SELECT_SQL_NON_DEMO_ONLY
-        if demo:
-            project_list_sql = sql_q.PROJECT_USER_SELECT_SQL_DEMO_ONLY
-
+        if version is None:
+            version = get_project_status_version(user_id, demo, correlation_id)
+        self.version = version
+        self.catalogue = project_catalogue.get_catalogue(demo, version.catalogue_version, correlation_id)
+
+        sql_keys = ['sql0', 'sql1', 'sql2', 'sql3', 'sql4']
+        if user is None:
+            sql_keys.append('sql5')
         results = execute_query_multiple(
-            base_sql_tuple=(
-                sql_q.get_project_status_for_user_sql['sql0'],
-                sql_q.get_project_status_for_user_sql['sql1'],
-                sql_q.get_project_status_for_user_sql['sql2'],
-                sql_q.get_project_status_for_user_sql['sql3'],
-                sql_q.get_project_status_for_user_sql['sql4'],
-                sql_q.get_project_status_for_user_sql['sql5'],
-                project_list_sql,
-            ),
-            params_tuple=((user_id,),) * 6 + ((None,),),
+            base_sql_tuple=tuple(sql_q.get_project_status_for_user_sql[k] for k in sql_keys),
+            params_tuple=((user_id,),) * len(sql_keys),
             correlation_id=correlation_id,
         )
         self.project_group_users_dict = dict_from_dataset(results[0], 'project_id')
@@ -119,118 +235,228 @@ class ProjectStatusForUser:
         self.projecttask_group_users_dict = dict_from_dataset(results[2], 'project_task_id')
         self.projecttask_testgroup_users_dict = dict_from_dataset(results[3], 'project_task_id')
         self.projects_usertasks_dict = dict_from_dataset(results[4], 'project_task_id')
-        try:
-            self.user_first_name = results[5][0]['first_name']
-            self.user_last_name = results[5][0]['last_name']
-            self.user_email = results[5][0]['email']
-        except IndexError:
-            errorjson = {'user_id': user_id, 'correlation_id': str(correlation_id)}
-            raise utils.ObjectDoesNotExistError(f"User {user_id} could not be found", errorjson)
-        self.project_list = results[6]
+        if user is None:
+            try:
+                user = results[5][0]
+            except IndexError:
+                errorjson = {'user_id': user_id, 'correlation_id': str(correlation_id)}
+                raise utils.ObjectDoesNotExistError(f"User {user_id} could not be found", errorjson)
+        self.user_first_name = user['first_name']
+        self.user_last_name = user['last_name']
+        self.user_email = user['email']
+        self.url_values = task_urls.user_url_values(user_id, self.user_first_name, self.user_last_name, self.user_email)
 
     def calculate_project_visibility(self, project):
-        project_id = project['id']
+        """
+        Args:
+            project (project_catalogue.CatalogueProject):
+        """
+        project_id = project.id
         project_visibility = \
             (
                 # testing/active project visible to test group
-                (project['status'] in ['testing', 'active']) and
+                (project.status in ['testing', 'active']) and
                 (self.project_testgroup_users_dict.get(project_id) is not None)
             ) or (
                 # active/complete project visible to user group or, if public, to anyone
-                (project['status'] in ['active', 'complete']) and
+                (project.status in ['active', 'complete']) and
                 (
-                    (project['visibility'] == 'public') or
+                    (project.visibility == 'public') or
                     (self.project_group_users_dict.get(project_id) is not None)
                 )
             )
         return project_visibility
 
-    def calculate_task_visibility(self, project, task, task_id):
+    def calculate_task_visibility(self, project_is_visible, task):
+        """
+        Args:
+            project_is_visible (bool):
+            task (project_catalogue.CatalogueTask):
+        """
+        task_id = task.id
         task_visibility = \
             (
-                project['project_is_visible'] and
+                project_is_visible and
                 (
                     # task in testing phase visible to test group
-                    (task['status'] == 'testing') and
+                    (task.status == 'testing') and
                     (self.projecttask_testgroup_users_dict.get(task_id) is not None)
                 ) or (
                     # active/complete task visible to user group or, if public, to anyone
-                    (task['status'] in ['active', 'complete']) and
+                    (task.status in ['active', 'complete']) and
                     (
                         (self.projecttask_group_users_dict.get(task_id) is not None) or
-                        (task['visibility'] == 'public')
+                        (task.visibility == 'public')
                     )
                 )
             )
         return task_visibility
 
     @staticmethod
-    def calculate_task_signup(task):
+    def calculate_task_signup(task, task_is_visible, user_is_signedup):
         signup_available = \
             (
-                task['task_is_visible'] and
-                (task['status'] == 'active') and not
-                task['user_is_signedup'] and
-                (task['signup_status'] == 'open')
+                task_is_visible and
+                (task.status == 'active') and not
+                user_is_signedup and
+                (task.signup_status == 'open')
             ) or (
-                task['task_is_visible'] and
-                (task['status'] == 'testing') and not
-                task['user_is_signedup']
+                task_is_visible and
+                (task.status == 'testing') and not
+                user_is_signedup
             )
         return signup_available
 
-    def calculate_task_url(self, task, task_id):
+    def calculate_task_url(self, task, task_is_visible, user_is_signedup):
         # only give url if user has signedup (inc if completed)
-        if task['task_is_visible'] and task['user_is_signedup']:
-            user_task_id = self.projects_usertasks_dict[task_id]['id']
-            external_task_id = task['external_task_id']
-            anon_project_specific_user_id = self.projects_usertasks_dict[task_id]['anon_project_specific_user_id']
-            anon_user_task_id = self.projects_usertasks_dict[task_id]['anon_user_task_id']
-            if task['user_specific_url']:
-                task['url'] = self.projects_usertasks_dict[task_id]['user_task_url']
-            if task['url'] is not None:
-                if task['anonymise_url']:
-                    task['url'] += utils.create_anonymous_url_params(
-                        base_url=task['url'],
-                        anon_project_specific_user_id=anon_project_specific_user_id,
-                        user_first_name=self.user_first_name,
-                        anon_user_task_id=anon_user_task_id,
-                        external_task_id=external_task_id,
-                        project_task_id=task['id'],
-                    )
-                else:
-                    task['url'] += utils.create_url_params(task['url'], self.user_id, self.user_first_name, user_task_id, external_task_id)
-
-                if task['task_type_name'] == 'interview':
-                    # add last name and email for use with Acuity Scheduler
-                    task['url'] += f"&last_name={self.user_last_name}" \
-                                   f"&email={self.user_email}"
-
-                task['url'] += utils.non_prod_env_url_param()
-        else:
-            task['url'] = None
-        return task['url']
+        if not (task_is_visible and user_is_signedup):
+            return None
+
+        user_task = self.projects_usertasks_dict[task.id]
+        return task_urls.task_url(
+            self.url_values,
+            base_url=task.base_url,
+            user_specific_url=task.user_specific_url,
+            user_task_url=user_task['user_task_url'],
+            anonymise_url=task.anonymise_url,
+            task_type_name=task.task_type_name,
+            external_task_id=task.external_task_id,
+            project_task_id=task.id,
+            user_task_id=user_task['id'],
+            anon_project_specific_user_id=user_task['anon_project_specific_user_id'],
+            anon_user_task_id=user_task['anon_user_task_id'],
+        )
 
-    def main(self):
-        try:
-            for project in self.project_list:
-                project['project_is_visible'] = self.calculate_project_visibility(project)
-                for task in project['tasks']:
-                    task_id = task['id']
-                    task['task_is_visible'] = self.calculate_task_visibility(project, task, task_id)
-                    task['user_is_signedup'] = self.projects_usertasks_dict.get(task_id) is not None
-                    task['signup_available'] = self.calculate_task_signup(task)
-                    if task['user_is_signedup']:
-                        if task['status'] == 'complete':
-                            task['user_task_status'] = 'complete'
-                        else:
-                            task['user_task_status'] = self.projects_usertasks_dict[task_id]['status']
-                    task['url'] = self.calculate_task_url(task, task_id)
-
-        except Exception as ex:
-            raise ex
-
-        return self.project_list
+    def calculate_task_user_fields(self, project_is_visible, task, include_url=True):
+        """
+        Returns:
+            Tuple of the per-user fields of task: (task_is_visible, user_is_signedup, signup_available, user_task_status, url).
+            url is None if include_url is False
+        """
+        task_is_visible = self.calculate_task_visibility(project_is_visible, task)
+        user_task = self.projects_usertasks_dict.get(task.id)
+        user_is_signedup = user_task is not None
+        signup_available = self.calculate_task_signup(task, task_is_visible, user_is_signedup)
+        user_task_status = None
+        if user_is_signedup:
+            if task.status == 'complete':
+                user_task_status = 'complete'
+            else:
+                user_task_status = user_task['status']
+        url = None
+        if include_url:
+            url = self.calculate_task_url(task, task_is_visible, user_is_signedup)
+        return task_is_visible, user_is_signedup, signup_available, user_task_status, url
+
+    def _iter_document(self, projection, visible_only, project_ids=None):
+        """
+        Yields (project, project_is_visible, tasks) for each project in the document (or, if project_ids is given, for each
+        of those projects in the document), where tasks is a list of (task, task_user_fields) tuples (empty if projection
+        does not include tasks)
+        """
+        include_url = 'url' in projection.task_user_fields
+        for project in self.catalogue.projects:
+            if (project_ids is not None) and (project.id not in project_ids):
+                continue
+            project_is_visible = self.calculate_project_visibility(project)
+            if visible_only and not project_is_visible:
+                continue
+            tasks = list()
+            if projection.include_tasks:
+                for task in project.tasks:
+                    task_user_fields = self.calculate_task_user_fields(project_is_visible, task, include_url=include_url)
+                    if visible_only and not task_user_fields[0]:
+                        continue
+                    tasks.append((task, task_user_fields))
+            yield project, project_is_visible, tasks
+
+    def main(self, projection=None, visible_only=False, project_ids=None):
+        """
+        Args:
+            projection (project_catalogue.Projection): fields to include; all fields if None
+            visible_only (bool): if True, projects and tasks not visible to the user are left out
+            project_ids (set): if given, only these projects are included
+
+        Returns:
+            List of project dictionaries (each with a list of task dictionaries) including the fields specific to this user.
+            New dictionaries are created on each call; the shared catalogue is not modified.
+        """
+        if projection is None:
+            projection = project_catalogue.FULL_PROJECTION
+        project_list = list()
+        for project, project_is_visible, tasks in self._iter_document(projection, visible_only, project_ids):
+            project_dict = {k: project.data[k] for k in projection.project_data_fields}
+            if projection.project_user_fields:
+                project_dict['project_is_visible'] = project_is_visible
+            if projection.include_tasks:
+                project_dict['tasks'] = list()
+                for task, task_user_fields in tasks:
+                    task_dict = {k: task.data[k] for k in projection.task_data_fields}
+                    for k, v in zip(project_catalogue.TASK_USER_FIELDS, task_user_fields):
+                        if k in projection.task_user_fields:
+                            task_dict[k] = v
+                    project_dict['tasks'].append(task_dict)
+            project_list.append(project_dict)
+        return project_list
+
+    def render(self, projection=None, visible_only=False):
+        """
+        Same output as json.dumps(self.main(projection, visible_only)), but splices the fields specific to this user into the
+        pre-encoded fragments held by the catalogue instead of building and serialising the whole document.
+
+        Returns:
+            JSON string
+        """
+        if projection is None:
+            projection = project_catalogue.FULL_PROJECTION
+        encode_bool = project_catalogue.encode_bool
+        encode_value = project_catalogue.encode_value
+        task_user_fields_mask = [k in projection.task_user_fields for k in project_catalogue.TASK_USER_FIELDS]
+        task_user_fields_prefixes = [f'"{k}": '.encode() for k in project_catalogue.TASK_USER_FIELDS]
+        task_user_fields_encoders = [encode_bool, encode_bool, encode_bool, encode_value, encode_value]
+        project_chunks = list()
+        for project, project_is_visible, tasks in self._iter_document(projection, visible_only):
+            members = [project.get_fragment(projection.project_data_fields)]
+            if projection.project_user_fields:
+                members.append(b'"project_is_visible": ' + encode_bool(project_is_visible))
+            if projection.include_tasks:
+                task_chunks = list()
+                for task, task_user_fields in tasks:
+                    task_members = [task.get_fragment(projection.task_data_fields)]
+                    for included, prefix, encoder, value in zip(task_user_fields_mask, task_user_fields_prefixes,
+                                                                 task_user_fields_encoders, task_user_fields):
+                        if included:
+                            task_members.append(prefix + encoder(value))
+                    task_chunks.append(b'{' + b', '.join(x for x in task_members if x) + b'}')
+                members.append(b'"tasks": [' + b', '.join(task_chunks) + b']')
+            project_chunks.append(b'{' + b', '.join(x for x in members if x) + b'}')
+        return (b'[' + b', '.join(project_chunks) + b']').decode()
+
+
+def get_project_task_audience(project_task_id, correlation_id=None):
+    """
+    Reverse of ProjectStatusForUser: evaluates the visibility and signup rules of a project task for all users at once
+
+    Args:
+        project_task_id:
+        correlation_id:
+
+    Returns:
+        Dictionary containing lists of user ids for whom the task is visible (visible_user_ids), open for signup
+        (signup_available_user_ids) and already signed up (signedup_user_ids)
+    """
+    try:
+        project_task_id = utils.validate_uuid(project_task_id)
+    except utils.DetailedValueError as err:
+        err.add_correlation_id(correlation_id)
+        raise err
+
+    result = execute_query(sql_q.PROJECT_TASK_AUDIENCE_SQL, (str(project_task_id),), correlation_id)
+    try:
+        return result[0]
+    except IndexError:
+        errorjson = {'project_task_id': project_task_id, 'correlation_id': str(correlation_id)}
+        raise utils.ObjectDoesNotExistError('project task is planned or does not exist', errorjson)
 
 
 def get_project_status_for_user(user_id, demo, correlation_id):
@@ -242,6 +468,176 @@ def get_project_status_for_user(user_id, demo, correlation_id):
     return project_status_for_user.main()
 
 
+def render_project_status_for_user(user_id, demo, correlation_id, version=None, projection=None, visible_only=False, user=None):
+    project_status_for_user = ProjectStatusForUser(
+        user_id=user_id,
+        demo=demo,
+        correlation_id=correlation_id,
+        version=version,
+        user=user,
+    )
+    return project_status_for_user.render(projection=projection, visible_only=visible_only)
+
+
+PROJECT_STATUS_CACHE_TTL = 60 * 60  # seconds
+
+
+def warm_project_status_for_user(user_id, demo=False, correlation_id=None):
+    """
+    Renders the project status document of a user and saves it in the shared cache, so that the user's next project status
+    request can be served without querying the database for their project and task details. Called when users log in.
+
+    Returns:
+        ProjectStatusVersion of the cached document
+    """
+    version = get_project_status_version(user_id, demo, correlation_id)
+    # one entry per user, holding the version it was rendered at, so that a user's document can be deleted (see
+    # delete_cached_project_status) without knowing its version
+    stored = shared_cache.put(
+        name='project_status',
+        version=str(user_id),
+        value={
+            'version': version.token,
+            'document': render_project_status_for_user(user_id, demo, correlation_id, version=version),
+        },
+        correlation_id=correlation_id,
+        ttl=PROJECT_STATUS_CACHE_TTL,
+    )
+    if stored:
+        # lets get_project_status_for_user_api know that the cached document is worth looking up
+        execute_non_query(sql_q.MARK_PROJECT_STATUS_WARMED_SQL, (str(user_id), version.token), correlation_id)
+        version.warmed = True
+    return version
+
+
+def get_cached_project_status_for_user(user_id, version, correlation_id=None):
+    """
+    Returns:
+        Project status document (JSON string) saved by warm_project_status_for_user for version, or None. The shared
+        cache is only read if version says a document of that version was saved (warmed)
+    """
+    if not version.warmed:
+        return None
+    cached = shared_cache.get('project_status', str(user_id), correlation_id, use_l1=False)
+    if (cached is not None) and (cached['version'] == version.token):
+        return cached['document']
+
+
+def delete_cached_project_status(user_ids, correlation_id=None):
+    """
+    Deletes the documents saved by warm_project_status_for_user for user_ids (e.g. when those users are erased)
+    """
+    execute_non_query(sql_q.DELETE_PROJECT_STATUS_WARMED_SQL, ([str(x) for x in user_ids],), correlation_id)
+    for user_id in user_ids:
+        shared_cache.delete('project_status', str(user_id), correlation_id)
+
+
+def get_project_status_changes_for_user(user_id, demo, since, correlation_id=None, version=None):
+    """
+    Returns the changes to a user's project status document since the version identified by token since.
+
+    The changes are located by querying the rows modified since the client's version, and only the projects they affect are
+    built. Projects whose own row, group visibility or user project changed (or that were added) are returned in full.
+    Projects in which only some tasks (or the user's user tasks) changed are returned with only those tasks. Items that are
+    no longer part of the document (e.g. their status changed to planned) are listed in 'removed'. If the changes cannot be
+    expressed as a delta (the user's details or group memberships changed, an external system, task type or user group
+    changed, or rows were deleted), the full document is returned instead, with 'full' set to True.
+
+    Args:
+        user_id:
+        demo:
+        since (str): version token (the ETag value, without quotes) of the document held by the client
+        correlation_id:
+        version (ProjectStatusVersion): current version; fetched from the database if not provided
+
+    Returns:
+        Dictionary containing the new version token and either the full document or added, changed and removed items
+    """
+    since_version = ProjectStatusVersion.from_token(since, correlation_id)
+    if version is None:
+        version = get_project_status_version(user_id, demo, correlation_id)
+    delta = {
+        'version': version.token,
+        'full': False,
+        'added': list(),
+        'changed': list(),
+        'removed': {'projects': list(), 'tasks': list()},
+    }
+    if since_version.token == version.token:
+        return delta
+
+    def full_response():
+        psfu = ProjectStatusForUser(user_id=user_id, demo=demo, correlation_id=correlation_id, version=version)
+        return {'version': version.token, 'full': True, 'projects': psfu.main()}
+
+    if since_version.demo != version.demo:
+        return full_response()
+
+    changed_rows = execute_query(
+        sql_q.PROJECT_STATUS_CHANGES_SQL,
+        (since_version.catalogue_modified,) * 14 + (since_version.user_modified, since_version.user_modified, str(user_id)) * 4,
+        correlation_id,
+    )
+
+    # rows deleted since the client's version cannot be located; the counts in the version tokens reveal them
+    new_catalogue_rows = len([x for x in changed_rows if (x['scope'] == 'catalogue') and x['is_new']])
+    new_user_rows = len([x for x in changed_rows if (x['scope'] == 'user') and x['is_new']])
+    if (since_version.catalogue_count + new_catalogue_rows != version.catalogue_count) or \
+            (since_version.user_count + new_user_rows != version.user_count):
+        return full_response()
+
+    # these rows may affect any number of projects
+    if any(x['kind'] in ['user', 'user_group_membership', 'external_system', 'task_type', 'user_group'] for x in changed_rows):
+        return full_response()
+
+    task_change_kinds = ['project_task', 'project_task_visibility', 'user_task']
+    new_project_ids = {x['project_id'] for x in changed_rows if (x['kind'] == 'project') and x['is_new']}
+    changed_project_ids = {x['project_id'] for x in changed_rows if x['kind'] in ['project', 'project_visibility', 'user_project']}
+    changed_task_ids_by_project = dict()
+    for x in changed_rows:
+        if x['kind'] in task_change_kinds:
+            changed_task_ids_by_project.setdefault(x['project_id'], set()).add(x['project_task_id'])
+
+    affected_project_ids = changed_project_ids | set(changed_task_ids_by_project)
+    psfu = ProjectStatusForUser(user_id=user_id, demo=demo, correlation_id=correlation_id, version=version)
+    current_project_ids = set()
+    for project in psfu.main(project_ids=affected_project_ids):
+        project_id = project['id']
+        current_project_ids.add(project_id)
+        if project_id in new_project_ids:
+            delta['added'].append(project)
+        elif project_id in changed_project_ids:
+            delta['changed'].append(project)
+        elif project_id in changed_task_ids_by_project:
+            changed_task_ids = changed_task_ids_by_project[project_id]
+            changed_tasks = [t for t in project['tasks'] if t['id'] in changed_task_ids]
+            delta['removed']['tasks'] += sorted(changed_task_ids - {t['id'] for t in changed_tasks})
+            delta['changed'].append({**project, 'tasks': changed_tasks})
+
+    delta['removed']['projects'] = sorted(affected_project_ids - current_project_ids)
+    return delta
+
+
+def _get_request_header(event, header_name):
+    headers = event.get('headers') or dict()
+    for k, v in headers.items():
+        if k.lower() == header_name.lower():
+            return v
+
+
+def _etag_matches(if_none_match, etag):
+    """
+    Implements the weak comparison used by If-None-Match (RFC 7232, section 3.2)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [x.strip() for x in if_none_match.split(',')]
+    candidates = [x[2:] if x.startswith('W/') else x for x in candidates]
+    return etag in candidates
+
+
 @utils.lambda_wrapper
 @utils.api_error_handler
 @pg_utils.db_connection_handler
@@ -255,11 +651,66 @@ def get_project_status_for_user_api(event, context):
     logger.info('API call', extra={'user_id': user_id, 'correlation_id': correlation_id, 'event': event})
     if user_id == '760f4e4d-4a3b-4671-8ceb-129d81f9d9ca':
         raise ValueError('Deliberate error raised to test error handling')
+
+    projection = None
+    fields = params.get('fields')
+    if fields:
+        projection = project_catalogue.Projection.from_query_parameter(fields, correlation_id)
+        if projection.key == project_catalogue.FULL_PROJECTION.key:
+            projection = None
+    visible_only = str(params.get('visible_only', False)).lower() == 'true'
+    since = params.get('since')
+
+    # the same version of the document has a different representation for each projection and delta base, so each of them
+    # needs its own ETag
+    if since:
+        variant = f'since={ProjectStatusVersion.from_token(since, correlation_id).token}'
+    else:
+        variant = '&'.join(x for x in [
+            f'fields={projection.key}' if projection is not None else '',
+            'visible_only=true' if visible_only else '',
+        ] if x)
+
+    version = get_project_status_version(user_id=user_id, demo=demo, correlation_id=correlation_id)
+    etag = version.variant_etag(variant)
+    if _etag_matches(_get_request_header(event, 'If-None-Match'), etag):
+        logger.info('Project status not modified', extra={'user_id': user_id, 'etag': etag, 'correlation_id': correlation_id})
+        return {
+            "statusCode": HTTPStatus.NOT_MODIFIED,
+            "headers": {"ETag": etag},
+        }
+
+    if since:
+        return {
+            "statusCode": HTTPStatus.OK,
+            "headers": {"ETag": etag},
+            "body": json.dumps(get_project_status_changes_for_user(
+                user_id=user_id,
+                demo=demo,
+                since=since,
+                correlation_id=correlation_id,
+                version=version,
+            ))
+        }
+
+    if (projection is None) and not visible_only:
+        cached_document = get_cached_project_status_for_user(user_id, version, correlation_id)
+        if cached_document is not None:
+            return {
+                "statusCode": HTTPStatus.OK,
+                "headers": {"ETag": etag},
+                "body": cached_document,
+            }
+
     return {
         "statusCode": HTTPStatus.OK,
-        "body": json.dumps(get_project_status_for_user(
+        "headers": {"ETag": etag},
+        "body": render_project_status_for_user(
             user_id=user_id,
             demo=demo,
             correlation_id=correlation_id,
-        ))
+            version=version,
+            projection=projection,
+            visible_only=visible_only,
+        )
     }
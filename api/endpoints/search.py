@@ -0,0 +1,113 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+Search of projects, project tasks and users by name, description, email etc.
+
+Each query term is matched as a prefix against a full-text (tsvector) index and the whole query string against trigram
+indexes, so that partial words and misspellings still find results. Results are ranked by text rank plus trigram similarity.
+The indexes are created by api/local/database-view-sql/indexes_search_create.sql
+"""
+import json
+import re
+from http import HTTPStatus
+
+import common.pg_utilities as pg_utils
+import common.sql_queries as sql_q
+import thiscovery_lib.utilities as utils
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_QUERY_LENGTH = 200
+
+SEARCH_SQL = {
+    'projects': sql_q.SEARCH_PROJECTS_SQL,
+    'tasks': sql_q.SEARCH_PROJECT_TASKS_SQL,
+    'users': sql_q.SEARCH_USERS_SQL,
+}
+
+_TERM_RE = re.compile(r'\w+')
+
+
+def prefix_tsquery(query_string):
+    """
+    Converts free text into a tsquery string matching all terms as prefixes (e.g. 'foo ba' -> 'foo:* & ba:*'). Only word
+    characters are kept, so the result is always valid tsquery syntax
+
+    Returns:
+        tsquery string, or None if query_string contains no terms
+    """
+    terms = _TERM_RE.findall(query_string.lower())
+    if not terms:
+        return None
+    return ' & '.join(f'{t}:*' for t in terms)
+
+
+def ilike_pattern(query_string):
+    escaped = query_string.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def search(search_type, query_string, limit=DEFAULT_LIMIT, correlation_id=None):
+    """
+    Args:
+        search_type (str): one of 'projects', 'tasks' or 'users'
+        query_string (str): text to search for
+        limit (int): maximum number of results
+        correlation_id:
+
+    Returns:
+        List of matching rows, best match first
+    """
+    errorjson = {'type': search_type, 'q': query_string, 'limit': limit, 'correlation_id': str(correlation_id)}
+    try:
+        base_sql = SEARCH_SQL[search_type]
+    except KeyError:
+        raise utils.DetailedValueError(f'invalid search type; valid types are {list(SEARCH_SQL.keys())}', errorjson)
+
+    try:
+        limit = int(limit)
+        assert 0 < limit <= MAX_LIMIT
+    except (ValueError, TypeError, AssertionError):
+        errorjson['max_limit'] = MAX_LIMIT
+        raise utils.DetailedValueError('invalid limit', errorjson)
+
+    query_string = (query_string or '').strip()[:MAX_QUERY_LENGTH]
+    tsquery = prefix_tsquery(query_string)
+    if tsquery is None:
+        raise utils.DetailedValueError('search query must contain at least one word', errorjson)
+
+    return pg_utils.execute_query(base_sql, (tsquery, query_string, ilike_pattern(query_string), limit), correlation_id)
+
+
+@utils.lambda_wrapper
+@utils.api_error_handler
+@pg_utils.db_connection_handler
+def search_api(event, context):
+    logger = event['logger']
+    correlation_id = event['correlation_id']
+
+    parameters = event['queryStringParameters'] or dict()
+    logger.info('API call', extra={'parameters': parameters, 'correlation_id': correlation_id, 'event': event})
+    result = search(
+        search_type=parameters.get('type', 'projects'),
+        query_string=parameters.get('q'),
+        limit=parameters.get('limit', DEFAULT_LIMIT),
+        correlation_id=correlation_id,
+    )
+    return {"statusCode": HTTPStatus.OK, "body": json.dumps(result)}
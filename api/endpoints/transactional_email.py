@@ -19,6 +19,7 @@ import json
 import validators
 from http import HTTPStatus
 
+import common.identity as idn
 import thiscovery_lib.hubspot_utilities as hs
 import thiscovery_lib.utilities as utils
 import notification_process as np
@@ -119,18 +120,17 @@ class TransactionalEmail:
         return True
 
     def _get_user(self):
-        try:
-            user = u.get_user_by_id(self.to_recipient_id, correlation_id=self.correlation_id)[0]
-        except IndexError:
-            try:
-                user = u.get_user_by_anon_project_specific_user_id(self.to_recipient_id, correlation_id=self.correlation_id)[0]
-            except IndexError:
-                raise utils.ObjectDoesNotExistError('Recipient id does not match any known user_id or anon_project_specific_user_id',
-                                                    details={
-                                                        'to_recipient_id': self.to_recipient_id,
-                                                        'correlation_id': self.correlation_id,
-                                                    })
-        return user
+        identity = idn.resolve_any_id(self.to_recipient_id, kinds=(idn.USER, idn.USER_PROJECT), correlation_id=self.correlation_id)
+        users = list()
+        if identity is not None:
+            users = u.get_user_by_id(identity.user_id, correlation_id=self.correlation_id)
+        if not users:
+            raise utils.ObjectDoesNotExistError('Recipient id does not match any known user_id or anon_project_specific_user_id',
+                                                details={
+                                                    'to_recipient_id': self.to_recipient_id,
+                                                    'correlation_id': self.correlation_id,
+                                                })
+        return users[0]
 
     @staticmethod
     def _format_properties_to_name_value(properties_dict):
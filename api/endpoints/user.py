@@ -16,18 +16,23 @@
 #   docs folder of this project.  It is also available www.gnu.org/licenses/
 #
 
+import csv
+import io
 import json
 import traceback
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 from datetime import timedelta
-from jsonpatch import JsonPatch, JsonPatchException, InvalidJsonPatch
+from jsonpatch import JsonPatch, InvalidJsonPatch
 
+import common.identity as idn
+import common.negative_cache as negative_cache
 import common.pg_utilities as pg_utils
+import common.pagination as pagination
 import common.sql_queries as sql_q
 import thiscovery_lib.utilities as utils
 from common.pg_utilities import execute_query, execute_jsonpatch, execute_non_query, new_correlation_id
-from common.entity_update import EntityUpdate
 # from utils import validate_uuid
 from thiscovery_lib.notification_send import notify_new_user_registration, notify_user_login
 
@@ -36,6 +41,102 @@ def validate_status(s):
     return s
 
 
+def avatar_string(first_name, last_name):
+    if not (isinstance(first_name, str) and isinstance(last_name, str)):
+        return '??'
+    if not first_name:
+        return last_name[0:2]
+    if not last_name:
+        return first_name[0:2]
+    return first_name[0] + last_name[0]
+
+
+_country_names = dict()
+
+
+def country_name(country_code):
+    """
+    Memoized utils.get_country_name; the country list belongs to thiscovery_lib, so names are added to the memo as codes
+    are first seen rather than all at import
+    """
+    try:
+        return _country_names[country_code]
+    except KeyError:
+        name = utils.get_country_name(country_code)
+        _country_names[country_code] = name
+        return name
+
+
+_NOT_COMPUTED = object()
+
+
+class UserRecord:
+    """
+    A row of BASE_USER_SELECT_SQL. Derived properties (country_name and avatar_string) are computed when first used
+    """
+    FIELDS = (
+        'id', 'created', 'modified', 'email', 'title', 'first_name', 'last_name', 'country_code', 'auth0_id', 'crm_id', 'status',
+        'has_demo_project', 'has_live_project',
+    )
+    __slots__ = (*FIELDS, '_country_name', '_avatar_string')
+
+    def __init__(self, *values):
+        for name, value in zip(self.FIELDS, values):
+            setattr(self, name, value)
+        self._country_name = _NOT_COMPUTED
+        self._avatar_string = _NOT_COMPUTED
+
+    @property
+    def country_name(self):
+        if self._country_name is _NOT_COMPUTED:
+            self._country_name = country_name(self.country_code)
+        return self._country_name
+
+    @property
+    def avatar_string(self):
+        if self._avatar_string is _NOT_COMPUTED:
+            self._avatar_string = avatar_string(self.first_name, self.last_name)
+        return self._avatar_string
+
+    def to_dict(self):
+        """
+        Returns:
+            The dictionary previously returned by the user endpoints: fields with timestamps in ISO format (as output by
+            row_to_json), followed by country_name and avatar_string
+        """
+        return {
+            'id': self.id,
+            'created': pg_utils.json_timestamp(self.created),
+            'modified': pg_utils.json_timestamp(self.modified),
+            'email': self.email,
+            'title': self.title,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'country_code': self.country_code,
+            'auth0_id': self.auth0_id,
+            'crm_id': self.crm_id,
+            'status': self.status,
+            'has_demo_project': self.has_demo_project,
+            'has_live_project': self.has_live_project,
+            'country_name': self.country_name,
+            'avatar_string': self.avatar_string,
+        }
+
+
+def get_user_records(sql, params, correlation_id=None):
+    """
+    Args:
+        sql: BASE_USER_SELECT_SQL followed by a WHERE clause
+        params:
+        correlation_id:
+
+    Returns:
+        List of UserRecord, built directly from the rows returned by the database
+    """
+    rows = execute_query(sql, params, correlation_id, return_json=False, jsonize_sql=False)
+    return [UserRecord(*row) for row in rows]
+
+
 def append_avatar_to_list(user_list):
     for user in user_list:
         append_avatar(user)
@@ -43,59 +144,34 @@ def append_avatar_to_list(user_list):
 
 
 def append_avatar(user):
-    try:
-        first_name = user['first_name']
-        last_name = user['last_name']
-        if len(first_name) == 0:
-            avatar_string = last_name[0:2]
-        elif len(last_name) == 0:
-            avatar_string = first_name[0:2]
-        else:
-            avatar_string = first_name[0] + last_name[0]
-    except:
-        avatar_string = '??'
-    user['avatar_string'] = avatar_string
+    user['avatar_string'] = avatar_string(user.get('first_name'), user.get('last_name'))
     return user
 
 
 def append_calculated_properties_to_list(user_list):
-    user_list = utils.append_country_name_to_list(user_list)
-    user_list = append_avatar_to_list(user_list)
+    for user in user_list:
+        append_calculated_properties(user)
     return user_list
 
 
 def append_calculated_properties(user):
-    utils.append_country_name(user)
+    user['country_name'] = country_name(user['country_code'])
     append_avatar(user)
     return user
 
 
 def get_user_by_any_anon_id(anon_id, correlation_id=None):
-    try:
-        anon_id = utils.validate_uuid(anon_id)
-    except utils.DetailedValueError as err:
-        err.add_correlation_id(correlation_id)
-        raise err
-
-    user_json = execute_query(
-        sql_q.GET_USER_BY_ANY_ANON_ID_SQL,
-        ((str(anon_id),),) * 2,
-        correlation_id
-    )
-
-    return append_calculated_properties_to_list(user_json)
+    identity = idn.resolve(anon_id, correlation_id=correlation_id)
+    if identity is None:
+        return list()
+    return get_user_by_id(identity.user_id, correlation_id)
 
 
 def get_user_by_anon_project_specific_user_id(anon_project_specific_user_id, correlation_id=None):
-    try:
-        anon_project_specific_user_id = utils.validate_uuid(anon_project_specific_user_id)
-    except utils.DetailedValueError as err:
-        err.add_correlation_id(correlation_id)
-        raise err
-
-    user_json = execute_query(sql_q.GET_USER_BY_ANON_PROJECT_SPECIFIC_USER_ID_SQL, (str(anon_project_specific_user_id),), correlation_id)
-
-    return append_calculated_properties_to_list(user_json)
+    identity = idn.resolve(anon_project_specific_user_id, kinds=(idn.USER_PROJECT,), correlation_id=correlation_id)
+    if identity is None:
+        return list()
+    return get_user_by_id(identity.user_id, correlation_id)
 
 
 def get_user_by_id(user_id, correlation_id=None):
@@ -106,11 +182,9 @@ def get_user_by_id(user_id, correlation_id=None):
         err.add_correlation_id(correlation_id)
         raise err
 
-    sql_where_clause = " WHERE id = %s"
-
-    user_json = execute_query(sql_q.BASE_USER_SELECT_SQL + sql_where_clause, (str(user_id),), correlation_id)
+    sql_where_clause = " WHERE u.id = %s"
 
-    return append_calculated_properties_to_list(user_json)
+    return [x.to_dict() for x in get_user_records(sql_q.BASE_USER_SELECT_SQL + sql_where_clause, (str(user_id),), correlation_id)]
 
 
 @utils.lambda_wrapper
@@ -123,7 +197,12 @@ def get_user_by_id_api(event, context):
     user_id = event['pathParameters']['id']
     logger.info('API call', extra={'user_id': user_id, 'correlation_id': correlation_id, 'event': event})
 
-    result = get_user_by_id(user_id, correlation_id)
+    result = list()
+    if not negative_cache.is_known_missing(negative_cache.USER_ID, user_id, correlation_id):
+        looked_up_at = negative_cache.lookup_time()
+        result = get_user_by_id(user_id, correlation_id)
+        if not result:
+            negative_cache.add(negative_cache.USER_ID, user_id, looked_up_at)
 
     if len(result) > 0:
         user_json = result[0]
@@ -135,14 +214,122 @@ def get_user_by_id_api(event, context):
 
 
 def get_user_by_email(user_email, correlation_id):
-    sql_where_clause = " WHERE email = %s"
-    user_json = execute_query(sql_q.BASE_USER_SELECT_SQL + sql_where_clause, (str(user_email),), correlation_id)
-    return append_calculated_properties_to_list(user_json)
+    sql_where_clause = " WHERE u.email = %s"
+    return [x.to_dict() for x in get_user_records(sql_q.BASE_USER_SELECT_SQL + sql_where_clause, (str(user_email),), correlation_id)]
+
+
+MAX_BULK_LOOKUP_IDENTIFIERS = 1000
+
+BULK_LOOKUP_IDENTIFIER_TYPES = {
+    # identifier type: (identifiers are uuids, anon id kinds)
+    'user_id': (True, None),
+    'email': (False, None),
+    'anon_project_specific_user_id': (True, (idn.USER_PROJECT,)),
+    'anon_user_task_id': (True, (idn.USER_TASK,)),
+    'any_anon_id': (True, idn.ANON_KINDS),
+}
+
 
+def get_users_by_identifiers(identifier_type, identifiers, correlation_id=None):
+    """
+    Looks up many users in a single query
+
+    Args:
+        identifier_type (str): one of the keys of BULK_LOOKUP_IDENTIFIER_TYPES
+        identifiers (list): up to MAX_BULK_LOOKUP_IDENTIFIERS identifiers of identifier_type
+        correlation_id:
 
-def list_users_by_project(project_id, logger=None, correlation_id=None):
+    Returns:
+        Dictionary containing 'found' (a dictionary mapping each identifier that matched a user to that user) and
+        'not_found' (a list of identifiers that did not match any user, in input order)
+    """
+    errorjson = {'identifier_type': identifier_type, 'correlation_id': str(correlation_id)}
+    try:
+        are_uuids, anon_kinds = BULK_LOOKUP_IDENTIFIER_TYPES[identifier_type]
+    except KeyError:
+        raise utils.DetailedValueError(f'invalid identifier_type; valid types are {list(BULK_LOOKUP_IDENTIFIER_TYPES.keys())}', errorjson)
+
+    if not isinstance(identifiers, list):
+        raise utils.DetailedValueError('identifiers must be a list', errorjson)
+    if len(identifiers) > MAX_BULK_LOOKUP_IDENTIFIERS:
+        errorjson.update({'identifiers_count': len(identifiers), 'max_identifiers': MAX_BULK_LOOKUP_IDENTIFIERS})
+        raise utils.DetailedValueError('too many identifiers', errorjson)
+
+    identifiers = [str(x).strip() for x in identifiers]
+    if identifier_type == 'email':
+        identifiers = [x.lower() for x in identifiers]
+    elif are_uuids:
+        invalid_identifiers = list()
+        for x in identifiers:
+            try:
+                utils.validate_uuid(x)
+            except utils.DetailedValueError:
+                invalid_identifiers.append(x)
+        if invalid_identifiers:
+            errorjson['invalid_identifiers'] = invalid_identifiers
+            raise utils.DetailedValueError('invalid identifiers', errorjson)
+        identifiers = [x.lower() for x in identifiers]
+    identifiers = list(dict.fromkeys(identifiers))  # removes duplicates, keeping input order
+
+    found = dict()
+    if identifiers:
+        if identifier_type == 'user_id':
+            users = get_user_records(sql_q.GET_USERS_BY_IDS_SQL, (identifiers,), correlation_id)
+            found = {x.id: x.to_dict() for x in users}
+        elif identifier_type == 'email':
+            users = get_user_records(sql_q.GET_USERS_BY_EMAILS_SQL, (identifiers,), correlation_id)
+            found = {x.email: x.to_dict() for x in users}
+        else:
+            rows = execute_query(sql_q.GET_USERS_BY_ANON_IDS_SQL, (identifiers, list(anon_kinds)), correlation_id, return_json=False, jsonize_sql=False)
+            found = {row[0]: UserRecord(*row[1:]).to_dict() for row in rows}
+
+    return {
+        'found': {x: found[x] for x in identifiers if x in found},
+        'not_found': [x for x in identifiers if x not in found],
+    }
+
+
+@utils.lambda_wrapper
+@utils.api_error_handler
+@pg_utils.db_connection_handler
+def get_users_by_identifiers_api(event, context):
+    """
+    Handler for Lambda function supporting the /v1/user-lookup API endpoint
+
+    Args:
+        event (dict): event['body'] must contain 'identifier_type' and 'identifiers' (see get_users_by_identifiers)
+        context:
+    """
+    logger = event['logger']
+    correlation_id = event['correlation_id']
+
+    body = json.loads(event['body'])
+    try:
+        identifier_type = body['identifier_type']
+        identifiers = body['identifiers']
+    except KeyError as err:
+        errorjson = {'body': body, 'correlation_id': str(correlation_id)}
+        raise utils.DetailedValueError(f'This endpoint requires body parameter {err}', errorjson)
+    logger.info('API call', extra={'identifier_type': identifier_type, 'identifiers_count': len(identifiers), 'correlation_id': correlation_id})
+
+    result = get_users_by_identifiers(identifier_type, identifiers, correlation_id)
+    return {"statusCode": HTTPStatus.OK, "body": json.dumps(result)}
+
+
+def list_users_by_project(project_id, logger=None, correlation_id=None, page_request=None):
+    """
+    Returns:
+        List of users, or a page of users (see common.pagination) if page_request is provided
+    """
     if logger is None:
         logger = utils.get_logger()
+    if page_request is not None:
+        users = execute_query(
+            base_sql=sql_q.LIST_USERS_BY_PROJECT_PAGE_SQL,
+            params=(project_id, *page_request.params),
+            correlation_id=correlation_id
+        )
+        return page_request.page(users)
     users = execute_query(
         base_sql=sql_q.LIST_USERS_BY_PROJECT_SQL,
         params=(project_id,),
@@ -167,7 +354,8 @@ def list_users_by_project_api(event, context):
 
     result = list_users_by_project(
         project_id=project_id,
-        correlation_id=correlation_id
+        correlation_id=correlation_id,
+        page_request=pagination.PageRequest.from_parameters(parameters, correlation_id),
     )
 
     return {"statusCode": HTTPStatus.OK, "body": json.dumps(result)}
@@ -204,7 +392,12 @@ def get_user_by_email_api(event, context):
     elif user_email:
         user_email = user_email.lower()
         logger.info('API call', extra={'user_email': user_email, 'correlation_id': correlation_id, 'event': event})
-        result = get_user_by_email(user_email, correlation_id)
+        result = list()
+        if not negative_cache.is_known_missing(negative_cache.USER_EMAIL, user_email, correlation_id):
+            looked_up_at = negative_cache.lookup_time()
+            result = get_user_by_email(user_email, correlation_id)
+            if not result:
+                negative_cache.add(negative_cache.USER_EMAIL, user_email, looked_up_at)
     elif anon_project_specific_user_id:
         logger.info('API call', extra={'anon_project_specific_user_id': anon_project_specific_user_id, 'correlation_id': correlation_id, 'event': event})
         result = get_user_by_anon_project_specific_user_id(anon_project_specific_user_id, correlation_id)
@@ -219,6 +412,19 @@ def get_user_by_email_api(event, context):
         raise utils.ObjectDoesNotExistError('user does not exist', errorjson)
 
 
+USER_PATCH_MAPPINGS = {
+    'email': {'table_name': 'public.projects_user', 'column_name': 'email'},
+    'email_address_verified': {'table_name': 'public.projects_user', 'column_name': 'email_address_verified'},
+    'title': {'table_name': 'public.projects_user', 'column_name': 'title'},
+    'first_name': {'table_name': 'public.projects_user', 'column_name': 'first_name'},
+    'last_name': {'table_name': 'public.projects_user', 'column_name': 'last_name'},
+    'auth0_id': {'table_name': 'public.projects_user', 'column_name': 'auth0_id'},
+    'status': {'table_name': 'public.projects_user', 'column_name': 'status'},
+    'country_code': {'table_name': 'public.projects_user', 'column_name': 'country_code'},
+    'crm_id': {'table_name': 'public.projects_user', 'column_name': 'crm_id'},
+}
+
+
 def patch_user(id_to_update, patch_json, modified_time=utils.now_with_tz(), correlation_id=new_correlation_id()):
     """
 
@@ -232,34 +438,50 @@ def patch_user(id_to_update, patch_json, modified_time=utils.now_with_tz(), corr
         Total number of rows updated in RDS database
 
     """
-    mappings = {
-        'email': {'table_name': 'public.projects_user', 'column_name': 'email'},
-        'email_address_verified': {'table_name': 'public.projects_user', 'column_name': 'email_address_verified'},
-        'title': {'table_name': 'public.projects_user', 'column_name': 'title'},
-        'first_name': {'table_name': 'public.projects_user', 'column_name': 'first_name'},
-        'last_name': {'table_name': 'public.projects_user', 'column_name': 'last_name'},
-        'auth0_id': {'table_name': 'public.projects_user', 'column_name': 'auth0_id'},
-        'status': {'table_name': 'public.projects_user', 'column_name': 'status'},
-        'country_code': {'table_name': 'public.projects_user', 'column_name': 'country_code'},
-        'crm_id': {'table_name': 'public.projects_user', 'column_name': 'crm_id'},
-    }
-
     id_column = 'id'
 
-    return execute_jsonpatch(id_column, id_to_update, mappings, patch_json, modified_time, correlation_id)
+    updated_rows = execute_jsonpatch(id_column, id_to_update, USER_PATCH_MAPPINGS, patch_json, modified_time, correlation_id)
+    invalidate_patched_emails([patch_json], correlation_id)
+    return updated_rows
+
 
+def patch_user_and_save_entity_update(user_id, user_jsonpatch, modified_time, correlation_id):
+    """
+    Patches user and creates an audit record of the update (including an 'undo' patch) in a single statement
 
-def create_user_entity_update(user_id, user_jsonpatch, modified, correlation_id):
+    Returns:
+        Number of rows updated in RDS database
+    """
     try:
-        original_user_list = get_user_by_id(user_id, correlation_id)
-        original_user = original_user_list[0]
-        return EntityUpdate('user', original_user, user_jsonpatch, modified, correlation_id)
-    except IndexError as ex:
-        errorjson = {'user_id': user_id, 'correlation_id': str(correlation_id)}
-        raise utils.ObjectDoesNotExistError('user does not exist', errorjson)
-    except JsonPatchException as ex:
+        user_id = str(utils.validate_uuid(user_id))
+    except utils.DetailedValueError as err:
+        err.add_correlation_id(correlation_id)
+        raise err
+
+    try:
+        updated_rows = pg_utils.execute_jsonpatch_with_entity_update('user', 'id', user_id, USER_PATCH_MAPPINGS, user_jsonpatch,
+                                                                     modified_time, correlation_id)
+    except (utils.PatchInvalidJsonError, utils.PatchAttributeNotRecognisedError, utils.PatchOperationNotSupportedError):
         errorjson = {'user_jsonpatch': user_jsonpatch.to_string(), 'correlation_id': str(correlation_id)}
         raise utils.PatchInvalidJsonError('invalid jsonpatch', errorjson)
+    invalidate_patched_emails([user_jsonpatch], correlation_id)
+    return updated_rows
+
+
+def invalidate_patched_emails(user_jsonpatches, correlation_id=None):
+    """
+    Users can be found by their new email once patched, so cached misses of that email must be discarded
+    """
+    emails = [p['value'] for user_jsonpatch in user_jsonpatches for p in user_jsonpatch if (p.get('path') == '/email') and ('value' in p)]
+    if emails:
+        negative_cache.invalidate(negative_cache.USER_EMAIL, emails, correlation_id)
+
+
+def lowercase_email_in_jsonpatch(user_jsonpatch):
+    for p in user_jsonpatch:
+        if p.get('path') == '/email':
+            p['value'] = p['value'].lower()
+    return user_jsonpatch
 
 
 @utils.lambda_wrapper
@@ -279,23 +501,102 @@ def patch_user_api(event, context):
             'correlation_id': correlation_id,
         })
 
-    # convert email to lowercase
-    for p in user_jsonpatch:
-        if p.get('path') == '/email':
-            p['value'] = p['value'].lower()
+    lowercase_email_in_jsonpatch(user_jsonpatch)
 
     logger.info('API call', extra={'user_id': user_id, 'user_jsonpatch': user_jsonpatch, 'correlation_id': correlation_id, 'event': event})
 
     modified_time = utils.now_with_tz()
 
-    # create an audit record of update, inc 'undo' patch
-    entity_update = create_user_entity_update(user_id, user_jsonpatch, modified_time, correlation_id)
-    patch_user(user_id, user_jsonpatch, modified_time, correlation_id)
-    # on successful update save audit record
-    entity_update.save()
+    patch_user_and_save_entity_update(user_id, user_jsonpatch, modified_time, correlation_id)
     return {"statusCode": HTTPStatus.NO_CONTENT, "body": json.dumps('')}
 
 
+MAX_BULK_PATCH_ITEMS = 1000
+
+
+def patch_users(user_patches, modified_time, correlation_id=None, save_entity_updates=True):
+    """
+    Applies many user patches in a single transaction, creating an audit record of each update (as patch_user_api does)
+
+    Args:
+        user_patches (list): up to MAX_BULK_PATCH_ITEMS dictionaries containing keys id (user id) and jsonpatch (list of
+                operations)
+        modified_time:
+        correlation_id:
+        save_entity_updates (bool): if False, no audit records are created (as patch_user does)
+
+    Returns:
+        List containing a result for each item in user_patches, in the same order. Results are dictionaries containing
+        the user id and a status code: 204 (updated), 400 (invalid item), 404 (user does not exist) or 409 (patch rejected
+        by the database, e.g. a null value for a required attribute; other items are still applied). Results of items that
+        were not applied also contain a message
+    """
+    if not isinstance(user_patches, list) or len(user_patches) > MAX_BULK_PATCH_ITEMS:
+        errorjson = {'max_items': MAX_BULK_PATCH_ITEMS, 'correlation_id': str(correlation_id)}
+        raise utils.DetailedValueError(f'user patches must be a list of up to {MAX_BULK_PATCH_ITEMS} items', errorjson)
+
+    results = list()
+    valid_patches = list()
+    patched_ids = set()
+    for item in user_patches:
+        result = {'id': item.get('id') if isinstance(item, dict) else None}
+        results.append(result)
+        try:
+            user_id = str(utils.validate_uuid(item['id']))
+        except (utils.DetailedValueError, KeyError, TypeError):
+            result.update({'status': HTTPStatus.BAD_REQUEST, 'message': 'invalid user id'})
+            continue
+        try:
+            user_jsonpatch = lowercase_email_in_jsonpatch(JsonPatch(item['jsonpatch']))
+            pg_utils.create_updates_list_from_jsonpatch(USER_PATCH_MAPPINGS, user_jsonpatch, correlation_id)
+        except (InvalidJsonPatch, utils.PatchInvalidJsonError, utils.PatchAttributeNotRecognisedError,
+                utils.PatchOperationNotSupportedError, AttributeError, KeyError, TypeError):
+            result.update({'status': HTTPStatus.BAD_REQUEST, 'message': 'invalid jsonpatch'})
+            continue
+        if user_id in patched_ids:
+            result.update({'status': HTTPStatus.BAD_REQUEST, 'message': 'duplicate user id'})
+            continue
+        result.update({'id': user_id, 'status': HTTPStatus.NO_CONTENT})
+        valid_patches.append((user_id, user_jsonpatch))
+        patched_ids.add(user_id)
+
+    updated_ids, rejected_ids = pg_utils.execute_bulk_jsonpatch_with_entity_update(
+        'user', 'id', USER_PATCH_MAPPINGS, valid_patches, modified_time, correlation_id, save_entity_updates
+    )
+    for result in results:
+        if result['status'] != HTTPStatus.NO_CONTENT:
+            continue
+        if result['id'] in rejected_ids:
+            result['status'] = HTTPStatus.CONFLICT
+            result['message'] = 'database integrity error'
+        elif result['id'] not in updated_ids:
+            result['status'] = HTTPStatus.NOT_FOUND
+            result['message'] = 'user does not exist'
+    invalidate_patched_emails([user_jsonpatch for user_id, user_jsonpatch in valid_patches if user_id in updated_ids], correlation_id)
+    return results
+
+
+@utils.lambda_wrapper
+@utils.api_error_handler
+@pg_utils.db_connection_handler
+def patch_users_api(event, context):
+    """
+    Handler for Lambda function supporting PATCH requests to the /v1/user API endpoint
+
+    Args:
+        event (dict): event['body'] must be a list of dictionaries containing keys id and jsonpatch (see patch_users)
+        context:
+    """
+    logger = event['logger']
+    correlation_id = event['correlation_id']
+
+    user_patches = json.loads(event['body'])
+    logger.info('API call', extra={'items_count': len(user_patches), 'correlation_id': correlation_id})
+
+    results = patch_users(user_patches, utils.now_with_tz(), correlation_id)
+    return {"statusCode": HTTPStatus.OK, "body": json.dumps(results)}
+
+
 # User create JSON should look like this:
 #   {
 #     "id": "48e30e54-b4fc-4303-963f-2943dda2b139",
@@ -356,14 +657,11 @@ def create_user(user_json, correlation_id):
     else:
         title = None
 
-    existing_user = get_user_by_id(id, correlation_id)
-    if len(existing_user) > 0:
+    params = (str(id), created, created, email, title, first_name, last_name, country_code, auth0_id, status)
+    if not pg_utils.execute_non_query_returning(sql_q.CREATE_USER_SQL, params, correlation_id):
         errorjson = {'id': id, 'correlation_id': str(correlation_id)}
         raise utils.DuplicateInsertError('user already exists', errorjson)
 
-    params = (id, created, created, email, title, first_name, last_name, country_code, auth0_id, status)
-    execute_non_query(sql_q.CREATE_USER_SQL, params, correlation_id)
-
     new_user = {
         'id': id,
         'created': created,
@@ -379,6 +677,8 @@ def create_user(user_json, correlation_id):
     }
 
     new_user = append_calculated_properties(new_user)
+    negative_cache.invalidate(negative_cache.USER_ID, [id], correlation_id)
+    negative_cache.invalidate(negative_cache.USER_EMAIL, [email], correlation_id)
 
     try:
         notify_new_user_registration(new_user, correlation_id)
@@ -399,3 +699,206 @@ def create_user_api(event, context):
     logger.info('API call', extra={'user_json': user_json, 'correlation_id': correlation_id, 'event': event})
     new_user = create_user(user_json, correlation_id)
     return {"statusCode": HTTPStatus.CREATED, "body": json.dumps(new_user)}
+
+
+MAX_IMPORT_ROWS = 5000
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_REQUIRED_FIELDS = ('first_name', 'last_name', 'status')  # as in create_user; emails are validated in the database
+NOTIFICATION_WORKERS = 8
+
+
+def parse_user_import(body, import_format='csv', correlation_id=None):
+    """
+    Args:
+        body (str): CSV (with a header row) or NDJSON (one JSON object per line) document containing one user per row.
+                Columns other than those in sql_q.USER_IMPORT_COLUMNS are ignored
+        import_format (str): one of IMPORT_FORMATS
+        correlation_id:
+
+    Returns:
+        List of dictionaries, one per row
+    """
+    if import_format not in IMPORT_FORMATS:
+        errorjson = {'format': import_format, 'valid_formats': IMPORT_FORMATS, 'correlation_id': str(correlation_id)}
+        raise utils.DetailedValueError('invalid import format', errorjson)
+    try:
+        if import_format == 'csv':
+            rows = list(csv.DictReader(io.StringIO(body)))
+        else:
+            rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+        if not all(isinstance(r, dict) for r in rows):
+            raise ValueError('rows must be objects')
+    except (csv.Error, ValueError) as err:
+        errorjson = {'format': import_format, 'error': str(err), 'correlation_id': str(correlation_id)}
+        raise utils.DetailedValueError('invalid import file', errorjson)
+    if not 0 < len(rows) <= MAX_IMPORT_ROWS:
+        errorjson = {'rows': len(rows), 'max_rows': MAX_IMPORT_ROWS, 'correlation_id': str(correlation_id)}
+        raise utils.DetailedValueError(f'import files must contain between 1 and {MAX_IMPORT_ROWS} rows', errorjson)
+    return rows
+
+
+def import_row_error(row):
+    """
+    Returns:
+        Error message if row lacks any of IMPORT_REQUIRED_FIELDS, None otherwise
+    """
+    for field in IMPORT_REQUIRED_FIELDS:
+        if not str(row.get(field) or '').strip():
+            return f'{field} is required'
+
+
+def user_import_staging_file(numbered_rows):
+    """
+    Args:
+        numbered_rows (list): (row number, row) tuples
+
+    Returns:
+        CSV file (without header) of rows in the layout of the user import staging table. Users without an id are given
+        a new one
+    """
+    staging_file = io.StringIO()
+    writer = csv.writer(staging_file)
+    for row_number, row in numbered_rows:
+        values = [row.get(c) for c in sql_q.USER_IMPORT_COLUMNS]
+        if not values[0]:
+            values[0] = str(uuid.uuid4())
+        writer.writerow([row_number, *(None if v is None else str(v) for v in values)])
+    staging_file.seek(0)
+    return staging_file
+
+
+def valid_country_codes(rows):
+    """
+    Returns:
+        List of the distinct country codes in rows that are valid
+    """
+    codes = set()
+    for code in {str(r.get('country_code') or '').strip() for r in rows}:
+        try:
+            country_name(code)
+        except utils.DetailedValueError:
+            continue
+        codes.add(code)
+    return list(codes)
+
+
+def notify_new_user_registrations(new_users, correlation_id=None):
+    """
+    Posts registration notifications of new_users concurrently
+
+    Returns:
+        List of the ids of users whose notification could not be posted
+    """
+    logger = utils.get_logger()
+
+    def notify(new_user):
+        try:
+            notify_new_user_registration(new_user, correlation_id)
+        except Exception as err:
+            logger.error('Failed to post registration notification', extra={'user_id': new_user['id'], 'error': repr(err), 'correlation_id': correlation_id})
+            return new_user['id']
+
+    with ThreadPoolExecutor(max_workers=NOTIFICATION_WORKERS) as executor:
+        return [user_id for user_id in executor.map(notify, new_users) if user_id is not None]
+
+
+def import_users(rows, correlation_id=None):
+    """
+    Creates many users at once. Rows missing required fields are rejected first; the others are copied into a staging
+    table and validated there (ids, emails, country codes and duplicates, both within the import and against existing
+    users), and all valid rows are then inserted by a single statement. Registration notifications of the new users are
+    posted as create_user does
+
+    Args:
+        rows (list): output of parse_user_import; each row may contain the same keys as the input of create_user, except
+                created (users are created at the time of the import)
+        correlation_id:
+
+    Returns:
+        Dictionary containing the number of users created and a report of each row, in input order. Row reports contain the
+        row number (starting at 1), user id, email and a status code: 201 (created), 400 (invalid row) or 409 (user
+        already exists); rows that were not imported also contain a message
+    """
+    report = dict()  # row number: row report
+    staged_rows = list()
+    for row_number, row in enumerate(rows, start=1):
+        error = import_row_error(row)
+        if error is None:
+            staged_rows.append((row_number, row))
+        else:
+            report[row_number] = {
+                'row': row_number,
+                'id': row.get('id') or None,
+                'email': row.get('email'),
+                'status': HTTPStatus.BAD_REQUEST,
+                'message': error,
+            }
+
+    created = str(utils.now_with_tz())
+    results = list()
+    if staged_rows:
+        params = {'country_codes': valid_country_codes([r for _, r in staged_rows]), 'created': created}
+        results = pg_utils.execute_copy_and_non_query_returning(
+            sql_q.CREATE_USER_IMPORT_STAGING_SQL, sql_q.COPY_USER_IMPORT_STAGING_SQL, user_import_staging_file(staged_rows),
+            sql_q.IMPORT_USERS_FROM_STAGING_SQL, params, correlation_id
+        )
+
+    new_users = list()
+    for r in results:
+        row_report = {'row': r['row_number'], 'id': r['id'], 'email': r['email']}
+        if r['error'] is None:
+            row_report['status'] = HTTPStatus.CREATED
+            new_users.append(append_calculated_properties({
+                'id': r['id'],
+                'created': created,
+                'modified': created,
+                'email': r['email'],
+                'title': r['title'],
+                'first_name': r['first_name'],
+                'last_name': r['last_name'],
+                'auth0_id': r['auth0_id'],
+                'crm_id': None,
+                'country_code': r['country_code'],
+                'status': r['status'],
+            }))
+        elif r['error'] == 'user already exists':
+            row_report.update({'status': HTTPStatus.CONFLICT, 'message': r['error']})
+        else:
+            row_report.update({'status': HTTPStatus.BAD_REQUEST, 'message': r['error']})
+        report[r['row_number']] = row_report
+    report = [report[row_number] for row_number in sorted(report)]
+
+    if new_users:
+        negative_cache.invalidate(negative_cache.USER_ID, [x['id'] for x in new_users], correlation_id)
+        negative_cache.invalidate(negative_cache.USER_EMAIL, [x['email'] for x in new_users], correlation_id)
+
+    failed_notifications = set(notify_new_user_registrations(new_users, correlation_id))
+    for row_report in report:
+        if row_report['id'] in failed_notifications:
+            row_report['message'] = 'user created but registration notification failed'
+
+    return {'created': len(new_users), 'rows': report}
+
+
+@utils.lambda_wrapper
+@utils.api_error_handler
+@pg_utils.db_connection_handler
+def import_users_api(event, context):
+    """
+    Handler for Lambda function supporting the /v1/user-import API endpoint
+
+    Args:
+        event (dict): event['body'] is a CSV or NDJSON document (see parse_user_import); optional query parameter format
+                ('csv' or 'ndjson'; default 'csv')
+        context:
+    """
+    logger = event['logger']
+    correlation_id = event['correlation_id']
+
+    parameters = event['queryStringParameters'] or dict()
+    import_format = parameters.get('format', 'csv')
+    rows = parse_user_import(event['body'], import_format, correlation_id)
+    logger.info('API call', extra={'format': import_format, 'rows_count': len(rows), 'correlation_id': correlation_id})
+
+    result = import_users(rows, correlation_id)
+    return {"statusCode": HTTPStatus.OK, "body": json.dumps(result)}
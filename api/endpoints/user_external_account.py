@@ -22,9 +22,8 @@ from http import HTTPStatus
 
 import common.pg_utilities as pg_utils
 import thiscovery_lib.utilities as utils
-from common.pg_utilities import execute_query, execute_non_query
+from common.pg_utilities import execute_query
 from common.sql_queries import CHECK_USER_ID_AND_EXTERNAL_ACCOUNT_SQL, CREATE_USER_EXTERNAL_ACCOUNT_SQL
-from user import get_user_by_id
 
 
 STATUS_CHOICES = (
@@ -90,19 +89,25 @@ def create_user_external_account(uea_json, correlation_id):
     else:
         status = DEFAULT_STATUS
 
-    # check external account does not already exist
-    existing = check_user_id_and_external_account(user_id, external_system_id, correlation_id)
-    if len(existing) > 0:
-        errorjson = {'user_id': user_id, 'external_system_id': external_system_id, 'correlation_id': str(correlation_id)}
-        raise utils.DuplicateInsertError('user_external_account already exists', errorjson)
-
-    # lookup user id (needed for insert) for user uuid (supplied in json)
-    existing_user = get_user_by_id(user_id, correlation_id)
-    if len(existing_user) == 0:
+    # insert unless user does not exist or external account already exists
+    result = pg_utils.execute_non_query_returning(
+        CREATE_USER_EXTERNAL_ACCOUNT_SQL,
+        {
+            'id': str(id),
+            'created': created,
+            'external_system_id': str(external_system_id),
+            'user_id': str(user_id),
+            'external_user_id': external_user_id,
+            'status': status,
+        },
+        correlation_id
+    )[0]
+    if not result['user_exists']:
         errorjson = {'user_id': user_id, 'correlation_id': str(correlation_id)}
         raise utils.ObjectDoesNotExistError('user does not exist', errorjson)
-
-    execute_non_query(CREATE_USER_EXTERNAL_ACCOUNT_SQL, (id, created, created, external_system_id, user_id, external_user_id, status), correlation_id)
+    if not result['inserted']:
+        errorjson = {'user_id': user_id, 'external_system_id': external_system_id, 'correlation_id': str(correlation_id)}
+        raise utils.DuplicateInsertError('user_external_account already exists', errorjson)
 
     new_user_external_account = {
         'id': id,
@@ -17,6 +17,7 @@
 #
 
 import common.pg_utilities as pg_utils
+import common.shared_cache as shared_cache
 import common.sql_queries as sql_q
 from common.pg_utilities import execute_query
 from thiscovery_lib.utilities import validate_uuid, DetailedValueError
@@ -86,12 +87,20 @@ class UserGroup(EntityBase):
     @pg_utils.db_connection_handler
     def get_by_url_code(cls, url_code, correlation_id):
 
-        sql_where_clause = " WHERE url_code = %s"
-
-        ug_json = execute_query(sql_q.USER_GROUP_BASE_SELECT_SQL + sql_where_clause, (str(url_code),), correlation_id)
+        def query_user_group():
+            sql_where_clause = " WHERE url_code = %s"
+            result = execute_query(sql_q.USER_GROUP_BASE_SELECT_SQL + sql_where_clause, (str(url_code),), correlation_id)
+            if len(result) > 0:
+                return result[0]
+
+        ug_json = shared_cache.get_or_compute(
+            name='user_group_by_url_code',
+            version=str(url_code),
+            compute=query_user_group,
+            correlation_id=correlation_id,
+        )
 
-        if len(ug_json) > 0:
-            ug_json = ug_json[0]
+        if ug_json is not None:
             return cls.from_json(ug_json, correlation_id)
         else:
             return None
@@ -21,8 +21,8 @@ import thiscovery_lib.utilities as utils
 from http import HTTPStatus
 
 import common.pg_utilities as pg_utils
-from common.pg_utilities import execute_non_query, execute_query_multiple
-from common.sql_queries import SQL_USER, SQL_USER_GROUP, SQL_USER_GROUP_MEMBERSHIP, INSERT_USER_GROUP_MEMBERSHIP_SQL
+from common.pg_utilities import execute_non_query, execute_non_query_returning
+from common.sql_queries import CREATE_USER_GROUP_MEMBERSHIP_SQL, INSERT_USER_GROUP_MEMBERSHIP_SQL
 from thiscovery_lib.entity_base import EntityBase
 from user_group import UserGroup
 
@@ -79,41 +79,40 @@ class UserGroupMembership(EntityBase):
                 raise utils.ObjectDoesNotExistError('user group url_code does not exist', errorjson)
         try:
             ugm = UserGroupMembership.from_json(ugm_json, correlation_id)
-            ugm.validate(correlation_id)
-            ugm.insert_to_db(correlation_id)
+            ugm.validate_and_insert_to_db(correlation_id)
             return ugm
         except Exception as err:
             raise err
 
-    def validate(self, correlation_id):
+    def validate_and_insert_to_db(self, correlation_id):
         """
-        Checks that the ids in self actually exist in database and that self does not already exist
+        Inserts self in a single statement that checks that the ids in self actually exist in database and that self does not
+        already exist
         :return: nothing, but raises errors if not valid
         """
-        results = execute_query_multiple(
-            base_sql_tuple=(SQL_USER, SQL_USER_GROUP, SQL_USER_GROUP_MEMBERSHIP),
-            params_tuple=((self.user_id,), (self.user_group_id,), (self.user_id, self.user_group_id)),
-            correlation_id=correlation_id
-        )
-
-        user_data = results[0]
-        user_group_data = results[1]
-        user_group_membership_data = results[2]
-
-        if len(user_data) == 0:
+        result = execute_non_query_returning(
+            CREATE_USER_GROUP_MEMBERSHIP_SQL,
+            {
+                'id': str(self.id),
+                'created': self.created,
+                'user_id': str(self.user_id),
+                'user_group_id': str(self.user_group_id),
+            },
+            correlation_id
+        )[0]
+
+        if not result['user_exists']:
             errorjson = {'user_id': self.user_id, 'correlation_id': str(correlation_id)}
             raise utils.ObjectDoesNotExistError('user does not exist', errorjson)
 
-        if len(user_group_data) == 0:
+        if not result['user_group_exists']:
             errorjson = {'user_group_id': self.user_group_id, 'correlation_id': str(correlation_id)}
             raise utils.ObjectDoesNotExistError('user group does not exist', errorjson)
 
-        if len(user_group_membership_data) > 0:
+        if not result['inserted']:
             errorjson = {'user_id': self.user_id, 'user_group_id': self.user_group_id, 'correlation_id': str(correlation_id)}
             raise utils.DuplicateInsertError('user group membership already exists', errorjson)
 
-        # if no errors nothing to do, nothing to return, let things carry on...
-
     @pg_utils.db_connection_handler
     def insert_to_db(self, correlation_id=None):
         # todo ref integrity check
@@ -0,0 +1,74 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+import json
+from http import HTTPStatus
+
+import common.pg_utilities as pg_utils
+import thiscovery_lib.utilities as utils
+from project import render_project_status_for_user
+from user import get_user_by_id
+from user_task import list_user_tasks_by_user
+
+
+def render_user_home(user_id, demo=False, correlation_id=None):
+    """
+    Assembles the documents returned by the user, project-user-status and usertask endpoints for the same user, fetching the
+    user record only once (the user task listing reads the names it needs in its own query).
+
+    Returns:
+        JSON string of a dictionary containing keys user, project_status and user_tasks
+    """
+    try:
+        user_id = str(utils.validate_uuid(user_id))
+    except utils.DetailedValueError as err:
+        err.add_correlation_id(correlation_id)
+        raise err
+
+    try:
+        user = get_user_by_id(user_id, correlation_id)[0]
+    except IndexError:
+        errorjson = {'user_id': user_id, 'correlation_id': str(correlation_id)}
+        raise utils.ObjectDoesNotExistError('user does not exist', errorjson)
+
+    project_status = render_project_status_for_user(user_id, demo, correlation_id, user=user)
+    user_tasks = list_user_tasks_by_user(user_id, correlation_id)
+
+    # project status is already serialised; splice it in rather than decoding and encoding it again
+    return f'{{"user": {json.dumps(user)}, "project_status": {project_status}, "user_tasks": {json.dumps(user_tasks)}}}'
+
+
+@utils.lambda_wrapper
+@utils.api_error_handler
+@pg_utils.db_connection_handler
+def get_user_home_api(event, context):
+    logger = event['logger']
+    correlation_id = event['correlation_id']
+
+    parameters = event['queryStringParameters']
+    try:
+        user_id = parameters['user_id']
+    except (KeyError, TypeError):
+        errorjson = {'queryStringParameters': parameters, 'correlation_id': str(correlation_id)}
+        raise utils.DetailedValueError('This endpoint requires parameter user_id', errorjson)
+    demo = parameters.get('demo', False)
+    logger.info('API call', extra={'user_id': user_id, 'correlation_id': correlation_id, 'event': event})
+
+    return {
+        "statusCode": HTTPStatus.OK,
+        "body": render_user_home(user_id, demo, correlation_id),
+    }
@@ -21,9 +21,11 @@ import json
 import thiscovery_lib.utilities as utils
 from http import HTTPStatus
 
+import common.pagination as pagination
 import common.pg_utilities as pg_utils
-from common.pg_utilities import execute_query, execute_non_query
-from common.sql_queries import LIST_USER_PROJECTS_SQL, GET_EXISTING_USER_PROJECT_ID_SQL, CREATE_USER_PROJECT_SQL
+from common.pg_utilities import execute_query
+from common.sql_queries import LIST_USER_PROJECTS_SQL, LIST_USER_PROJECTS_PAGE_SQL, GET_EXISTING_USER_PROJECT_ID_SQL, CREATE_USER_PROJECT_SQL, \
+    CREATE_USER_PROJECTS_IF_NOT_EXIST_SQL
 from user import get_user_by_id
 # from utils import validate_uuid
 
@@ -47,7 +49,11 @@ def validate_status(s):
         raise utils.DetailedValueError('invalid user_project status', errorjson)
 
 
-def list_user_projects(user_id, correlation_id):
+def list_user_projects(user_id, correlation_id, page_request=None):
+    """
+    Returns:
+        List of user projects, or a page of user projects (see common.pagination) if page_request is provided
+    """
 
     try:
         user_id = utils.validate_uuid(user_id)
@@ -60,6 +66,8 @@ def list_user_projects(user_id, correlation_id):
         errorjson = {'user_id': user_id, 'correlation_id': str(correlation_id)}
         raise utils.ObjectDoesNotExistError('user does not exist', errorjson)
 
+    if page_request is not None:
+        return page_request.page(execute_query(LIST_USER_PROJECTS_PAGE_SQL, (str(user_id), *page_request.params), correlation_id))
     return execute_query(LIST_USER_PROJECTS_SQL, (str(user_id),), correlation_id)
 
 
@@ -75,7 +83,7 @@ def list_user_projects_api(event, context):
     logger.info('API call', extra={'user_id': user_id, 'correlation_id': correlation_id, 'event': event})
     return {
         "statusCode": HTTPStatus.OK,
-        "body": json.dumps(list_user_projects(user_id, correlation_id))
+        "body": json.dumps(list_user_projects(user_id, correlation_id, pagination.PageRequest.from_parameters(params, correlation_id)))
     }
 
 
@@ -131,22 +139,28 @@ def create_user_project(up_json, correlation_id, do_nothing_if_exists=False):
     else:
         id = str(uuid.uuid4())
 
-    # check external account does not already exist
-    existing = get_existing_user_project_id(user_id, project_id, correlation_id)
-    if len(existing) > 0:
-        if do_nothing_if_exists:
-            return existing[0]
-        else:
-            errorjson = {'user_id': user_id, 'project_id': project_id, 'correlation_id': str(correlation_id)}
-            raise utils.DuplicateInsertError('user_project already exists', errorjson)
-
-    # lookup user id (needed for insert) for user uuid (supplied in json)
-    result = get_user_by_id(user_id, correlation_id)
-    if len(result) == 0:
+    # insert unless user does not exist or user project already exists
+    result = pg_utils.execute_non_query_returning(
+        CREATE_USER_PROJECT_SQL,
+        {
+            'id': str(id),
+            'created': created,
+            'user_id': str(user_id),
+            'project_id': str(project_id),
+            'status': status,
+            'anon_project_specific_user_id': str(anon_project_specific_user_id),
+        },
+        correlation_id
+    )[0]
+    if not result['user_exists']:
         errorjson = {'user_id': user_id, 'correlation_id': str(correlation_id)}
         raise utils.ObjectDoesNotExistError('user does not exist', errorjson)
-
-    execute_non_query(CREATE_USER_PROJECT_SQL, (id, created, created, user_id, project_id, status, anon_project_specific_user_id), correlation_id)
+    if not result['inserted']:
+        if do_nothing_if_exists:
+            # existing is None if the user project was created by a concurrent request after this statement started
+            return result['existing'] or get_existing_user_project_id(user_id, project_id, correlation_id)[0]
+        errorjson = {'user_id': user_id, 'project_id': project_id, 'correlation_id': str(correlation_id)}
+        raise utils.DuplicateInsertError('user_project already exists', errorjson)
 
     new_user_project = {
         'id': id,
@@ -181,3 +195,38 @@ def create_user_project_if_not_exists(user_id, project_id, correlation_id=None):
         'status': 'active'
     }
     return create_user_project(up_json, correlation_id, True)
+
+
+def user_projects_if_not_exist_params(user_ids, project_id):
+    """
+    Parameters of CREATE_USER_PROJECTS_IF_NOT_EXIST_SQL
+    """
+    return {
+        'user_ids': list(user_ids),
+        'user_project_ids': [str(uuid.uuid4()) for _ in user_ids],
+        'anon_project_specific_user_ids': [str(uuid.uuid4()) for _ in user_ids],
+        'project_id': str(project_id),
+        'created': str(utils.now_with_tz()),
+    }
+
+
+def create_user_projects_if_not_exist(user_ids, project_id, correlation_id=None):
+    """
+    Set-wise version of create_user_project_if_not_exists: creates the missing user projects of many users in a single
+    statement
+
+    Args:
+        user_ids (list): valid and distinct user ids
+        project_id:
+        correlation_id:
+
+    Returns:
+        List of dictionaries, one per user id, containing user_id, user_exists, id and anon_project_specific_user_id. id and
+        anon_project_specific_user_id are None if the user does not exist (or, rarely, if a concurrent request created the
+        user project after the statement started)
+    """
+    return pg_utils.execute_non_query_returning(
+        CREATE_USER_PROJECTS_IF_NOT_EXIST_SQL,
+        user_projects_if_not_exist_params(user_ids, project_id),
+        correlation_id
+    )
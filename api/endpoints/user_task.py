@@ -18,18 +18,21 @@
 import functools
 import json
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 
+import common.identity as idn
+import common.negative_cache as negative_cache
+import common.pagination as pagination
 import common.pg_utilities as pg_utils
 import common.sql_queries as sql_q
+import common.task_urls as task_urls
 import thiscovery_lib.utilities as utils
 from thiscovery_lib.dynamodb_utilities import Dynamodb
 from common.pg_utilities import execute_query, execute_non_query
-from common.sql_queries import GET_USER_TASK_SQL, UPDATE_USER_TASK_PROGRESS_INFO_SQL, CHECK_IF_USER_TASK_EXISTS_SQL, \
-    CREATE_USER_TASK_SQL
-from user import get_user_by_id
+from common.sql_queries import GET_USER_TASK_SQL, UPDATE_USER_TASK_PROGRESS_INFO_SQL, CHECK_IF_USER_TASK_EXISTS_SQL
 from project import get_project_task
-from user_project import create_user_project_if_not_exists
+from user_project import user_projects_if_not_exist_params
 from thiscovery_lib.notification_send import notify_new_task_signup
 
 STATUS_CHOICES = (
@@ -39,6 +42,9 @@ STATUS_CHOICES = (
 )
 DEFAULT_STATUS = 'active'
 
+# signup is only retried if a concurrent request creates the same user project
+MAX_SIGNUP_ATTEMPTS = 2
+
 
 class UserTask:
     user_specific_url_table = "UserSpecificUrls"
@@ -141,6 +147,9 @@ class UserTask:
             }
             raise utils.DetailedIntegrityError('project_task does not exist', errorjson)
 
+        self._set_project_task_details(pt_)
+
+    def _set_project_task_details(self, pt_):
         self.project_id = pt_['project_id']
         self.base_url = pt_['base_url']
         self.task_provider_name = pt_['task_provider_name']
@@ -149,28 +158,9 @@ class UserTask:
         self.anonymise_url = pt_['anonymise_url']
         self.task_type_name = pt_['task_type_name']
 
-    def _create_user_task_abort_if_exists(self):
-        existing = check_if_user_task_exists(self.user_id, self.project_task_id, self._correlation_id)
-        if len(existing) > 0:
-            errorjson = {
-                'user_id': self.user_id,
-                'project_task_id': self.project_task_id,
-                'existing_user_task': existing[0][0],
-                'correlation_id': str(self._correlation_id)
-            }
-            raise utils.DuplicateInsertError('user_task already exists', errorjson)
-
-    def _get_user_info(self):
-        # get user info if not received from calling process
+    def _set_user_details(self, user):
+        # use user info received from calling process if complete
         if None in [self.first_name, self.last_name, self.email]:
-            try:
-                user = get_user_by_id(self.user_id, correlation_id=self._correlation_id)[0]
-            except IndexError:
-                errorjson = {
-                    'user_id': self.user_id,
-                    'correlation_id': str(self._correlation_id)
-                }
-                return utils.ObjectDoesNotExistError('User does not exist', errorjson)
             self.first_name = user['first_name']
             self.last_name = user['last_name']
             self.email = user['email']
@@ -179,83 +169,37 @@ class UserTask:
         self._logger.debug('Calculating url of user task', extra={
             'user_task_dict': self.as_dict()
         })
-        if self.user_specific_url:
-            self.base_url = self.user_task_url
-
-        if self.base_url:
-            if self.anonymise_url:
-                params = utils.create_anonymous_url_params(
-                    base_url=self.base_url,
-                    anon_project_specific_user_id=self.anon_project_specific_user_id,
-                    user_first_name=self.first_name,
-                    anon_user_task_id=self.anon_user_task_id,
-                    external_task_id=self.external_task_id,
-                    project_task_id=self.project_task_id,
-                )
-            else:
-                params = utils.create_url_params(
-                    base_url=self.base_url,
-                    user_id=self.user_id,
-                    user_first_name=self.first_name,
-                    user_task_id=self.id,
-                    external_task_id=self.external_task_id
-                )
-
-            if self.task_type_name is None:
-                self._get_project_task()
-            if self.task_type_name == 'interview':
-                # add last name and email for use with Acuity Scheduler
-                params = f"{params}" \
-                         f"&last_name={self.last_name}" \
-                         f"&email={self.email}"
-
-            return "{}{}{}".format(
-                self.base_url,
-                params,
-                utils.non_prod_env_url_param()
-            )
+        if self.task_type_name is None:
+            self._get_project_task()
+        url_values = task_urls.user_url_values(self.user_id, self.first_name, self.last_name, self.email)
+        return task_urls.task_url(
+            url_values,
+            base_url=self.base_url,
+            user_specific_url=self.user_specific_url,
+            user_task_url=self.user_task_url,
+            anonymise_url=self.anonymise_url,
+            task_type_name=self.task_type_name,
+            external_task_id=self.external_task_id,
+            project_task_id=self.project_task_id,
+            user_task_id=self.id,
+            anon_project_specific_user_id=self.anon_project_specific_user_id,
+            anon_user_task_id=self.anon_user_task_id,
+        )
 
     def _get_ddb_client(self):
         if self._ddb_client is None:
             self._ddb_client = Dynamodb(correlation_id=self._correlation_id)
 
-    def _get_user_specific_task_url_from_ddb(self):
-        if self.user_specific_url:
-            self._get_ddb_client()
-            item_key = f"{self.project_task_id}_{self.user_id}"
-            item = self._ddb_client.get_item(
-                table_name=self.user_specific_url_table,
-                key=item_key,
-                correlation_id=self._correlation_id,
-            )
-            try:
-                self.user_task_url = item['user_specific_url']
-            except TypeError:
-                errorjson = {
-                    'user_id': self.user_id,
-                    'project_task_id': self.project_task_id,
-                    'correlation_id': str(self._correlation_id)
-                }
-                raise utils.ObjectDoesNotExistError('User specific url not found', errorjson)
-            return item_key
-
-    def thiscovery_db_dump(self):
-        row_count = execute_non_query(
-            sql=CREATE_USER_TASK_SQL,
-            params=(
-                self.id,
-                self.created,
-                self.created,
-                self.user_project_id,
-                self.project_task_id,
-                self.status,
-                self.consented,
-                self.anon_user_task_id,
-                self.user_task_url,
-            ),
-            correlation_id=self._correlation_id
+    def _user_specific_url_item_key(self):
+        return f"{self.project_task_id}_{self.user_id}"
+
+    def _get_user_specific_url_item_from_ddb(self):
+        self._get_ddb_client()
+        return self._ddb_client.get_item(
+            table_name=self.user_specific_url_table,
+            key=self._user_specific_url_item_key(),
+            correlation_id=self._correlation_id,
         )
-        return row_count
 
     def _mark_user_specific_url_as_processed_in_ddb(self, item_key):
         self._get_ddb_client()
@@ -268,10 +212,54 @@ class UserTask:
             correlation_id=self._correlation_id,
         )
 
+    def _create_user_task_follow_up(self, rows):
+        """
+        Checks the result of CREATE_USER_TASK_PIPELINE_SQL before it is committed. For tasks with user-specific urls, the url
+        is looked up in Dynamodb here, once the project task row has shown that it is needed
+
+        Args:
+            rows: rows returned by CREATE_USER_TASK_PIPELINE_SQL
+
+        Returns:
+            Statement setting the user task url for tasks with user-specific urls, None otherwise
+        """
+        result = rows[0]
+        errorjson = {
+            'user_id': self.user_id,
+            'project_task_id': self.project_task_id,
+            'correlation_id': str(self._correlation_id)
+        }
+        if result['project_task'] is None:
+            raise utils.DetailedIntegrityError('project_task does not exist', errorjson)
+        if result['user_details'] is None:
+            raise utils.ObjectDoesNotExistError('user does not exist', errorjson)
+        if result['existing_user_task_id'] is not None:
+            errorjson['existing_user_task'] = result['existing_user_task_id']
+            raise utils.DuplicateInsertError('user_task already exists', errorjson)
+        if not result['inserted']:
+            # user project was created by a concurrent request after the statement started; nothing to commit
+            return None
+
+        self._set_project_task_details(result['project_task'])
+        self._set_user_details(result['user_details'])
+        self.user_project_id = result['user_project']['id']
+        self.anon_project_specific_user_id = result['user_project']['anon_project_specific_user_id']
+
+        if self.user_specific_url:
+            try:
+                self.user_task_url = self._get_user_specific_url_item_from_ddb()['user_specific_url']
+            except TypeError:
+                raise utils.ObjectDoesNotExistError('User specific url not found', errorjson)
+            return sql_q.SET_USER_TASK_URL_SQL, (self.user_task_url, str(self.id))
+
     def create_user_task(self, ut_dict):
         """
         Inserts new UserTask row in thiscovery db
 
+        A single statement creates the user project if needed, checks that the user task does not exist yet and inserts it,
+        returning the user and project task details needed to build the task url. Tasks with user-specific urls (see
+        _create_user_task_follow_up) also read Dynamodb before the statement is committed
+
         Args:
             ut_dict: must contain user_id, project_task_id and consented; may optionally include id, created,
                     status, anon_user_task_id, first_name, last_name, email
@@ -282,33 +270,62 @@ class UserTask:
         self.from_dict(ut_dict=ut_dict)
         self._create_user_task_validate_mandatory_data()
         self._create_user_task_process_optional_data(ut_dict=ut_dict)
-        self._get_project_task()
-        user_project = create_user_project_if_not_exists(self.user_id, self.project_id, self._correlation_id)
-        self.user_project_id = user_project['id']
-        self.anon_project_specific_user_id = user_project['anon_project_specific_user_id']
-        self._create_user_task_abort_if_exists()
-        self._get_user_info()
-        item_key = self._get_user_specific_task_url_from_ddb()
-        row_count = self.thiscovery_db_dump()
-        if self.user_specific_url and row_count:
-            self._mark_user_specific_url_as_processed_in_ddb(item_key=item_key)
-        url = self.calculate_url()
-
-        new_user_task = {
-            'id': self.id,
-            'created': self.created,
-            'modified': self.created,
-            'user_id': self.user_id,
-            'user_project_id': self.user_project_id,
-            'project_task_id': self.project_task_id,
-            'task_provider_name': self.task_provider_name,
-            'url': url,
-            'status': self.status,
-            'consented': self.consented,
-            'anon_user_task_id': self.anon_user_task_id,
-        }
 
-        notify_new_task_signup(new_user_task, self._correlation_id)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            result = None
+            for _ in range(MAX_SIGNUP_ATTEMPTS):
+                result = pg_utils.execute_non_query_returning_with_follow_up(
+                    sql_q.CREATE_USER_TASK_PIPELINE_SQL,
+                    {
+                        'id': str(self.id),
+                        'created': self.created,
+                        'user_id': str(self.user_id),
+                        'project_task_id': str(self.project_task_id),
+                        'status': self.status,
+                        'consented': self.consented,
+                        'anon_user_task_id': str(self.anon_user_task_id),
+                        'user_project_id': str(uuid.uuid4()),
+                        'user_project_created': str(utils.now_with_tz()),
+                        'anon_project_specific_user_id': str(uuid.uuid4()),
+                    },
+                    self._create_user_task_follow_up,
+                    self._correlation_id
+                )[0]
+                if result['inserted']:
+                    break
+            else:
+                errorjson = {
+                    'user_id': self.user_id,
+                    'project_task_id': self.project_task_id,
+                    'correlation_id': str(self._correlation_id)
+                }
+                raise utils.DetailedIntegrityError('user_project could not be created', errorjson)
+
+            if 'anon_user_task_id' in ut_dict:
+                # ids generated here cannot have been looked up before; ids supplied by the caller might have been
+                negative_cache.invalidate(negative_cache.ANON_USER_TASK_ID, [self.anon_user_task_id], self._correlation_id)
+            url = self.calculate_url()
+
+            new_user_task = {
+                'id': self.id,
+                'created': self.created,
+                'modified': self.created,
+                'user_id': self.user_id,
+                'user_project_id': self.user_project_id,
+                'project_task_id': self.project_task_id,
+                'task_provider_name': self.task_provider_name,
+                'url': url,
+                'status': self.status,
+                'consented': self.consented,
+                'anon_user_task_id': self.anon_user_task_id,
+            }
+
+            marked_as_processed = None
+            if self.user_specific_url:
+                marked_as_processed = executor.submit(self._mark_user_specific_url_as_processed_in_ddb, self._user_specific_url_item_key())
+            notify_new_task_signup(new_user_task, self._correlation_id)
+            if marked_as_processed is not None:
+                marked_as_processed.result()
 
         return new_user_task
 
@@ -389,43 +406,102 @@ def filter_user_tasks_by_project_task_id(user_id, project_task_id, correlation_i
     return result
 
 
-def list_user_tasks_by_user(user_id, correlation_id=None):
+# columns of LIST_USER_TASKS_SQL returned to clients, in order; the columns before them are only used to build task urls
+USER_TASK_LIST_FIELDS = (
+    'user_id',
+    'user_project_id',
+    'user_project_status',
+    'project_task_id',
+    'task_description',
+    'user_task_id',
+    'created',
+    'modified',
+    'status',
+    'consented',
+    'anon_user_task_id',
+    'task_provider_name',
+    'progress_info',
+)
+USER_TASK_LIST_TIMESTAMP_FIELDS = ('created', 'modified', 'consented')
+
+
+def user_task_list_items(rows, user_id):
+    """
+    Builds the dictionaries returned by list_user_tasks_by_user, and their urls, in a single pass over the rows of
+    LIST_USER_TASKS_SQL
+
+    Args:
+        rows (list): tuples returned by LIST_USER_TASKS_SQL (or LIST_USER_TASKS_PAGE_SQL); must not be empty
+        user_id:
+
+    Returns:
+        List of user task dictionaries, with timestamps in ISO format (as output by row_to_json)
+    """
+    first_name, last_name, email = rows[0][:3]
+    url_values = task_urls.user_url_values(str(user_id), first_name, last_name, email)
+    items = list()
+    for row in rows:
+        (_, _, _, base_url, user_specific_url, user_task_url, anonymise_url, task_type_name, external_task_id,
+         anon_project_specific_user_id, *fields) = row
+        item = dict(zip(USER_TASK_LIST_FIELDS, fields))
+        if item['user_task_id'] is None:
+            # user has no user tasks
+            continue
+        for field in USER_TASK_LIST_TIMESTAMP_FIELDS:
+            item[field] = pg_utils.json_timestamp(item[field])
+        item['url'] = task_urls.task_url(
+            url_values,
+            base_url=base_url,
+            user_specific_url=user_specific_url,
+            user_task_url=user_task_url,
+            anonymise_url=anonymise_url,
+            task_type_name=task_type_name,
+            external_task_id=external_task_id,
+            project_task_id=item['project_task_id'],
+            user_task_id=item['user_task_id'],
+            anon_project_specific_user_id=anon_project_specific_user_id,
+            anon_user_task_id=item['anon_user_task_id'],
+        )
+        items.append(item)
+    return items
+
+
+def list_user_tasks_by_user(user_id, correlation_id=None, page_request=None):
+    """
+    Args:
+        user_id:
+        correlation_id:
+        page_request (pagination.PageRequest): if provided, only a page of user tasks is returned
+
+    Returns:
+        List of user task dictionaries, or a page of user tasks (see common.pagination) if page_request is provided
+    """
     try:
         user_id = utils.validate_uuid(user_id)
     except utils.DetailedValueError:
         raise
 
-    # check that user exists
-    try:
-        user_result = get_user_by_id(user_id, correlation_id)[0]
-    except IndexError:
+    # the user's names are read by the same query, which returns no rows if the user does not exist
+    if page_request is None:
+        rows = execute_query(sql_q.LIST_USER_TASKS_SQL, (str(user_id),), correlation_id, return_json=False, jsonize_sql=False)
+    else:
+        after_created, after_id, limit = page_request.params
+        rows = execute_query(sql_q.LIST_USER_TASKS_PAGE_SQL, (str(user_id), after_created, after_id, limit, limit), correlation_id,
+                             return_json=False, jsonize_sql=False)
+    if not rows:
         errorjson = {
             'user_id': user_id,
             'correlation_id': str(correlation_id)
         }
         raise utils.ObjectDoesNotExistError('user does not exist', errorjson)
 
-    result = execute_query(sql_q.LIST_USER_TASKS_SQL, (str(user_id),), correlation_id)
-
-    # add url field to each user_task in result
-    edited_result = list()
-    for ut in result:
-        user_task = UserTask(correlation_id=correlation_id)
-        user_task.from_dict(ut_dict=ut)
-        user_task.id = ut['user_task_id']
-        user_task.first_name = user_result['first_name']
-        user_task.last_name = user_result['last_name']
-        user_task.email = user_result['email']
-        ut['url'] = user_task.calculate_url()
-        del ut['base_url']
-        del ut['external_task_id']
-        del ut['user_specific_url']
-        del ut['user_task_url']
-        del ut['anon_project_specific_user_id']
-        del ut['anonymise_url']
-        edited_result.append(ut)
-
-    return edited_result
+    result = user_task_list_items(rows, user_id)
+    if page_request is not None:
+        for item in result:
+            item['page_created'] = item['created']
+            item['page_id'] = item['user_task_id']
+        return page_request.page(result)
+    return result
 
 
 def clear_user_tasks_for_project_task_id(project_task_id):
@@ -436,18 +512,25 @@ def clear_user_tasks_for_project_task_id(project_task_id):
 
 
 def anon_user_task_id_2_parameter(anon_ut_id, parameter_name, correlation_id=None):
-    try:
-        return execute_query(
-            sql_q.ANON_USER_TASK_ID_2_ID_SQL,
-            [anon_ut_id],
-            correlation_id,
-        )[0][parameter_name]
-    except IndexError:
+    """
+    Args:
+        anon_ut_id:
+        parameter_name: 'id' (of the user task) or 'user_id'
+        correlation_id:
+    """
+    identity = None
+    if not negative_cache.is_known_missing(negative_cache.ANON_USER_TASK_ID, anon_ut_id, correlation_id):
+        looked_up_at = negative_cache.lookup_time()
+        identity = idn.resolve(anon_ut_id, kinds=(idn.USER_TASK,), correlation_id=correlation_id)
+        if identity is None:
+            negative_cache.add(negative_cache.ANON_USER_TASK_ID, anon_ut_id, looked_up_at)
+    if identity is None:
         errorjson = {
             'anon_ut_id': anon_ut_id,
             'correlation_id': str(correlation_id)
         }
         raise utils.ObjectDoesNotExistError('user task does not exist', errorjson)
+    return {'id': identity.user_task_id, 'user_id': identity.user_id}[parameter_name]
 
 
 def anon_user_task_id_2_user_id(anon_ut_id, correlation_id=None):
@@ -488,7 +571,13 @@ def list_user_tasks_api(event, context):
             'correlation_id': correlation_id,
             'event': event
         })
-        result = list_user_tasks_by_user(user_id, correlation_id)
+        page_request = pagination.PageRequest.from_parameters(parameters, correlation_id)
+        result = list_user_tasks_by_user(user_id, correlation_id, page_request=page_request)
+        if page_request is not None:
+            return {
+                "statusCode": HTTPStatus.OK,
+                "body": json.dumps(result)
+            }
 
     # todo: this was added here as a way of quickly fixing an issue with the thiscovery frontend; review what to do for the longer term
     if len(result) == 1:
@@ -523,6 +612,227 @@ def create_user_task_api(event, context):
     }
 
 
+MAX_BATCH_SIGNUP_USERS = 1000
+BATCH_SIGNUP_WORKERS = 8
+
+
+def _run_concurrently(func, items, correlation_id=None):
+    """
+    Calls func on each of items concurrently; errors are logged
+
+    Returns:
+        List of func's results (None for items that raised an exception), in the same order as items
+    """
+    logger = utils.get_logger()
+
+    def call(item):
+        try:
+            return func(item)
+        except Exception as err:
+            logger.error(f'{func.__name__} failed', extra={'item': str(item), 'error': repr(err), 'correlation_id': correlation_id})
+
+    with ThreadPoolExecutor(max_workers=BATCH_SIGNUP_WORKERS) as executor:
+        return list(executor.map(call, items))
+
+
+def create_user_tasks(user_ids, project_task_id, consented, status=DEFAULT_STATUS, correlation_id=None):
+    """
+    Signs many users up to one project task (e.g. a test group or an invited cohort) in a single transaction: missing
+    user projects are created by one statement and user tasks by another. User-specific urls (if the task uses them) are
+    looked up before that transaction, and signup notifications posted after it, concurrently for all users
+
+    Args:
+        user_ids (list): up to MAX_BATCH_SIGNUP_USERS user ids
+        project_task_id:
+        consented:
+        status:
+        correlation_id:
+
+    Returns:
+        List containing a result for each item in user_ids, in the same order. Results are dictionaries containing the user
+        id and a status code: 201 (signed up), 400 (invalid or duplicate user id), 404 (user or user-specific url does not
+        exist) or 409 (user already signed up). Results of signed up users also contain the new user task (as returned by
+        UserTask.create_user_task) and the user's anon_project_specific_user_id; other results contain a message
+    """
+    if not isinstance(user_ids, list) or len(user_ids) > MAX_BATCH_SIGNUP_USERS:
+        errorjson = {'max_items': MAX_BATCH_SIGNUP_USERS, 'correlation_id': str(correlation_id)}
+        raise utils.DetailedValueError(f'user_ids must be a list of up to {MAX_BATCH_SIGNUP_USERS} items', errorjson)
+    try:
+        project_task_id = str(utils.validate_uuid(project_task_id))
+        utils.validate_utc_datetime(consented)
+        status = UserTask._validate_status(status)
+    except utils.DetailedValueError as err:
+        err.add_correlation_id(correlation_id)
+        raise err
+
+    try:
+        pt_ = get_project_task(project_task_id, correlation_id)[0]
+    except IndexError:
+        errorjson = {'project_task_id': project_task_id, 'correlation_id': str(correlation_id)}
+        raise utils.DetailedIntegrityError('project_task does not exist', errorjson)
+
+    results = list()
+    valid_user_ids = list()
+    seen_user_ids = set()
+    for user_id in user_ids:
+        result = {'user_id': user_id}
+        results.append(result)
+        try:
+            user_id = str(utils.validate_uuid(user_id))
+        except (utils.DetailedValueError, TypeError):
+            result.update({'status': HTTPStatus.BAD_REQUEST, 'message': 'invalid user id'})
+            continue
+        if user_id in seen_user_ids:
+            result.update({'status': HTTPStatus.BAD_REQUEST, 'message': 'duplicate user id'})
+            continue
+        result.update({'user_id': user_id, 'status': HTTPStatus.CREATED})
+        valid_user_ids.append(user_id)
+        seen_user_ids.add(user_id)
+
+    ddb_client = None
+    user_task_urls = dict()
+    if pt_['user_specific_url']:
+        ddb_client = Dynamodb(correlation_id=correlation_id)
+
+        def get_user_specific_url(user_id):
+            item = ddb_client.get_item(
+                table_name=UserTask.user_specific_url_table,
+                key=f"{project_task_id}_{user_id}",
+                correlation_id=correlation_id,
+            )
+            if item is not None:
+                return item['user_specific_url']
+
+        user_task_urls = dict(zip(valid_user_ids, _run_concurrently(get_user_specific_url, valid_user_ids, correlation_id)))
+        for result in results:
+            if (result['status'] == HTTPStatus.CREATED) and (user_task_urls[result['user_id']] is None):
+                result.update({'status': HTTPStatus.NOT_FOUND, 'message': 'User specific url not found'})
+        valid_user_ids = [x for x in valid_user_ids if user_task_urls[x] is not None]
+
+    created = str(utils.now_with_tz())
+    user_task_ids = {x: str(uuid.uuid4()) for x in valid_user_ids}
+    anon_user_task_ids = {x: str(uuid.uuid4()) for x in valid_user_ids}
+    user_projects, user_tasks = list(), list()
+    if valid_user_ids:
+        user_projects, user_tasks = pg_utils.execute_non_query_returning_multiple(
+            [sql_q.CREATE_USER_PROJECTS_IF_NOT_EXIST_SQL, sql_q.CREATE_USER_TASKS_FOR_PROJECT_TASK_SQL],
+            [
+                user_projects_if_not_exist_params(valid_user_ids, pt_['project_id']),
+                {
+                    'user_ids': valid_user_ids,
+                    'user_task_ids': [user_task_ids[x] for x in valid_user_ids],
+                    'anon_user_task_ids': [anon_user_task_ids[x] for x in valid_user_ids],
+                    'user_task_urls': [user_task_urls.get(x) for x in valid_user_ids],
+                    'project_id': str(pt_['project_id']),
+                    'project_task_id': project_task_id,
+                    'created': created,
+                    'status': status,
+                    'consented': consented,
+                },
+            ],
+            correlation_id
+        )
+    user_projects = {str(x['user_id']): x for x in user_projects}
+    user_tasks = {str(x['user_id']): x for x in user_tasks}
+
+    new_user_tasks = list()
+    for result in results:
+        if result['status'] != HTTPStatus.CREATED:
+            continue
+        user_id = result['user_id']
+        user_project = user_projects[user_id]
+        user_task = user_tasks.get(user_id)
+        if not user_project['user_exists']:
+            result.update({'status': HTTPStatus.NOT_FOUND, 'message': 'user does not exist'})
+        elif (user_task is None) or (user_task['existing_user_task_id'] is not None):
+            # user_task is None if a concurrent request created the user project after the statement started
+            result.update({'status': HTTPStatus.CONFLICT, 'message': 'user_task already exists'})
+        else:
+            new_user_task = {
+                'id': user_task_ids[user_id],
+                'created': created,
+                'modified': created,
+                'user_id': user_id,
+                'user_project_id': str(user_project['id']),
+                'project_task_id': project_task_id,
+                'task_provider_name': pt_['task_provider_name'],
+                'url': task_urls.task_url(
+                    task_urls.user_url_values(user_id, user_task['first_name'], user_task['last_name'], user_task['email']),
+                    base_url=pt_['base_url'],
+                    user_specific_url=pt_['user_specific_url'],
+                    user_task_url=user_task_urls.get(user_id),
+                    anonymise_url=pt_['anonymise_url'],
+                    task_type_name=pt_['task_type_name'],
+                    external_task_id=pt_['external_task_id'],
+                    project_task_id=project_task_id,
+                    user_task_id=user_task_ids[user_id],
+                    anon_project_specific_user_id=str(user_project['anon_project_specific_user_id']),
+                    anon_user_task_id=anon_user_task_ids[user_id],
+                ),
+                'status': status,
+                'consented': consented,
+                'anon_user_task_id': anon_user_task_ids[user_id],
+            }
+            result.update({'user_task': new_user_task, 'anon_project_specific_user_id': str(user_project['anon_project_specific_user_id'])})
+            new_user_tasks.append(new_user_task)
+
+    if pt_['user_specific_url']:
+        def mark_user_specific_url_as_processed(new_user_task):
+            ddb_client.update_item(
+                table_name=UserTask.user_specific_url_table,
+                key=f"{project_task_id}_{new_user_task['user_id']}",
+                name_value_pairs={
+                    'status': 'processed'
+                },
+                correlation_id=correlation_id,
+            )
+
+        _run_concurrently(mark_user_specific_url_as_processed, new_user_tasks, correlation_id)
+
+    def notify(new_user_task):
+        notify_new_task_signup(new_user_task, correlation_id)
+
+    _run_concurrently(notify, new_user_tasks, correlation_id)
+    return results
+
+
+@utils.lambda_wrapper
+@utils.api_error_handler
+@pg_utils.db_connection_handler
+def create_user_tasks_api(event, context):
+    """
+    Handler for Lambda function supporting the /v1/usertask-batch API endpoint
+
+    Args:
+        event (dict): event['body'] must be a dictionary containing keys user_ids (list), project_task_id and consented; may
+                optionally include status (see create_user_tasks)
+        context:
+    """
+    logger = event['logger']
+    correlation_id = event['correlation_id']
+
+    batch_json = json.loads(event['body'])
+    try:
+        user_ids = batch_json['user_ids']
+        project_task_id = batch_json['project_task_id']
+        consented = batch_json['consented']
+    except (KeyError, TypeError) as err:
+        errorjson = {'parameter': err.args[0], 'correlation_id': str(correlation_id)}
+        raise utils.DetailedValueError('mandatory data missing', errorjson) from err
+    status = batch_json.get('status', DEFAULT_STATUS)
+    logger.info('API call', extra={
+        'project_task_id': project_task_id,
+        'users_count': len(user_ids),
+        'correlation_id': correlation_id
+    })
+
+    results = create_user_tasks(user_ids, project_task_id, consented, status, correlation_id)
+    return {
+        "statusCode": HTTPStatus.OK,
+        "body": json.dumps(results)
+    }
+
+
 def anon_user_task_id_2_user_task_id(anon_ut_id, correlation_id=None):
     return anon_user_task_id_2_parameter(anon_ut_id, 'id', correlation_id=correlation_id)
 
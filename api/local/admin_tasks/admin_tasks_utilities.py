@@ -55,33 +55,41 @@ class CsvImporter:
         with open(self.input_filename) as csv_f:
             reader = csv.DictReader(csv_f)
             rows = list(reader)
-            for i, row in enumerate(rows):
-                print(f'Validating input file row {i+1} of {len(rows)}')
-                anon_id = row[self.anon_id_column]
+        anon_ids = list()
+        for i, row in enumerate(rows):
+            print(f'Validating input file row {i+1} of {len(rows)}')
+            anon_id = row[self.anon_id_column]
 
-                if not anon_id:
-                    self.logger.warning('Missing value in anon id column; skipped row', extra={'row': row})
-                    continue
-                elif anon_id in ['anon_project_specific_user_id', 'anon_user_task_id']:
-                    self.logger.warning('Skipped row of putative Qualtrics labels', extra={'row': row})
-                    continue
+            if not anon_id:
+                self.logger.warning('Missing value in anon id column; skipped row', extra={'row': row})
+                continue
+            elif anon_id in ['anon_project_specific_user_id', 'anon_user_task_id']:
+                self.logger.warning('Skipped row of putative Qualtrics labels', extra={'row': row})
+                continue
 
-                if anon_id in self.anon_ids:
-                    raise ValueError(f'Input csv file has more than one row for user {anon_id}')
-                else:
-                    try:
-                        user = u.get_user_by_any_anon_id(anon_id)[0]
-                    except IndexError:
-                        raise utils.ObjectDoesNotExistError(f'Anon_id {anon_id} not found in database', details={})
-                    user_id = user['id']
-                    if user:
-                        self.users.append(user)
-                        self.user_ids.append(user_id)
-                        self.anon_ids.append(anon_id)
-                        self.anon_id_to_user_id_map[anon_id] = user_id
-                        self.anon_id_to_user_map[anon_id] = user
-                    else:
-                        raise ValueError(f'User {anon_id} could not be found')
+            if anon_id in anon_ids:
+                raise ValueError(f'Input csv file has more than one row for user {anon_id}')
+            anon_ids.append(anon_id)
+
+        anon_id_to_user_map = dict()
+        not_found = list()
+        for i in range(0, len(anon_ids), u.MAX_BULK_LOOKUP_IDENTIFIERS):
+            batch = anon_ids[i:i + u.MAX_BULK_LOOKUP_IDENTIFIERS]
+            print(f'Looking up users {i+1} to {i + len(batch)} of {len(anon_ids)}')
+            result = u.get_users_by_identifiers('any_anon_id', batch)
+            anon_id_to_user_map.update(result['found'])
+            not_found += result['not_found']
+        if not_found:
+            raise utils.ObjectDoesNotExistError(f'Anon_ids {not_found} not found in database', details={})
+
+        for anon_id in anon_ids:
+            user = anon_id_to_user_map[anon_id.strip().lower()]
+            user_id = user['id']
+            self.users.append(user)
+            self.user_ids.append(user_id)
+            self.anon_ids.append(anon_id)
+            self.anon_id_to_user_id_map[anon_id] = user_id
+            self.anon_id_to_user_map[anon_id] = user
 
     def output_csv_of_user_ids(self):
         root, ext = os.path.splitext(self.input_filename)
@@ -0,0 +1,45 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+Loads public.user_project_flags from existing user group memberships. Run once after creating the table and its triggers
+with api/local/database-view-sql/database-views.py (the triggers keep it current afterwards); safe to run again at any time.
+"""
+import api.endpoints.common.pg_utilities as pg_utils
+
+
+BATCH_SIZE = 1000
+
+LIST_USER_IDS_SQL = '''
+    SELECT id FROM public.projects_user ORDER BY id
+'''
+
+BACKFILL_USER_PROJECT_FLAGS_SQL = '''
+    SELECT public.refresh_user_project_flags(%s::uuid[])
+'''
+
+
+def main():
+    user_ids = [x['id'] for x in pg_utils.execute_query(LIST_USER_IDS_SQL, None, None)]
+    for i in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[i:i + BATCH_SIZE]
+        pg_utils.execute_non_query(BACKFILL_USER_PROJECT_FLAGS_SQL, (batch,), None)
+        print(f'Backfilled project flags of {i + len(batch)} of {len(user_ids)} users')
+
+
+if __name__ == "__main__":
+    main()
@@ -23,15 +23,16 @@ Ouput format: prints to stdout a string containing user_ids separated by ;\n
 import api.local.dev_config  # sets env variables
 import api.local.secrets  # sets env variables
 import api.endpoints.common.pg_utilities as pg_utils
-import api.endpoints.common.sql_queries as sql_q
+import api.endpoints.user as u
 
 
 if __name__ == '__main__':
     user_input = input("Please paste list of anon_project_specific_user_ids separated by commas:")
     anon_ids = user_input.split(',')
     anon_ids = [x.strip() for x in anon_ids]
-    user_ids = list()
-    for anon_project_specific_user_id in anon_ids:
-        user_ids.append(pg_utils.execute_query(sql_q.GET_USER_BY_ANON_PROJECT_SPECIFIC_USER_ID_SQL, [str(anon_project_specific_user_id)])[0]['id'])
+    result = u.get_users_by_identifiers('anon_project_specific_user_id', anon_ids)
+    if result['not_found']:
+        print(f"The following anon_project_specific_user_ids were not found: {', '.join(result['not_found'])}")
+    user_ids = [x['id'] for x in result['found'].values()]
     pg_utils.close_connection()
     print(';\n'.join(user_ids))
@@ -0,0 +1,223 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+"""
+This script erases (or anonymises) the data of a list of users.
+Input format: text file containing one user_id per line
+Output: progress is printed to stdout and saved to a file next to the input file ({input file name}_erasure_progress.json).
+    If the script is interrupted, running it again on the same input file resumes from the first chunk not yet completed
+
+Users are processed in chunks of CHUNK_SIZE. Each chunk is a single short transaction containing one set-based statement
+per table, in foreign key order:
+    - erase: deletes the users' tasks, projects, group memberships, external accounts, entity update (audit) records and
+      finally the users themselves
+    - anonymise: deletes the users' group memberships, external accounts and entity update records and redacts the
+      personal details of the users, keeping their (anonymous) projects and tasks
+Statements give up waiting for locks after LOCK_TIMEOUT, in which case the chunk is rolled back and retried, so the job
+never holds up the live API for long.
+
+After each chunk is committed, the project status documents cached for its users are deleted and, in erase mode, the ids
+cached by the API (see api/endpoints/common/identity.py) are invalidated in all Lambda containers. This happens before the
+chunk is recorded as completed, so a job interrupted in between repeats the chunk (a no-op in the database) and its cache
+invalidation when resumed.
+"""
+import json
+import os
+import time
+
+import api.local.dev_config  # sets env variables
+import api.local.secrets  # sets env variables
+import api.endpoints.common.identity as idn
+import api.endpoints.common.pg_utilities as pg_utils
+import thiscovery_lib.utilities as utils
+from api.endpoints.project import delete_cached_project_status
+
+
+CHUNK_SIZE = 100
+PAUSE_BETWEEN_CHUNKS = 1  # seconds
+MAX_ATTEMPTS = 5
+LOCK_TIMEOUT = '5s'
+
+ERASE = 'erase'
+ANONYMISE = 'anonymise'
+
+SET_LOCK_TIMEOUT_SQL = f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"
+
+DELETE_USER_TASKS_SQL = '''
+    DELETE FROM public.projects_usertask ut
+    USING public.projects_userproject up
+    WHERE ut.user_project_id = up.id
+        AND up.user_id = ANY(%s::uuid[])
+'''
+
+DELETE_USER_PROJECTS_SQL = '''
+    DELETE FROM public.projects_userproject
+    WHERE user_id = ANY(%s::uuid[])
+'''
+
+DELETE_USER_GROUP_MEMBERSHIPS_SQL = '''
+    DELETE FROM public.projects_usergroupmembership
+    WHERE user_id = ANY(%s::uuid[])
+'''
+
+DELETE_USER_EXTERNAL_ACCOUNTS_SQL = '''
+    DELETE FROM public.projects_userexternalaccount
+    WHERE user_id = ANY(%s::uuid[])
+'''
+
+DELETE_USER_ENTITY_UPDATES_SQL = '''
+    DELETE FROM public.projects_entityupdate
+    WHERE entity_name = 'user'
+        AND entity_id = ANY(%s::uuid[])
+'''
+
+DELETE_USERS_SQL = '''
+    DELETE FROM public.projects_user
+    WHERE id = ANY(%s::uuid[])
+'''
+
+REDACT_USERS_SQL = '''
+    UPDATE public.projects_user
+    SET
+        email = 'erased-' || id || '@thiscovery.invalid',
+        email_address_verified = FALSE,
+        title = '',
+        first_name = '',
+        last_name = '',
+        auth0_id = NULL,
+        crm_id = NULL,
+        status = 'erased',
+        modified = now()
+    WHERE id = ANY(%s::uuid[])
+'''
+
+CHUNK_SQL = {
+    ERASE: [
+        ('usertask', DELETE_USER_TASKS_SQL),
+        ('userproject', DELETE_USER_PROJECTS_SQL),
+        ('usergroupmembership', DELETE_USER_GROUP_MEMBERSHIPS_SQL),
+        ('userexternalaccount', DELETE_USER_EXTERNAL_ACCOUNTS_SQL),
+        ('entityupdate', DELETE_USER_ENTITY_UPDATES_SQL),
+        ('user', DELETE_USERS_SQL),
+    ],
+    ANONYMISE: [
+        ('usergroupmembership', DELETE_USER_GROUP_MEMBERSHIPS_SQL),
+        ('userexternalaccount', DELETE_USER_EXTERNAL_ACCOUNTS_SQL),
+        ('entityupdate', DELETE_USER_ENTITY_UPDATES_SQL),
+        ('user', REDACT_USERS_SQL),
+    ],
+}
+
+
+class UserEraser:
+
+    def __init__(self, input_filename, mode=ERASE, chunk_size=CHUNK_SIZE):
+        if mode not in CHUNK_SQL:
+            raise ValueError(f'mode must be one of {list(CHUNK_SQL)}')
+        self.logger = utils.get_logger()
+        self.input_filename = input_filename
+        self.mode = mode
+        self.chunk_size = chunk_size
+        root, _ = os.path.splitext(input_filename)
+        self.progress_filename = f'{root}_erasure_progress.json'
+        self.user_ids = self.read_user_ids()
+        self.progress = self.load_progress()
+
+    def read_user_ids(self):
+        user_ids = dict()  # preserves input order, which must be the same when a job is resumed
+        with open(self.input_filename) as f:
+            for line in f:
+                if line.strip():
+                    user_ids[str(utils.validate_uuid(line.strip()))] = None
+        return list(user_ids)
+
+    def load_progress(self):
+        progress = {
+            'mode': self.mode,
+            'chunk_size': self.chunk_size,
+            'completed_chunks': 0,
+            'rows_affected': {table: 0 for table, _ in CHUNK_SQL[self.mode]},
+        }
+        if os.path.exists(self.progress_filename):
+            with open(self.progress_filename) as f:
+                saved_progress = json.load(f)
+            if (saved_progress['mode'], saved_progress['chunk_size']) != (self.mode, self.chunk_size):
+                raise ValueError(f"{self.progress_filename} records a job in {saved_progress['mode']} mode with chunks of "
+                                 f"{saved_progress['chunk_size']} users")
+            progress.update(saved_progress)
+        return progress
+
+    def save_progress(self):
+        with open(self.progress_filename, 'w') as f:
+            json.dump(self.progress, f, indent=2)
+
+    def process_chunk(self, user_ids):
+        """
+        Returns:
+            Dictionary of number of rows affected per table
+        """
+        statements = CHUNK_SQL[self.mode]
+        sql_list = [SET_LOCK_TIMEOUT_SQL] + [sql for _, sql in statements]
+        params_list = [None] + [(user_ids,)] * len(statements)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                rowcounts = pg_utils.execute_non_query_multiple(sql_list, params_list, None)
+            except Exception as err:
+                # discard the failed transaction
+                pg_utils.close_connection()
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                self.logger.warning('Chunk failed; retrying', extra={'attempt': attempt, 'error': repr(err)})
+                time.sleep(PAUSE_BETWEEN_CHUNKS * 2 ** attempt)
+            else:
+                return {table: rowcount for (table, _), rowcount in zip(statements, rowcounts[1:])}
+
+    def clear_cached_data(self, user_ids):
+        delete_cached_project_status(user_ids)
+        if self.mode == ERASE:
+            idn.invalidate(user_ids)
+
+    def run(self):
+        chunks = [self.user_ids[i:i + self.chunk_size] for i in range(0, len(self.user_ids), self.chunk_size)]
+        if self.progress['completed_chunks']:
+            print(f"Resuming {self.mode} job after chunk {self.progress['completed_chunks']} of {len(chunks)}")
+        for chunk_number in range(self.progress['completed_chunks'], len(chunks)):
+            chunk = chunks[chunk_number]
+            rows_affected = self.process_chunk(chunk)
+            self.clear_cached_data(chunk)
+            for table, rowcount in rows_affected.items():
+                self.progress['rows_affected'][table] += rowcount
+            self.progress['completed_chunks'] = chunk_number + 1
+            self.save_progress()
+            processed_users = min((chunk_number + 1) * self.chunk_size, len(self.user_ids))
+            print(f'Processed {processed_users} of {len(self.user_ids)} users ({self.mode}); rows affected so far: {self.progress["rows_affected"]}')
+            time.sleep(PAUSE_BETWEEN_CHUNKS)
+        pg_utils.close_connection()
+        print(f'Job completed: {self.progress}')
+        return self.progress
+
+
+if __name__ == '__main__':
+    input_filename = input("Please enter the path of the file containing the user_ids to erase (one per line):").strip()
+    mode = input(f"Please enter '{ERASE}' to delete all data of these users or '{ANONYMISE}' to keep their anonymous project "
+                 f"and task data:").strip()
+    eraser = UserEraser(input_filename, mode)
+    confirmation = input(f'This will {mode} {len(eraser.user_ids)} users. Type the number of users to confirm:')
+    if confirmation.strip() == str(len(eraser.user_ids)):
+        eraser.run()
+    else:
+        print('Job cancelled')
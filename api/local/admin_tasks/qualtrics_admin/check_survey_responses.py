@@ -30,6 +30,7 @@ from tkinter.filedialog import askopenfilename
 
 import api.endpoints.common.pg_utilities as pg_utils
 import api.endpoints.common.sql_queries as sql_q
+import api.endpoints.user as u
 import thiscovery_lib.utilities as utils
 
 from api.local.dev_config import SECRETS_NAMESPACE
@@ -91,7 +92,11 @@ class DataCheckManager:
                     except utils.DetailedValueError:
                         self.logger.warning(f'anon_project_specific_user_id "{anon_project_specific_user_id}" not valid; row skipped')
                         continue
-                    user_id = pg_utils.execute_query(sql_q.GET_USER_BY_ANON_PROJECT_SPECIFIC_USER_ID_SQL, [str(anon_project_specific_user_id)])[0]['id']
+                    users = u.get_user_by_anon_project_specific_user_id(anon_project_specific_user_id)
+                    if not users:
+                        self.logger.warning(f'anon_project_specific_user_id "{anon_project_specific_user_id}" not found; row skipped')
+                        continue
+                    user_id = users[0]['id']
 
                 try:
                     utils.validate_uuid(user_id)
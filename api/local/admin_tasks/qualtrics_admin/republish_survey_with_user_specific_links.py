@@ -46,6 +46,7 @@ class DistributionLinksGenerator:
         distribution_id = r['result']['id']
         r = self.dist_client.list_distribution_links(distribution_id, self.survey_id)
         rows = r['result']['elements']
+        user_ids = ImportManager.get_user_ids([row['externalDataReference'] for row in rows])
         for row in rows:
             ImportManager.import_row(
                 row_dict=row,
@@ -59,6 +60,7 @@ class DistributionLinksGenerator:
                     'process': os.path.basename(__file__),
                 },
                 dynamodb_client=self.ddb_client,
+                user_id=user_ids[row['externalDataReference']],
             )
 
 
@@ -26,22 +26,28 @@ from thiscovery_lib.core_api_utilities import CoreApiClient
 
 import api.endpoints.common.pg_utilities as pg_utils
 import api.endpoints.common.sql_queries as sql_q
+import thiscovery_lib.utilities as utils
+from api.endpoints.project import get_project_task_audience
 from api.endpoints.user_group import UserGroup
 from api.endpoints.user_group_membership import UserGroupMembership
 from api.local.admin_tasks.admin_tasks_utilities import CsvImporter
 
 
 class Inviter:
-    def __init__(self, user_group_id, users_to_invite):
+    def __init__(self, user_group_id, users_to_invite, signup_available_only=False):
         """
         Args:
             user_group_id (str):
             users_to_invite (list):
+            signup_available_only (bool): if True, users who cannot sign up to the task (see project.get_project_task_audience)
+                    are not invited
         """
         self.user_group_id = user_group_id
         self.users_to_invite = users_to_invite
+        self.signup_available_only = signup_available_only
         self.project_task = None
         self.core_api_client = CoreApiClient()
+        self.logger = utils.get_logger()
 
     def _get_task_from_user_group_id(self):
         tasks = pg_utils.execute_query(
@@ -69,7 +75,18 @@ class Inviter:
         invited_users = list()
         self._get_task_from_user_group_id()
         template_name, custom_properties_base = self._get_template_details()
-        for user in self.users_to_invite:
+        users_to_invite = self.users_to_invite
+        if self.signup_available_only:
+            audience = get_project_task_audience(self.project_task['project_task_id'])
+            signup_available_user_ids = set(audience['signup_available_user_ids'])
+            users_to_invite = [x for x in self.users_to_invite if x['id'] in signup_available_user_ids]
+            excluded_user_ids = [x['id'] for x in self.users_to_invite if x['id'] not in signup_available_user_ids]
+            if excluded_user_ids:
+                self.logger.warning('Users who cannot sign up to this task will not be invited', extra={
+                    'project_task_id': self.project_task['project_task_id'],
+                    'excluded_user_ids': excluded_user_ids,
+                })
+        for user in users_to_invite:
             user_id = user['id']
             email_dict = {
                 "to_recipient_id": user_id,
@@ -179,7 +196,12 @@ class ImportManager(CsvImporter):
         self.output_user_ids_str()
         invite_users = input("Invite added users? (y/N)")
         if invite_users in ['y', 'Y']:
-            inviter = Inviter(user_group_id=self.user_group_id, users_to_invite=self.added_users)
+            signup_available_only = input("Only invite users who can sign up to the task? (y/N)")
+            inviter = Inviter(
+                user_group_id=self.user_group_id,
+                users_to_invite=self.added_users,
+                signup_available_only=signup_available_only in ['y', 'Y'],
+            )
             inviter.send_invites()
 
 
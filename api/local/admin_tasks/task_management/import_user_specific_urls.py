@@ -39,7 +39,7 @@ class ImportManager(CsvImporter):
         self.anon_project_specific_user_id_column = anon_project_specific_user_id_column
         self.ddb = Dynamodb()
         self.project_task_id = input("Please enter the project task id:")
-        super().__init__()
+        super().__init__(anon_id_column=anon_project_specific_user_id_column)
 
     @staticmethod
     def check_project_task_exists(project_task_id):
@@ -57,11 +57,32 @@ class ImportManager(CsvImporter):
         return row
 
     @staticmethod
-    def import_row(row_dict, anon_project_specific_user_id_column, link_column, project_task_id, provenance, dynamodb_client):
+    def get_user_ids(anon_project_specific_user_ids):
+        """
+        Returns:
+            Dictionary mapping each of anon_project_specific_user_ids to a user_id
+        """
+        result = dict()
+        for i in range(0, len(anon_project_specific_user_ids), u.MAX_BULK_LOOKUP_IDENTIFIERS):
+            batch = anon_project_specific_user_ids[i:i + u.MAX_BULK_LOOKUP_IDENTIFIERS]
+            lookup = u.get_users_by_identifiers('anon_project_specific_user_id', batch)
+            if lookup['not_found']:
+                raise utils.ObjectDoesNotExistError(f"Anon_project_specific_user_ids {lookup['not_found']} not found in database", details={})
+            result.update({anon_id: lookup['found'][anon_id.strip().lower()]['id'] for anon_id in batch})
+        return result
+
+    @staticmethod
+    def import_row(row_dict, anon_project_specific_user_id_column, link_column, project_task_id, provenance, dynamodb_client, user_id=None):
+        """
+        Args:
+            user_id: id of the user identified by the row's anon_project_specific_user_id; looked up if not given. Pass it
+                    (see get_user_ids) when importing many rows
+        """
         anon_id = row_dict[anon_project_specific_user_id_column]
-        users = u.get_user_by_anon_project_specific_user_id(anon_id)
-        user = users[0]
-        user_id = user['id']
+        if user_id is None:
+            users = u.get_user_by_anon_project_specific_user_id(anon_id)
+            user = users[0]
+            user_id = user['id']
         user_specific_url = row_dict[link_column]
         key = f"{project_task_id}_{user_id}"
         details = ImportManager.nullify_empty_attributes(row_dict)
@@ -87,16 +108,18 @@ class ImportManager(CsvImporter):
         with open(self.input_filename) as csv_f:
             reader = csv.DictReader(csv_f)
             rows = list(reader)
-            for i, row in enumerate(rows):
-                print(f'Populating Dynamodb with row {i+1} of {len(rows)}')
-                self.import_row(
-                    row_dict=row,
-                    anon_project_specific_user_id_column=self.anon_project_specific_user_id_column,
-                    link_column='Link',
-                    project_task_id=self.project_task_id,
-                    provenance=os.path.basename(self.input_filename),
-                    dynamodb_client=self.ddb,
-                )
+        user_ids = self.get_user_ids([row[self.anon_project_specific_user_id_column] for row in rows])
+        for i, row in enumerate(rows):
+            print(f'Populating Dynamodb with row {i+1} of {len(rows)}')
+            self.import_row(
+                row_dict=row,
+                anon_project_specific_user_id_column=self.anon_project_specific_user_id_column,
+                link_column='Link',
+                project_task_id=self.project_task_id,
+                provenance=os.path.basename(self.input_filename),
+                dynamodb_client=self.ddb,
+                user_id=user_ids[row[self.anon_project_specific_user_id_column]],
+            )
 
     def main(self):
         self.check_project_task_exists(self.project_task_id)
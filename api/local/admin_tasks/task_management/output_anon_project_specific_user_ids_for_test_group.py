@@ -58,12 +58,13 @@ class ProcessManager:
 
     def get_anon_project_specific_user_ids(self):
         users_in_test_group = [x['user_id'] for x in pg_utils.execute_query(sq.TEST_GROUP_USERS_FOR_PROJECT_TASK, [self.project_task_id])]
-        counter = 1
-        for user_id in users_in_test_group:
-            print(f'Processing user {counter} of {len(users_in_test_group)}')
-            user_project = up.create_user_project_if_not_exists(user_id, self.project_id)
-            self.anon_project_specific_user_ids.append(user_project['anon_project_specific_user_id'])
-            counter += 1
+        print(f'Processing {len(users_in_test_group)} users')
+        user_projects = up.create_user_projects_if_not_exist(list(dict.fromkeys(users_in_test_group)), self.project_id)
+        for user_project in user_projects:
+            if user_project['anon_project_specific_user_id'] is None:
+                print(f"Could not create user project for user {user_project['user_id']}; please run this script again")
+                continue
+            self.anon_project_specific_user_ids.append(str(user_project['anon_project_specific_user_id']))
         return self.anon_project_specific_user_ids
 
     def output_anon_project_specific_user_ids(self):
@@ -27,6 +27,8 @@ from thiscovery_lib.core_api_utilities import CoreApiClient
 import api.endpoints.common.pg_utilities as pg_utils
 import api.endpoints.common.sql_queries as sql_q
 import api.endpoints.user as u
+import thiscovery_lib.utilities as utils
+from api.endpoints.project import get_project_task_audience
 from api.local.admin_tasks.admin_tasks_utilities import CsvImporter
 
 
@@ -46,7 +48,7 @@ class Reminder:
 
         if csv_import in ['y', 'Y']:
             importer = CsvImporter(
-                anon_project_specific_user_id_column='anon_project_specific_user_id',
+                anon_id_column='anon_project_specific_user_id',
                 csvfile_path=None
             )
             anon_project_specific_user_ids = importer.output_list_of_anon_project_specific_user_ids()
@@ -57,15 +59,16 @@ class Reminder:
 
         anon_ids = anon_project_specific_user_ids.split(',')
         self.anon_ids = [x.strip() for x in anon_ids]
-        self.users = list()
-        for anon_id in anon_ids:
-            user = u.get_user_by_anon_project_specific_user_id(anon_id)[0]
-            if user:
-                self.users.append(user)
-            else:
-                raise ValueError(f'User {anon_id} could not be found')
+        result = u.get_users_by_identifiers('anon_project_specific_user_id', self.anon_ids)
+        if result['not_found']:
+            raise ValueError(f"Users {result['not_found']} could not be found")
+        self.users = list(result['found'].values())
+
+        signedup_only = input("Only remind users who are signed up to this task? (y/N)")
+        self.signedup_only = signedup_only in ['y', 'Y']
 
         self.core_api_client = CoreApiClient()
+        self.logger = utils.get_logger()
 
     def _get_template_details(self):
         custom_properties_base = {
@@ -83,7 +86,18 @@ class Reminder:
     def remind_users(self):
         reminded_users = list()
         template_name, custom_properties_base = self._get_template_details()
-        for user in self.users:
+        users = self.users
+        if self.signedup_only:
+            audience = get_project_task_audience(self.project_task['project_task_id'])
+            signedup_user_ids = set(audience['signedup_user_ids'])
+            users = [x for x in self.users if x['id'] in signedup_user_ids]
+            excluded_user_ids = [x['id'] for x in self.users if x['id'] not in signedup_user_ids]
+            if excluded_user_ids:
+                self.logger.warning('Users who are not signed up to this task will not be reminded', extra={
+                    'project_task_id': self.project_task['project_task_id'],
+                    'excluded_user_ids': excluded_user_ids,
+                })
+        for user in users:
             user_id = user['id']
             email_dict = {
                 "to_recipient_id": user_id,
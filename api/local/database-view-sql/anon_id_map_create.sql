@@ -0,0 +1,94 @@
+/*
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+
+/*
+ Purpose: Maps every anonymous id (anon_project_specific_user_id of user projects and anon_user_task_id of user tasks) to
+          the kind of id and the ids of the user, user project and user task it identifies, so that any anon id can be
+          resolved with a single primary key lookup. Rows are added by the triggers below when user projects and user
+          tasks are created (or their anon id changes) and removed with them. Existing data is loaded when this script runs.
+ Usage:  Used by RESOLVE_ANON_ID_SQL and RESOLVE_USER_OR_ANON_ID_SQL (see api/endpoints/common/identity.py)
+ */
+CREATE TABLE IF NOT EXISTS public.anon_id_map (
+    anon_id uuid PRIMARY KEY,
+    kind text NOT NULL CHECK (kind IN ('user_project', 'user_task')),
+    user_id uuid NOT NULL,
+    user_project_id uuid NOT NULL REFERENCES public.projects_userproject (id) ON DELETE CASCADE,
+    user_task_id uuid REFERENCES public.projects_usertask (id) ON DELETE CASCADE
+);
+
+CREATE OR REPLACE FUNCTION public.anon_id_map_userproject_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        DELETE FROM public.anon_id_map WHERE kind = 'user_project' AND user_project_id = OLD.id;
+        UPDATE public.anon_id_map SET user_id = NEW.user_id WHERE user_project_id = NEW.id;
+    END IF;
+    IF NEW.anon_project_specific_user_id IS NOT NULL THEN
+        INSERT INTO public.anon_id_map (anon_id, kind, user_id, user_project_id, user_task_id)
+        VALUES (NEW.anon_project_specific_user_id, 'user_project', NEW.user_id, NEW.id, NULL)
+        ON CONFLICT (anon_id) DO UPDATE SET
+            kind = EXCLUDED.kind,
+            user_id = EXCLUDED.user_id,
+            user_project_id = EXCLUDED.user_project_id,
+            user_task_id = EXCLUDED.user_task_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.anon_id_map_usertask_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        DELETE FROM public.anon_id_map WHERE kind = 'user_task' AND user_task_id = OLD.id;
+    END IF;
+    IF NEW.anon_user_task_id IS NOT NULL THEN
+        INSERT INTO public.anon_id_map (anon_id, kind, user_id, user_project_id, user_task_id)
+        SELECT NEW.anon_user_task_id, 'user_task', up.user_id, up.id, NEW.id
+        FROM public.projects_userproject up
+        WHERE up.id = NEW.user_project_id
+        ON CONFLICT (anon_id) DO UPDATE SET
+            kind = EXCLUDED.kind,
+            user_id = EXCLUDED.user_id,
+            user_project_id = EXCLUDED.user_project_id,
+            user_task_id = EXCLUDED.user_task_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS anon_id_map_userproject ON public.projects_userproject;
+CREATE TRIGGER anon_id_map_userproject
+    AFTER INSERT OR UPDATE OF anon_project_specific_user_id, user_id ON public.projects_userproject
+    FOR EACH ROW EXECUTE PROCEDURE public.anon_id_map_userproject_trigger();
+
+DROP TRIGGER IF EXISTS anon_id_map_usertask ON public.projects_usertask;
+CREATE TRIGGER anon_id_map_usertask
+    AFTER INSERT OR UPDATE OF anon_user_task_id, user_project_id ON public.projects_usertask
+    FOR EACH ROW EXECUTE PROCEDURE public.anon_id_map_usertask_trigger();
+
+INSERT INTO public.anon_id_map (anon_id, kind, user_id, user_project_id, user_task_id)
+    SELECT up.anon_project_specific_user_id, 'user_project', up.user_id, up.id, NULL
+    FROM public.projects_userproject up
+    WHERE up.anon_project_specific_user_id IS NOT NULL
+ON CONFLICT (anon_id) DO NOTHING;
+
+INSERT INTO public.anon_id_map (anon_id, kind, user_id, user_project_id, user_task_id)
+    SELECT ut.anon_user_task_id, 'user_task', up.user_id, up.id, ut.id
+    FROM public.projects_usertask ut
+        JOIN public.projects_userproject up ON up.id = ut.user_project_id
+    WHERE ut.anon_user_task_id IS NOT NULL
+ON CONFLICT (anon_id) DO NOTHING;
@@ -53,5 +53,31 @@ def create_all_views():
             execute_sql_script(file, view)
 
 
+def create_all_derived_tables():
+    files_and_tables = [
+        ('user_project_flags_create.sql', 'user_project_flags'),
+        ('anon_id_map_create.sql', 'anon_id_map'),
+        ('project_status_warmed_create.sql', 'project_status_warmed'),
+    ]
+
+    for file, table in files_and_tables:
+        run_sql_script_file(VIEW_SQL_FOLDER + file, None)
+        print(f'Successfully created or updated database table {emph(table)} and its triggers on environment {emph(ENVIRONMENT_NAME)}')
+
+
+def create_all_indexes():
+    files_and_descriptions = [
+        ('indexes_keyset_pagination_create.sql', 'keyset pagination indexes'),
+        ('indexes_search_create.sql', 'search indexes'),
+        ('indexes_unique_create.sql', 'unique indexes'),
+    ]
+
+    for file, description in files_and_descriptions:
+        run_sql_script_file(VIEW_SQL_FOLDER + file, None)
+        print(f'Successfully created {emph(description)} on environment {emph(ENVIRONMENT_NAME)}')
+
+
 if __name__ == "__main__":
     create_all_views()
+    create_all_derived_tables()
+    create_all_indexes()
@@ -0,0 +1,35 @@
+/*
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+
+/*
+ Purpose: Indexes matching the (created, id) ordering of paginated list endpoints (see api/endpoints/common/pagination.py)
+ Usage:  Used by LIST_PROJECTS_PAGE_SQL, LIST_USER_PROJECTS_PAGE_SQL, LIST_USERS_BY_PROJECT_PAGE_SQL and LIST_USER_TASKS_PAGE_SQL.
+         User tasks are paged across all of a user's user projects, so LIST_USER_TASKS_PAGE_SQL reads each user project's
+         tasks from projects_usertask_userproject_created_id_idx in (created, id) order and merges them
+ */
+CREATE INDEX IF NOT EXISTS projects_project_created_id_idx
+    ON public.projects_project (created, id);
+
+CREATE INDEX IF NOT EXISTS projects_userproject_user_created_id_idx
+    ON public.projects_userproject (user_id, created, id);
+
+CREATE INDEX IF NOT EXISTS projects_userproject_project_created_id_idx
+    ON public.projects_userproject (project_id, created, id);
+
+CREATE INDEX IF NOT EXISTS projects_usertask_userproject_created_id_idx
+    ON public.projects_usertask (user_project_id, created, id);
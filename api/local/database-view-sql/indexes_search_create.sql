@@ -0,0 +1,48 @@
+/*
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+
+/*
+ Purpose: Full-text and trigram indexes for the search endpoint (api/endpoints/search.py)
+ Usage:  Used by SEARCH_PROJECTS_SQL, SEARCH_PROJECT_TASKS_SQL and SEARCH_USERS_SQL. The indexed expressions must match
+         PROJECT_SEARCH_VECTOR, PROJECT_TASK_SEARCH_VECTOR and USER_SEARCH_VECTOR in api/endpoints/common/sql_queries.py
+ */
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS projects_project_search_idx
+    ON public.projects_project USING gin (to_tsvector('english', coalesce(name, '') || ' ' || coalesce(description, '')));
+
+CREATE INDEX IF NOT EXISTS projects_project_name_trgm_idx
+    ON public.projects_project USING gin (name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS projects_projecttask_search_idx
+    ON public.projects_projecttask USING gin (to_tsvector('english', coalesce(description, '')));
+
+CREATE INDEX IF NOT EXISTS projects_projecttask_description_trgm_idx
+    ON public.projects_projecttask USING gin (description gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS projects_user_search_idx
+    ON public.projects_user USING gin (to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || coalesce(email, '')));
+
+CREATE INDEX IF NOT EXISTS projects_user_email_trgm_idx
+    ON public.projects_user USING gin (email gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS projects_user_first_name_trgm_idx
+    ON public.projects_user USING gin (first_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS projects_user_last_name_trgm_idx
+    ON public.projects_user USING gin (last_name gin_trgm_ops);
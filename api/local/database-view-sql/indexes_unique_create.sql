@@ -0,0 +1,33 @@
+/*
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+
+/*
+ Purpose: Unique indexes backing the INSERT ... ON CONFLICT DO NOTHING statements of the create endpoints, so that
+          concurrent requests to create the same user project, user external account or user group membership cannot both
+          insert a row
+ Usage:  Used by CREATE_USER_PROJECT_SQL, CREATE_USER_EXTERNAL_ACCOUNT_SQL and CREATE_USER_GROUP_MEMBERSHIP_SQL. Creating an
+         index fails if the table already contains duplicates; remove them first
+ */
+CREATE UNIQUE INDEX IF NOT EXISTS projects_userproject_user_project_uniq
+    ON public.projects_userproject (user_id, project_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS projects_userexternalaccount_user_system_uniq
+    ON public.projects_userexternalaccount (user_id, external_system_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS projects_usergroupmembership_user_group_uniq
+    ON public.projects_usergroupmembership (user_id, user_group_id);
@@ -0,0 +1,30 @@
+/*
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+
+/*
+ Purpose: Records the version of the project status document last saved in the shared cache for each user (see
+          warm_project_status_for_user in api/endpoints/project.py). The project status endpoint reads it together with
+          the current version, so it only looks for a cached document when one was saved at that version.
+          Users without a row have no cached document.
+ Usage:  Written by MARK_PROJECT_STATUS_WARMED_SQL, read by PROJECT_STATUS_VERSION_SQL
+ */
+CREATE TABLE IF NOT EXISTS public.project_status_warmed (
+    user_id uuid PRIMARY KEY REFERENCES public.projects_user (id) ON DELETE CASCADE,
+    version text NOT NULL,
+    modified timestamptz NOT NULL DEFAULT now()
+);
@@ -0,0 +1,80 @@
+/*
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+*/
+
+/*
+ Purpose: Stores whether each user belongs to any demo and any live user group, so that user lookups do not have to
+          work it out from projects_usergroupmembership and projects_usergroup every time. Rows are kept current by the
+          triggers below whenever a membership is added, changed or removed, or the demo flag of a group changes.
+          Users without a row have neither flag.
+ Usage:  Joined by BASE_USER_SELECT_SQL. Existing data is loaded by
+         api/local/admin_tasks/data_migration/db_backfill_user_project_flags.py
+ */
+CREATE TABLE IF NOT EXISTS public.user_project_flags (
+    user_id uuid PRIMARY KEY REFERENCES public.projects_user (id) ON DELETE CASCADE,
+    has_demo_project boolean NOT NULL DEFAULT FALSE,
+    has_live_project boolean NOT NULL DEFAULT FALSE
+);
+
+CREATE OR REPLACE FUNCTION public.refresh_user_project_flags(user_ids uuid[]) RETURNS void AS $$
+    INSERT INTO public.user_project_flags (user_id, has_demo_project, has_live_project)
+    SELECT
+        u.id,
+        COALESCE(bool_or(ug.demo), FALSE),
+        COALESCE(bool_or(NOT ug.demo), FALSE)
+    FROM public.projects_user u
+        LEFT JOIN public.projects_usergroupmembership ugm ON ugm.user_id = u.id
+        LEFT JOIN public.projects_usergroup ug ON ug.id = ugm.user_group_id
+    WHERE u.id = ANY(user_ids)
+    GROUP BY u.id
+    ON CONFLICT (user_id) DO UPDATE SET
+        has_demo_project = EXCLUDED.has_demo_project,
+        has_live_project = EXCLUDED.has_live_project;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION public.user_project_flags_membership_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.refresh_user_project_flags(ARRAY[NEW.user_id]);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM public.refresh_user_project_flags(ARRAY[OLD.user_id]);
+    ELSE
+        PERFORM public.refresh_user_project_flags(ARRAY[OLD.user_id, NEW.user_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.user_project_flags_group_trigger() RETURNS trigger AS $$
+BEGIN
+    PERFORM public.refresh_user_project_flags(
+        ARRAY(SELECT user_id FROM public.projects_usergroupmembership WHERE user_group_id = NEW.id)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_project_flags_membership ON public.projects_usergroupmembership;
+CREATE TRIGGER user_project_flags_membership
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, user_group_id ON public.projects_usergroupmembership
+    FOR EACH ROW EXECUTE PROCEDURE public.user_project_flags_membership_trigger();
+
+DROP TRIGGER IF EXISTS user_project_flags_group ON public.projects_usergroup;
+CREATE TRIGGER user_project_flags_group
+    AFTER UPDATE OF demo ON public.projects_usergroup
+    FOR EACH ROW WHEN (OLD.demo IS DISTINCT FROM NEW.demo)
+    EXECUTE PROCEDURE public.user_project_flags_group_trigger();
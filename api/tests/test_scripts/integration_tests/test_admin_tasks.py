@@ -17,8 +17,11 @@
 #
 import testing_utilities as test_utils
 import os
+import shutil
+import tempfile
 from pprint import pprint
 
+import api.endpoints.common.identity as idn
 import api.endpoints.common.pg_utilities as pg_utils
 import api.endpoints.common.sql_queries as sql_q
 import thiscovery_lib.utilities as utils
@@ -30,6 +33,7 @@ from api.local.admin_tasks.qualtrics_admin.convert_responses_to_contact_list_inp
 from api.local.admin_tasks.qualtrics_admin.republish_survey_with_user_specific_links import DistributionLinksGenerator
 from api.local.admin_tasks.task_management.output_anon_project_specific_user_ids_for_test_group import ProcessManager as OutputAnonIds
 from api.local.admin_tasks.task_management.create_user_group_for_follow_up_task import ImportManager as CreateUserGroup
+import api.local.admin_tasks.general_admin.erase_users as erase_users
 
 
 class TestAdminTasksDbAccess(test_utils.DbTestCase):
@@ -105,6 +109,96 @@ class TestAdminTasksDbAccess(test_utils.DbTestCase):
         self.assertCountEqual(expected_ddb_keys, keys)
 
 
+class TestEraseUsers(test_utils.DbTestCase):
+    eddie_id = '1cbe9aad-b29f-46b5-920e-b4c496d42515'
+    clive_id = '8518c7ed-1df4-45e9-8dc4-d49b57ae0663'
+    delia_id = '35224bd5-f8a8-41f6-8502-f96e12d6ddde'
+    glenda_id = 'e067ed7b-bc98-454f-9c5e-573e2da5705c'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pause_between_chunks = erase_users.PAUSE_BETWEEN_CHUNKS
+        erase_users.PAUSE_BETWEEN_CHUNKS = 0
+
+    @classmethod
+    def tearDownClass(cls):
+        erase_users.PAUSE_BETWEEN_CHUNKS = cls.pause_between_chunks
+        super().tearDownClass()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_input_file(self, user_ids):
+        input_filename = os.path.join(self.tmp_dir, 'users.txt')
+        with open(input_filename, 'w') as f:
+            f.write('\n'.join(user_ids))
+        return input_filename
+
+    @staticmethod
+    def count_rows(table, user_id_column, user_id):
+        sql = f'SELECT count(*) AS row_count FROM public.{table} WHERE {user_id_column} = %s'
+        return pg_utils.execute_query(sql, (user_id,), None)[0]['row_count']
+
+    def test_01_erase_users_ok(self):
+        self.assertIsNotNone(idn.resolve_any_id(self.eddie_id))
+        eraser = erase_users.UserEraser(self.write_input_file([self.eddie_id]), erase_users.ERASE)
+        progress = eraser.run()
+        self.assertEqual(1, progress['completed_chunks'])
+        self.assertEqual(1, progress['rows_affected']['user'])
+        self.assertEqual(4, progress['rows_affected']['userproject'])
+        self.assertEqual(2, progress['rows_affected']['usergroupmembership'])
+        self.assertEqual(0, self.count_rows('projects_user', 'id', self.eddie_id))
+        self.assertEqual(0, self.count_rows('projects_userproject', 'user_id', self.eddie_id))
+        self.assertEqual(0, self.count_rows('projects_usergroupmembership', 'user_id', self.eddie_id))
+        self.assertIsNone(idn.resolve_any_id(self.eddie_id))
+
+    def test_02_anonymise_users_ok(self):
+        eraser = erase_users.UserEraser(self.write_input_file([self.clive_id]), erase_users.ANONYMISE)
+        progress = eraser.run()
+        self.assertEqual(1, progress['completed_chunks'])
+        self.assertEqual(1, progress['rows_affected']['user'])
+        self.assertEqual(4, progress['rows_affected']['usergroupmembership'])
+        user = pg_utils.execute_query('SELECT first_name, last_name, email, status FROM public.projects_user WHERE id = %s', (self.clive_id,), None)[0]
+        expected_user = {
+            'first_name': '',
+            'last_name': '',
+            'email': f'erased-{self.clive_id}@thiscovery.invalid',
+            'status': 'erased',
+        }
+        self.assertEqual(expected_user, user)
+        self.assertEqual(11, self.count_rows('projects_userproject', 'user_id', self.clive_id))
+        self.assertEqual(0, self.count_rows('projects_usergroupmembership', 'user_id', self.clive_id))
+
+    def test_03_erase_users_resumes_after_interruption(self):
+        input_filename = self.write_input_file([self.delia_id, self.glenda_id])
+
+        class InterruptedEraser(erase_users.UserEraser):
+            def process_chunk(self, user_ids):
+                if self.progress['completed_chunks'] == 1:
+                    raise KeyboardInterrupt
+                return super().process_chunk(user_ids)
+
+        with self.assertRaises(KeyboardInterrupt):
+            InterruptedEraser(input_filename, erase_users.ERASE, chunk_size=1).run()
+        self.assertEqual(0, self.count_rows('projects_user', 'id', self.delia_id))
+        self.assertEqual(1, self.count_rows('projects_user', 'id', self.glenda_id))
+
+        eraser = erase_users.UserEraser(input_filename, erase_users.ERASE, chunk_size=1)
+        self.assertEqual(1, eraser.progress['completed_chunks'])
+        progress = eraser.run()
+        self.assertEqual(2, progress['completed_chunks'])
+        self.assertEqual(2, progress['rows_affected']['user'])
+        self.assertEqual(8, progress['rows_affected']['userproject'])
+        self.assertEqual(0, self.count_rows('projects_user', 'id', self.glenda_id))
+
+        with self.assertRaises(ValueError):
+            erase_users.UserEraser(input_filename, erase_users.ANONYMISE, chunk_size=1)
+
+
 class TestAdminTasks(test_utils.BaseTestCase):
     def test_05_convert_qualtrics_responses_to_contact_list_import_format_ok(self):
         expected_ids = [
@@ -43,6 +43,8 @@ class DbTestCase(BaseTestCase):
         # os.environ['TEST_ON_AWS'] = str(TEST_ON_AWS)
         super().setUpClass()
         cls.clear_test_data()
+        # test data is reloaded, so lookups that found nothing in earlier test classes must not be trusted
+        user.negative_cache.clear()
         delete_all_notifications()
         pg_utils.insert_data_from_csv_multiple(
             (os.path.join(TEST_DATA_FOLDER, 'usergroup_data.csv'), 'public.projects_usergroup'),
@@ -24,6 +24,7 @@ from http import HTTPStatus
 from thiscovery_lib.dynamodb_utilities import Dynamodb
 
 import api.endpoints.notification_process as np
+from api.endpoints.common.entity_update import EntityUpdate
 import thiscovery_lib.notifications as notific
 import thiscovery_lib.notification_send as notific_send
 import thiscovery_lib.utilities as utils
@@ -182,6 +183,8 @@ class TestNotifications(test_utils.DbTestCase):
         number_of_updated_rows_in_db, marking_result = np.process_user_registration(notification)
         self.assertGreaterEqual(1, number_of_updated_rows_in_db)
         self.assertEqual(HTTPStatus.OK, marking_result['ResponseMetadata']['HTTPStatusCode'])
+        # saving the crm id is not audited
+        self.assertEqual([], EntityUpdate.get_entity_updates_for_entity('user', TEST_USER_03_JSON['id'], utils.new_correlation_id()))
         # now check that notification contents are still the same
         updated_notification = get_notifications()[0]
         self.assertEqual(notification['details'], updated_notification['details'])
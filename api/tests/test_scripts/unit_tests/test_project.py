@@ -19,7 +19,9 @@ import testing_utilities as test_utils  # this should be the first import; it se
 import json
 from http import HTTPStatus
 from thiscovery_dev_tools.testing_tools import test_get
+import thiscovery_lib.utilities as utils
 
+import api.endpoints.common.pg_utilities as pg_utils
 import api.endpoints.project as p
 
 
@@ -904,3 +906,39 @@ class TestProject(test_utils.DbTestCase):
     def test_4_get_project_api_planned_not_returned(self):
         self.get_project_api_assertions("6b95e66d-1ff8-453a-88ce-ae0dc4b21df9", expected_status=HTTPStatus.NOT_FOUND, correlation_id_in_result=True,
                                         expected_message='project is planned or does not exist')
+
+    def test_5_project_task_audience_matches_project_status_for_user(self):
+        user_ids = [x['id'] for x in pg_utils.execute_query('SELECT id FROM public.projects_user', None)]
+        expected = dict()
+        for user_id in user_ids:
+            for project in p.get_project_status_for_user(user_id, demo=False, correlation_id=None):
+                for task in project['tasks']:
+                    task_expected = expected.setdefault(task['id'], {'visible': set(), 'signup_available': set(), 'signedup': set()})
+                    if task['task_is_visible']:
+                        task_expected['visible'].add(user_id)
+                    if task['signup_available']:
+                        task_expected['signup_available'].add(user_id)
+                    if task['user_is_signedup']:
+                        task_expected['signedup'].add(user_id)
+
+        self.assertTrue(expected)
+        for project_task_id, task_expected in expected.items():
+            audience = p.get_project_task_audience(project_task_id)
+            self.assertEqual(task_expected['visible'], set(audience['visible_user_ids']), project_task_id)
+            self.assertEqual(task_expected['signup_available'], set(audience['signup_available_user_ids']), project_task_id)
+            self.assertEqual(task_expected['signedup'], set(audience['signedup_user_ids']), project_task_id)
+
+    def test_6_project_task_audience_not_exists(self):
+        with self.assertRaises(utils.ObjectDoesNotExistError):
+            p.get_project_task_audience('0c137d9d-e087-448b-ba8d-24141b6ceece')
+
+    def test_7_list_projects_api_paginated(self):
+        expected_body = json.loads(test_get(p.list_projects_api, f'v1/{ENTITY_BASE_URL}', None, None, None)['body'])
+        result = test_get(p.list_projects_api, f'v1/{ENTITY_BASE_URL}', None, {'page_size': '5'}, None)
+        first_page = json.loads(result['body'])
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        self.assertEqual(expected_body[:5], first_page['items'])
+        self.assertIsNotNone(first_page['next'])
+        result = test_get(p.list_projects_api, f'v1/{ENTITY_BASE_URL}', None, {'page_size': '5', 'cursor': first_page['next']}, None)
+        second_page = json.loads(result['body'])
+        self.assertEqual(expected_body[5:10], second_page['items'])
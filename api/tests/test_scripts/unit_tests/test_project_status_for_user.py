@@ -21,9 +21,13 @@ from http import HTTPStatus
 from pprint import pprint
 from thiscovery_dev_tools.testing_tools import test_get
 
+import api.endpoints.common.pg_utilities as pg_utils
 import api.endpoints.user as u
 from api.local.dev_config import UNIT_TEST_NAMESPACE
-from api.endpoints.project import get_project_status_for_user_api  # , get_project_status_for_external_user_api
+import api.endpoints.common.project_catalogue as project_catalogue
+from api.endpoints.project import get_project_status_for_user_api, ProjectStatusForUser, get_cached_project_status_for_user, \
+    warm_project_status_for_user, get_project_status_version, get_project_status_changes_for_user, \
+    delete_cached_project_status  # , get_project_status_for_external_user_api
 
 
 TEST_SQL_FOLDER = '../test_sql/'
@@ -851,3 +855,291 @@ class TestGetProjectStatusForUserFunction(test_utils.DbTestCase):
                 if expected_fields:
                     for k, v in expected_fields.items():
                         self.assertEqual(v, task[k])
+
+    def test_response_includes_etag(self):
+        result = test_get(
+            get_project_status_for_user_api,
+            f'v1/{ENTITY_BASE_URL}',
+            querystring_parameters={
+                'user_id': self.user_id
+            }
+        )
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        self.assertIn('ETag', result['headers'])
+
+    def test_if_none_match_returns_not_modified(self):
+        querystring_parameters = {
+            'user_id': self.user_id
+        }
+        first_result = test_get(get_project_status_for_user_api, f'v1/{ENTITY_BASE_URL}', querystring_parameters=querystring_parameters)
+        etag = first_result['headers']['ETag']
+        event = {
+            'queryStringParameters': querystring_parameters,
+            'headers': {'If-None-Match': etag},
+        }
+        second_result = get_project_status_for_user_api(event, None)
+        self.assertEqual(HTTPStatus.NOT_MODIFIED, second_result['statusCode'])
+        self.assertEqual(etag, second_result['headers']['ETag'])
+        self.assertIsNone(second_result.get('body'))
+
+    def test_if_none_match_with_stale_etag_returns_full_document(self):
+        event = {
+            'queryStringParameters': {'user_id': self.user_id},
+            'headers': {'If-None-Match': '"stale-etag"'},
+        }
+        result = get_project_status_for_user_api(event, None)
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        self.assertNotEqual('"stale-etag"', result['headers']['ETag'])
+        self.assertIsInstance(json.loads(result['body']), list)
+
+    def test_version_changes_when_referenced_catalogue_tables_change(self):
+        for table in ['projects_externalsystem', 'projects_tasktype', 'projects_usergroup']:
+            version = get_project_status_version(self.user_id, demo=False)
+            pg_utils.execute_non_query(
+                f'UPDATE public.{table} SET modified = now() WHERE id = (SELECT id FROM public.{table} LIMIT 1)', None, None
+            )
+            new_version = get_project_status_version(self.user_id, demo=False)
+            self.assertNotEqual(version.catalogue_version, new_version.catalogue_version, table)
+            self.assertNotEqual(version.token, new_version.token, table)
+
+    def test_catalogue_reloaded_when_task_type_changes(self):
+        ProjectStatusForUser(user_id=self.user_id).main()
+        update_sql = "UPDATE public.projects_tasktype SET name = name || %s, modified = now()"
+        pg_utils.execute_non_query(update_sql, (' (renamed)',), None)
+        try:
+            task_type_names = [t['task_type_name'] for p in ProjectStatusForUser(user_id=self.user_id).main() for t in p['tasks']]
+            self.assertTrue([x for x in task_type_names if x is not None])
+            for name in task_type_names:
+                if name is not None:
+                    self.assertTrue(name.endswith(' (renamed)'), name)
+        finally:
+            pg_utils.execute_non_query(
+                "UPDATE public.projects_tasktype SET name = left(name, length(name) - length(%s)), modified = now()", (' (renamed)',), None
+            )
+
+    def test_rendered_document_matches_serialised_document(self):
+        psfu = ProjectStatusForUser(user_id=self.user_id)
+        self.assertEqual(json.dumps(psfu.main()), psfu.render())
+
+    def test_catalogue_not_modified_by_user_specific_fields(self):
+        psfu = ProjectStatusForUser(user_id=self.user_id)
+        psfu.main()
+        for project in psfu.catalogue.projects:
+            self.assertNotIn('project_is_visible', project.data)
+            for task in project.tasks:
+                for field in project_catalogue.TASK_USER_FIELDS:
+                    self.assertNotIn(field, task.data)
+
+    def test_catalogue_loaded_from_snapshot_matches_database(self):
+        project_catalogue.clear_catalogue_cache()
+        psfu_from_db = ProjectStatusForUser(user_id=self.user_id)
+        project_catalogue.clear_catalogue_cache()
+        psfu_from_snapshot = ProjectStatusForUser(user_id=self.user_id)
+        self.assertIsInstance(psfu_from_snapshot.catalogue.projects, project_catalogue.SnapshotProjects)
+        self.assertEqual(psfu_from_db.render(), psfu_from_snapshot.render())
+
+    def test_warmed_document_served_from_cache(self):
+        version = warm_project_status_for_user(self.user_id)
+        cached_document = get_cached_project_status_for_user(self.user_id, version)
+        self.assertEqual(ProjectStatusForUser(user_id=self.user_id).render(), cached_document)
+        result = test_get(get_project_status_for_user_api, f'v1/{ENTITY_BASE_URL}', querystring_parameters={'user_id': self.user_id})
+        self.assertEqual(cached_document, result['body'])
+
+    def test_cached_document_only_looked_up_once_warmed(self):
+        warm_project_status_for_user(self.user_id)
+        self.assertTrue(get_project_status_version(self.user_id, demo=False).warmed)
+        delete_cached_project_status([self.user_id])
+        version = get_project_status_version(self.user_id, demo=False)
+        self.assertFalse(version.warmed)
+        self.assertIsNone(get_cached_project_status_for_user(self.user_id, version))
+
+    def test_changes_since_current_version_are_empty(self):
+        first_result = test_get(get_project_status_for_user_api, f'v1/{ENTITY_BASE_URL}', querystring_parameters={'user_id': self.user_id})
+        token = first_result['headers']['ETag'].strip('"')
+        result = test_get(
+            get_project_status_for_user_api,
+            f'v1/{ENTITY_BASE_URL}',
+            querystring_parameters={
+                'user_id': self.user_id,
+                'since': token,
+            }
+        )
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        expected_body = {
+            'version': token,
+            'full': False,
+            'added': [],
+            'changed': [],
+            'removed': {'projects': [], 'tasks': []},
+        }
+        self.assertEqual(expected_body, json.loads(result['body']))
+
+    def test_changes_since_invalid_token(self):
+        result = test_get(
+            get_project_status_for_user_api,
+            f'v1/{ENTITY_BASE_URL}',
+            querystring_parameters={
+                'user_id': self.user_id,
+                'since': 'not-a-valid-token',
+            }
+        )
+        self.assertEqual(HTTPStatus.BAD_REQUEST, result['statusCode'])
+
+    def test_fields_and_visible_only(self):
+        full_result = test_get(get_project_status_for_user_api, f'v1/{ENTITY_BASE_URL}', querystring_parameters={'user_id': self.user_id})
+        expected_body = list()
+        for project in json.loads(full_result['body']):
+            if project['project_is_visible']:
+                expected_body.append({
+                    'id': project['id'],
+                    'tasks': [{'id': t['id'], 'url': t['url']} for t in project['tasks'] if t['task_is_visible']],
+                })
+        result = test_get(
+            get_project_status_for_user_api,
+            f'v1/{ENTITY_BASE_URL}',
+            querystring_parameters={
+                'user_id': self.user_id,
+                'fields': 'id,tasks.id,tasks.url',
+                'visible_only': 'true',
+            }
+        )
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        self.assertEqual(expected_body, json.loads(result['body']))
+
+    def test_projected_document_has_its_own_etag(self):
+        full_result = test_get(get_project_status_for_user_api, f'v1/{ENTITY_BASE_URL}', querystring_parameters={'user_id': self.user_id})
+        full_etag = full_result['headers']['ETag']
+        querystring_parameters = {
+            'user_id': self.user_id,
+            'fields': 'id,tasks.id,tasks.url',
+            'visible_only': 'true',
+        }
+        event = {
+            'queryStringParameters': querystring_parameters,
+            'headers': {'If-None-Match': full_etag},
+        }
+        projected_result = get_project_status_for_user_api(event, None)
+        self.assertEqual(HTTPStatus.OK, projected_result['statusCode'])
+        projected_etag = projected_result['headers']['ETag']
+        self.assertNotEqual(full_etag, projected_etag)
+
+        # the same projection requested with fields in a different order is the same representation
+        event = {
+            'queryStringParameters': {**querystring_parameters, 'fields': 'tasks.url,id,tasks.id'},
+            'headers': {'If-None-Match': projected_etag},
+        }
+        result = get_project_status_for_user_api(event, None)
+        self.assertEqual(HTTPStatus.NOT_MODIFIED, result['statusCode'])
+        self.assertEqual(projected_etag, result['headers']['ETag'])
+
+        # a projected ETag identifies the version of the document, so it can be used as a since token
+        result = test_get(
+            get_project_status_for_user_api,
+            f'v1/{ENTITY_BASE_URL}',
+            querystring_parameters={'user_id': self.user_id, 'since': projected_etag.strip('"')},
+        )
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        self.assertEqual(full_etag.strip('"'), json.loads(result['body'])['version'])
+
+    def test_delta_has_its_own_etag(self):
+        full_result = test_get(get_project_status_for_user_api, f'v1/{ENTITY_BASE_URL}', querystring_parameters={'user_id': self.user_id})
+        full_etag = full_result['headers']['ETag']
+        event = {
+            'queryStringParameters': {'user_id': self.user_id, 'since': full_etag.strip('"')},
+            'headers': {'If-None-Match': full_etag},
+        }
+        delta_result = get_project_status_for_user_api(event, None)
+        self.assertEqual(HTTPStatus.OK, delta_result['statusCode'])
+        delta_etag = delta_result['headers']['ETag']
+        self.assertNotEqual(full_etag, delta_etag)
+        event['headers'] = {'If-None-Match': delta_etag}
+        self.assertEqual(HTTPStatus.NOT_MODIFIED, get_project_status_for_user_api(event, None)['statusCode'])
+
+    def test_projected_render_matches_projected_document(self):
+        psfu = ProjectStatusForUser(user_id=self.user_id)
+        projection = project_catalogue.Projection.from_query_parameter('name,project_is_visible,tasks.status,tasks.user_task_status')
+        self.assertEqual(json.dumps(psfu.main(projection, visible_only=True)), psfu.render(projection, visible_only=True))
+
+    def test_invalid_fields(self):
+        result = test_get(
+            get_project_status_for_user_api,
+            f'v1/{ENTITY_BASE_URL}',
+            querystring_parameters={
+                'user_id': self.user_id,
+                'fields': 'id,tasks.not_a_field',
+            }
+        )
+        self.assertEqual(HTTPStatus.BAD_REQUEST, result['statusCode'])
+
+
+class TestProjectStatusChanges(test_utils.DbTestCase):
+    user_id = '35224bd5-f8a8-41f6-8502-f96e12d6ddde'  # delia
+    project_id = '11220597-137d-4452-888d-053f27a78355'  # PSFU-02-pub-tst-ngrp
+    project_task_id = '23bdd325-e296-47b3-a38b-8353bac3a984'  # PSFU-02-A
+
+    def get_token(self):
+        return get_project_status_version(self.user_id, demo=False).token
+
+    def get_changes(self, since):
+        return get_project_status_changes_for_user(self.user_id, demo=False, since=since)
+
+    def test_01_added_project(self):
+        since = self.get_token()
+        new_project_id = 'c9c6e45e-5d8f-4b43-8e47-2a8d2f6b0a01'
+        pg_utils.execute_non_query(
+            """
+            INSERT INTO public.projects_project
+            SELECT (jsonb_populate_record(
+                NULL::public.projects_project,
+                to_jsonb(p) || jsonb_build_object('id', %s::uuid, 'created', now(), 'modified', now())
+            )).*
+            FROM public.projects_project p
+            WHERE id = %s
+            """,
+            (new_project_id, self.project_id),
+            None,
+        )
+        delta = self.get_changes(since)
+        self.assertFalse(delta['full'])
+        self.assertEqual(self.get_token(), delta['version'])
+        self.assertEqual([new_project_id], [x['id'] for x in delta['added']])
+        self.assertEqual([], delta['changed'])
+        self.assertEqual({'projects': [], 'tasks': []}, delta['removed'])
+
+    def test_02_changed_task(self):
+        since = self.get_token()
+        pg_utils.execute_non_query(
+            'UPDATE public.projects_projecttask SET description = %s, modified = now() WHERE id = %s',
+            ('Updated task description', self.project_task_id),
+            None,
+        )
+        delta = self.get_changes(since)
+        self.assertFalse(delta['full'])
+        self.assertEqual([], delta['added'])
+        self.assertEqual([self.project_id], [x['id'] for x in delta['changed']])
+        changed_tasks = delta['changed'][0]['tasks']
+        self.assertEqual([self.project_task_id], [x['id'] for x in changed_tasks])
+        self.assertEqual('Updated task description', changed_tasks[0]['description'])
+        self.assertEqual({'projects': [], 'tasks': []}, delta['removed'])
+
+    def test_03_removed_task(self):
+        since = self.get_token()
+        pg_utils.execute_non_query(
+            "UPDATE public.projects_projecttask SET status = 'planned', modified = now() WHERE id = %s", (self.project_task_id,), None
+        )
+        delta = self.get_changes(since)
+        self.assertFalse(delta['full'])
+        self.assertEqual([], delta['added'])
+        self.assertEqual([self.project_id], [x['id'] for x in delta['changed']])
+        self.assertEqual([], delta['changed'][0]['tasks'])
+        self.assertEqual({'projects': [], 'tasks': [self.project_task_id]}, delta['removed'])
+
+    def test_04_deleted_rows_return_full_document(self):
+        since = self.get_token()
+        pg_utils.execute_non_query(
+            'DELETE FROM public.projects_usergroupmembership WHERE id = %s', ('088dc7a8-91bf-4b76-ae3f-53a44dffec78',), None
+        )
+        delta = self.get_changes(since)
+        self.assertTrue(delta['full'])
+        self.assertEqual(self.get_token(), delta['version'])
+        self.assertEqual(ProjectStatusForUser(user_id=self.user_id).main(), delta['projects'])
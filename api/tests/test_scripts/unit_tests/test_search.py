@@ -0,0 +1,75 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+import testing_utilities as test_utils  # this should be the first import; it sets env variables
+import json
+from http import HTTPStatus
+from thiscovery_dev_tools.testing_tools import test_get
+
+import api.endpoints.search as s
+from api.endpoints.search import search_api
+
+ENTITY_BASE_URL = 'v1/search'
+
+
+class TestSearch(test_utils.DbTestCase):
+
+    def test_01_prefix_tsquery(self):
+        self.assertEqual('psfu:* & pub:*', s.prefix_tsquery(' PSFU-pub '))
+        self.assertEqual("o:* & brien:*", s.prefix_tsquery("o'brien & | !"))
+        self.assertIsNone(s.prefix_tsquery(' &:* '))
+
+    def test_02_search_projects_ok(self):
+        result = test_get(search_api, ENTITY_BASE_URL, querystring_parameters={'type': 'projects', 'q': 'PSFU-03', 'limit': '5'})
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        result_json = json.loads(result['body'])
+        self.assertLessEqual(len(result_json), 5)
+        self.assertEqual('a099d03b-11e3-424c-9e97-d1c095f9823b', result_json[0]['id'])
+        self.assertEqual(sorted(result_json, key=lambda x: x['rank'], reverse=True), result_json)
+
+    def test_03_search_project_tasks_ok(self):
+        result = test_get(search_api, ENTITY_BASE_URL, querystring_parameters={'type': 'tasks', 'q': 'PSFU-01-A'})
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        result_json = json.loads(result['body'])
+        self.assertEqual('84b37547-40d5-4843-97e7-d1666e02d522', result_json[0]['id'])
+        self.assertEqual('6b95e66d-1ff8-453a-88ce-ae0dc4b21df9', result_json[0]['project_id'])
+
+    def test_04_search_users_by_name_prefix(self):
+        result = test_get(search_api, ENTITY_BASE_URL, querystring_parameters={'type': 'users', 'q': 'alth'})
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        result_json = json.loads(result['body'])
+        self.assertIn('d1070e81-557e-40eb-a7ba-b951ddb7ebdc', [x['id'] for x in result_json])
+
+    def test_05_search_users_by_email(self):
+        result = s.search('users', 'altha@email.co.uk')
+        self.assertEqual('d1070e81-557e-40eb-a7ba-b951ddb7ebdc', result[0]['id'])
+
+    def test_06_search_no_results(self):
+        result = test_get(search_api, ENTITY_BASE_URL, querystring_parameters={'type': 'projects', 'q': 'zzzqqqxxx'})
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        self.assertEqual([], json.loads(result['body']))
+
+    def test_07_search_invalid_parameters(self):
+        for parameters in [
+            {'type': 'widgets', 'q': 'PSFU'},
+            {'type': 'projects', 'q': '%%'},
+            {'type': 'projects'},
+            {'type': 'projects', 'q': 'PSFU', 'limit': '0'},
+            {'type': 'projects', 'q': 'PSFU', 'limit': str(s.MAX_LIMIT + 1)},
+        ]:
+            result = test_get(search_api, ENTITY_BASE_URL, querystring_parameters=parameters)
+            self.assertEqual(HTTPStatus.BAD_REQUEST, result['statusCode'], parameters)
@@ -16,10 +16,12 @@
 #   docs folder of this project.  It is also available www.gnu.org/licenses/
 #
 import testing_utilities as test_utils  # this should be the first import; it sets env variables
+import datetime
 import json
 import unittest
 from http import HTTPStatus
 
+import api.endpoints.common.pg_utilities as pg_utils
 import api.endpoints.notification_process as np
 import api.endpoints.user as u
 
@@ -604,3 +606,291 @@ class TestUser(test_utils.DbTestCase):
             self.assertEqual(expected_status, result_status)
             for flag in ['has_demo_project', 'has_live_project']:
                 self.assertEqual(expected_result[flag], result_json[flag])
+
+    def test_22_list_users_by_project_paginated(self):
+        project_id = '183c23a1-76a7-46c3-8277-501f0740939d'  # PSFU 7
+        expected_users = u.list_users_by_project(project_id)
+        users = list()
+        cursor = None
+        pages = 0
+        while True:
+            querystring_parameters = {'project_id': project_id, 'page_size': '2'}
+            if cursor:
+                querystring_parameters['cursor'] = cursor
+            result = test_get(
+                local_method=u.list_users_by_project_api,
+                aws_url='v1/list-project-users',
+                querystring_parameters=querystring_parameters,
+            )
+            self.assertEqual(HTTPStatus.OK, result['statusCode'])
+            page = json.loads(result['body'])
+            self.assertLessEqual(len(page['items']), 2)
+            users += page['items']
+            pages += 1
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(2, pages)
+        self.assertCountEqual(expected_users, users)
+
+    def test_23_list_users_by_project_invalid_cursor(self):
+        result = test_get(
+            local_method=u.list_users_by_project_api,
+            aws_url='v1/list-project-users',
+            querystring_parameters={'project_id': '183c23a1-76a7-46c3-8277-501f0740939d', 'cursor': 'not-a-cursor'},
+        )
+        self.assertEqual(HTTPStatus.BAD_REQUEST, result['statusCode'])
+
+    def test_24_user_project_flags_match_memberships(self):
+        expected_flags = pg_utils.execute_query('''
+            SELECT
+                u.id,
+                EXISTS (
+                    SELECT 1 FROM projects_usergroupmembership ugm
+                    JOIN projects_usergroup ug ON ug.id = ugm.user_group_id
+                    WHERE ugm.user_id = u.id AND ug.demo = TRUE
+                ) as has_demo_project,
+                EXISTS (
+                    SELECT 1 FROM projects_usergroupmembership ugm
+                    JOIN projects_usergroup ug ON ug.id = ugm.user_group_id
+                    WHERE ugm.user_id = u.id AND ug.demo = FALSE
+                ) as has_live_project
+            FROM public.projects_user u
+        ''', None, None)
+        for expected in expected_flags:
+            user = u.get_user_by_id(expected['id'], None)[0]
+            for flag in ['has_demo_project', 'has_live_project']:
+                self.assertEqual(expected[flag], user[flag], expected['id'])
+
+    def test_25_user_project_flags_follow_group_demo_flag(self):
+        user_id = '851f7b34-f76c-49de-a382-7e4089b744e2'  # bernie@email.co.uk; member of groups Testers (live) and D testers (demo)
+        group_id = '267621ea-bb00-4a35-8cc8-5feee6834626'  # D testers
+        update_sql = 'UPDATE public.projects_usergroup SET demo = %s WHERE id = %s'
+        pg_utils.execute_non_query(update_sql, (False, group_id), None)
+        try:
+            user = u.get_user_by_id(user_id, None)[0]
+            self.assertFalse(user['has_demo_project'])
+            self.assertTrue(user['has_live_project'])
+        finally:
+            pg_utils.execute_non_query(update_sql, (True, group_id), None)
+        user = u.get_user_by_id(user_id, None)[0]
+        self.assertTrue(user['has_demo_project'])
+        self.assertTrue(user['has_live_project'])
+
+    def test_26_get_users_by_identifiers_ok(self):
+        altha_id = 'd1070e81-557e-40eb-a7ba-b951ddb7ebdc'
+        eddie_id = '1cbe9aad-b29f-46b5-920e-b4c496d42515'
+        unknown_id = '7da7a740-f6b0-4177-809b-5e2852605ff2'
+        for identifier_type, identifiers in [
+            ('user_id', [altha_id, eddie_id, unknown_id]),
+            ('email', ['Altha@email.co.uk', 'eddie@email.co.uk', 'nobody@email.co.uk']),
+            ('anon_project_specific_user_id', ['2c8bba57-58a9-4ac7-98e8-beb34f0692c1', '1406c523-6d12-4510-a745-271ddd9ad3e2', unknown_id]),
+        ]:
+            result = u.get_users_by_identifiers(identifier_type, identifiers)
+            self.assertEqual([altha_id, eddie_id], [x['id'] for x in result['found'].values()])
+            self.assertEqual(1, len(result['not_found']))
+            self.assertEqual(u.get_user_by_id(altha_id)[0], list(result['found'].values())[0])
+
+    def test_27_get_users_by_identifiers_api(self):
+        body = {
+            'identifier_type': 'any_anon_id',
+            'identifiers': ['2c8bba57-58a9-4ac7-98e8-beb34f0692c1', '7da7a740-f6b0-4177-809b-5e2852605ff2'],
+        }
+        result = test_post(u.get_users_by_identifiers_api, 'v1/user-lookup', request_body=json.dumps(body))
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        result_json = json.loads(result['body'])
+        self.assertEqual('d1070e81-557e-40eb-a7ba-b951ddb7ebdc', result_json['found']['2c8bba57-58a9-4ac7-98e8-beb34f0692c1']['id'])
+        self.assertEqual(['7da7a740-f6b0-4177-809b-5e2852605ff2'], result_json['not_found'])
+
+    def test_28_get_users_by_identifiers_api_invalid_input(self):
+        for body in [
+            {'identifier_type': 'nickname', 'identifiers': ['altha']},
+            {'identifier_type': 'user_id', 'identifiers': ['not-a-uuid']},
+            {'identifier_type': 'user_id', 'identifiers': ['d1070e81-557e-40eb-a7ba-b951ddb7ebdc'] * (u.MAX_BULK_LOOKUP_IDENTIFIERS + 1)},
+            {'identifier_type': 'user_id'},
+        ]:
+            result = test_post(u.get_users_by_identifiers_api, 'v1/user-lookup', request_body=json.dumps(body))
+            self.assertEqual(HTTPStatus.BAD_REQUEST, result['statusCode'])
+
+    def test_29_user_record_to_dict_matches_json_output(self):
+        records = u.get_user_records(u.sql_q.BASE_USER_SELECT_SQL + ' WHERE u.id = %s', (EXPECTED_USER['id'],))
+        self.assertEqual(1, len(records))
+        self.assertEqual(EXPECTED_USER, records[0].to_dict())
+
+    def test_30_avatar_string(self):
+        for first_name, last_name, expected in [
+            ('Altha', 'Alcorn', 'AA'),
+            ('', 'Alcorn', 'Al'),
+            ('Altha', '', 'Al'),
+            (None, 'Alcorn', '??'),
+            ('Altha', None, '??'),
+        ]:
+            self.assertEqual(expected, u.avatar_string(first_name, last_name))
+            record = u.UserRecord(EXPECTED_USER['id'], None, None, None, None, first_name, last_name, 'GB')
+            self.assertEqual(expected, record.avatar_string)
+            self.assertEqual(expected, u.append_avatar({'first_name': first_name, 'last_name': last_name})['avatar_string'])
+
+    def test_31_patch_user_api_reverse_patch_only_includes_changed_values(self):
+        user_id = 'dceac123-03a7-4e29-ab5a-739e347b374d'  # fred@email.co.uk
+        user_jsonpatch = [
+            {'op': 'replace', 'path': '/first_name', 'value': 'Fred'},
+            {'op': 'replace', 'path': '/title', 'value': 'Dr'},
+        ]
+        result = test_patch(patch_user_api, ENTITY_BASE_URL, path_parameters={'id': user_id}, request_body=json.dumps(user_jsonpatch))
+        self.assertEqual(HTTPStatus.NO_CONTENT, result['statusCode'])
+
+        entity_updates = EntityUpdate.get_entity_updates_for_entity('user', user_id, new_correlation_id())
+        self.assertEqual(1, len(entity_updates))
+        self.assertEqual(user_jsonpatch, json.loads(entity_updates[0]['json_patch']))
+        self.assertEqual([{'op': 'replace', 'path': '/title', 'value': 'Mr'}], json.loads(entity_updates[0]['json_reverse_patch']))
+        self.assertEqual('Dr', u.get_user_by_id(user_id)[0]['title'])
+
+    def test_32_patch_user_api_user_not_exists_saves_no_entity_update(self):
+        user_id = 'd1070e81-557e-40eb-a7ba-b951ddb7ebdd'
+        user_jsonpatch = [{'op': 'replace', 'path': '/title', 'value': 'Sir'}]
+        result = test_patch(patch_user_api, ENTITY_BASE_URL, path_parameters={'id': user_id}, request_body=json.dumps(user_jsonpatch))
+        self.assertEqual(HTTPStatus.NOT_FOUND, result['statusCode'])
+        self.assertEqual([], EntityUpdate.get_entity_updates_for_entity('user', user_id, new_correlation_id()))
+
+    def test_33_patch_users_api(self):
+        clive_id = '8518c7ed-1df4-45e9-8dc4-d49b57ae0663'
+        glenda_id = 'e067ed7b-bc98-454f-9c5e-573e2da5705c'
+        unknown_id = '7da7a740-f6b0-4177-809b-5e2852605ff2'
+        user_patches = [
+            {'id': clive_id, 'jsonpatch': [
+                {'op': 'replace', 'path': '/status', 'value': 'registered'},
+                {'op': 'replace', 'path': '/crm_id', 'value': '1234'},
+            ]},
+            {'id': glenda_id, 'jsonpatch': [{'op': 'replace', 'path': '/title', 'value': 'Dr'}]},
+            {'id': unknown_id, 'jsonpatch': [{'op': 'replace', 'path': '/title', 'value': 'Dr'}]},
+            {'id': 'not-a-uuid', 'jsonpatch': [{'op': 'replace', 'path': '/title', 'value': 'Dr'}]},
+            {'id': clive_id, 'jsonpatch': [{'op': 'replace', 'path': '/non-existent-attribute', 'value': 'Dr'}]},
+            {'id': glenda_id, 'jsonpatch': [{'op': 'replace', 'path': '/title', 'value': 'Prof'}]},
+        ]
+        result = test_patch(u.patch_users_api, ENTITY_BASE_URL, request_body=json.dumps(user_patches))
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        self.assertEqual(
+            [HTTPStatus.NO_CONTENT, HTTPStatus.NO_CONTENT, HTTPStatus.NOT_FOUND, HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST],
+            [x['status'] for x in json.loads(result['body'])]
+        )
+
+        clive = u.get_user_by_id(clive_id)[0]
+        self.assertEqual(('registered', '1234'), (clive['status'], clive['crm_id']))
+        self.assertEqual('Dr', u.get_user_by_id(glenda_id)[0]['title'])
+        entity_updates = EntityUpdate.get_entity_updates_for_entity('user', glenda_id, new_correlation_id())
+        self.assertEqual(1, len(entity_updates))
+        self.assertEqual([{'op': 'replace', 'path': '/title', 'value': 'Ms'}], json.loads(entity_updates[0]['json_reverse_patch']))
+
+    def test_34_import_users_api(self):
+        new_user_id = '2b5a4cbb-e4a8-4d37-9ec2-2e5e4b26b6c3'
+        body = '\n'.join([
+            'id,email,title,first_name,last_name,country_code,status',
+            f'{new_user_id},Wilma@email.co.uk,Mrs,Wilma,Flintstone,GB,new',
+            ',delia@email.co.uk,,Delia,Duplicate,GB,new',
+            ',betty@email.co.uk,,Betty,Rubble,XX,new',
+            ',wilma@email.co.uk,,Wilma,Again,GB,new',
+            'not-a-uuid,barney@email.co.uk,,Barney,Rubble,GB,new',
+        ])
+        result = test_post(u.import_users_api, 'v1/user-import', querystring_parameters={'format': 'csv'}, request_body=body)
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        result_json = json.loads(result['body'])
+        self.assertEqual(1, result_json['created'])
+        self.assertEqual(
+            [
+                (1, HTTPStatus.CREATED, None),
+                (2, HTTPStatus.CONFLICT, 'user already exists'),
+                (3, HTTPStatus.BAD_REQUEST, 'invalid country_code'),
+                (4, HTTPStatus.BAD_REQUEST, 'duplicate email in import'),
+                (5, HTTPStatus.BAD_REQUEST, 'invalid id'),
+            ],
+            [(x['row'], x['status'], x.get('message')) for x in result_json['rows']]
+        )
+        new_user = u.get_user_by_id(new_user_id)[0]
+        self.assertEqual(('wilma@email.co.uk', 'Wilma', 'United Kingdom'), (new_user['email'], new_user['first_name'], new_user['country_name']))
+
+    def test_35_get_user_api_not_exists_is_cached_until_user_is_created(self):
+        user_id = 'f2b8a1c0-6a4d-4c1e-9d55-3b7e2f0c9a41'
+        user_email = 'fay@email.co.uk'
+        for _ in range(2):
+            result = test_get(get_user_by_id_api, ENTITY_BASE_URL, path_parameters={'id': user_id})
+            self.assertEqual(HTTPStatus.NOT_FOUND, result['statusCode'])
+            result = test_get(get_user_by_email_api, ENTITY_BASE_URL, querystring_parameters={'email': user_email})
+            self.assertEqual(HTTPStatus.NOT_FOUND, result['statusCode'])
+        self.assertTrue(u.negative_cache.is_known_missing(u.negative_cache.USER_ID, user_id))
+
+        user_json = {
+            "id": user_id,
+            "email": user_email,
+            "first_name": "Fay",
+            "last_name": "Flintstone",
+            "country_code": "GB",
+            "status": "new",
+        }
+        result = test_post(create_user_api, ENTITY_BASE_URL, request_body=json.dumps(user_json))
+        self.assertEqual(HTTPStatus.CREATED, result['statusCode'])
+
+        result = test_get(get_user_by_id_api, ENTITY_BASE_URL, path_parameters={'id': user_id})
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        result = test_get(get_user_by_email_api, ENTITY_BASE_URL, querystring_parameters={'email': user_email})
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+
+    def test_36_cached_miss_not_trusted_if_creations_cannot_be_checked(self):
+        user_id = '0c3e5f7a-2b4d-4e6f-8a1c-9d2b4f6a8c0e'
+        result = test_get(get_user_by_id_api, ENTITY_BASE_URL, path_parameters={'id': user_id})
+        self.assertEqual(HTTPStatus.NOT_FOUND, result['statusCode'])
+        self.assertTrue(u.negative_cache.is_known_missing(u.negative_cache.USER_ID, user_id))
+
+        def failing_l2_get(key, correlation_id):
+            raise RuntimeError('lookups table could not be read')
+
+        original_l2_get = u.negative_cache.shared_cache._l2_get
+        u.negative_cache.shared_cache._l2_get = failing_l2_get
+        try:
+            self.assertFalse(u.negative_cache.is_known_missing(u.negative_cache.USER_ID, user_id))
+        finally:
+            u.negative_cache.shared_cache._l2_get = original_l2_get
+
+    def test_37_import_users_api_missing_required_fields(self):
+        body = '\n'.join([
+            'email,first_name,last_name,country_code,status',
+            'pebbles@email.co.uk,Pebbles,Flintstone,GB,',
+            'bamm-bamm@email.co.uk,Bamm-Bamm,,GB,new',
+            'dino@email.co.uk,Dino,Flintstone,GB,new',
+        ])
+        result = test_post(u.import_users_api, 'v1/user-import', querystring_parameters={'format': 'csv'}, request_body=body)
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        result_json = json.loads(result['body'])
+        self.assertEqual(1, result_json['created'])
+        self.assertEqual(
+            [
+                (1, HTTPStatus.BAD_REQUEST, 'status is required'),
+                (2, HTTPStatus.BAD_REQUEST, 'last_name is required'),
+                (3, HTTPStatus.CREATED, None),
+            ],
+            [(x['row'], x['status'], x.get('message')) for x in result_json['rows']]
+        )
+
+    def test_38_user_record_timestamps_formatted_as_json_output(self):
+        for value, expected in [
+            (datetime.datetime(2018, 11, 6, 12, 48, 46, 462460, tzinfo=datetime.timezone.utc), '2018-11-06T12:48:46.46246+00:00'),
+            (datetime.datetime(2018, 11, 6, 12, 48, 46, 400000, tzinfo=datetime.timezone.utc), '2018-11-06T12:48:46.4+00:00'),
+            (datetime.datetime(2018, 11, 6, 12, 48, 46, tzinfo=datetime.timezone.utc), '2018-11-06T12:48:46+00:00'),
+        ]:
+            record = u.UserRecord(EXPECTED_USER['id'], value, value, None, None, 'Altha', 'Alcorn', 'GB')
+            record_dict = record.to_dict()
+            self.assertEqual(expected, record_dict['created'])
+            self.assertEqual(expected, record_dict['modified'])
+
+    def test_39_patch_users_api_rejected_item_does_not_fail_others(self):
+        altha_id = 'd1070e81-557e-40eb-a7ba-b951ddb7ebdc'
+        bernie_id = '851f7b34-f76c-49de-a382-7e4089b744e2'
+        user_patches = [
+            {'id': altha_id, 'jsonpatch': [{'op': 'replace', 'path': '/email_address_verified', 'value': None}]},
+            {'id': bernie_id, 'jsonpatch': [{'op': 'replace', 'path': '/title', 'value': 'Prof'}]},
+        ]
+        result = test_patch(u.patch_users_api, ENTITY_BASE_URL, request_body=json.dumps(user_patches))
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        self.assertEqual([HTTPStatus.CONFLICT, HTTPStatus.NO_CONTENT], [x['status'] for x in json.loads(result['body'])])
+        self.assertEqual('Prof', u.get_user_by_id(bernie_id)[0]['title'])
+        self.assertEqual([], EntityUpdate.get_entity_updates_for_entity('user', altha_id, new_correlation_id()))
+        self.assertEqual(1, len(EntityUpdate.get_entity_updates_for_entity('user', bernie_id, new_correlation_id())))
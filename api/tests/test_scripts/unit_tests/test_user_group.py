@@ -130,5 +130,15 @@ class TestUserGroup(test_utils.DbTestCase):
             # UserGroup.re()
             re(None)
 
+    def test_09_user_group_get_by_url_code_from_shared_cache(self):
+        import api.endpoints.common.shared_cache as shared_cache
+        from api.endpoints.user_group import UserGroup
+        url_code = "g2_code"
+        shared_cache.clear_l1()
+        ug_dict = UserGroup.get_by_url_code(url_code, None).to_dict()
+        shared_cache.clear_l1()
+        cached_ug_dict = UserGroup.get_by_url_code(url_code, None).to_dict()
+        self.assertDictEqual(ug_dict, cached_ug_dict)
+
 if __name__ == '__main__':
     pass
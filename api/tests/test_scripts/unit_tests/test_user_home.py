@@ -0,0 +1,48 @@
+#
+#   Thiscovery API - THIS Institute’s citizen science platform
+#   Copyright (C) 2019 THIS Institute
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   A copy of the GNU Affero General Public License is available in the
+#   docs folder of this project.  It is also available www.gnu.org/licenses/
+#
+import testing_utilities as test_utils  # this should be the first import; it sets env variables
+import json
+from http import HTTPStatus
+from thiscovery_dev_tools.testing_tools import test_get
+
+import api.endpoints.project as p
+import api.endpoints.user as u
+import api.endpoints.user_task as ut
+from api.endpoints.user_home import get_user_home_api
+
+ENTITY_BASE_URL = 'v1/user-home'
+
+
+class TestUserHome(test_utils.DbTestCase):
+    user_id = '35224bd5-f8a8-41f6-8502-f96e12d6ddde'
+
+    def test_01_user_home_matches_individual_endpoints(self):
+        result = test_get(get_user_home_api, ENTITY_BASE_URL, querystring_parameters={'user_id': self.user_id})
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        result_json = json.loads(result['body'])
+        self.assertEqual(u.get_user_by_id(self.user_id)[0], result_json['user'])
+        self.assertEqual(p.get_project_status_for_user(self.user_id, demo=False, correlation_id=None), result_json['project_status'])
+        self.assertEqual(ut.list_user_tasks_by_user(self.user_id), result_json['user_tasks'])
+
+    def test_02_user_home_nonexistent_user(self):
+        result = test_get(get_user_home_api, ENTITY_BASE_URL, querystring_parameters={'user_id': '760f4e4d-4a3b-4671-8ceb-129d81f9d9cb'})
+        self.assertEqual(HTTPStatus.NOT_FOUND, result['statusCode'])
+
+    def test_03_user_home_user_id_missing(self):
+        result = test_get(get_user_home_api, ENTITY_BASE_URL, querystring_parameters={})
+        self.assertEqual(HTTPStatus.BAD_REQUEST, result['statusCode'])
@@ -20,9 +20,12 @@ import json
 from http import HTTPStatus
 from pprint import pprint
 
+import api.endpoints.common.identity as idn
+import api.endpoints.common.task_urls as task_urls
 import api.endpoints.notification_process as np
 import api.endpoints.user_task as ut
 import thiscovery_dev_tools.testing_tools as test_tools
+import thiscovery_lib.utilities as utils
 
 from thiscovery_lib.dynamodb_utilities import Dynamodb
 from api.local.dev_config import UNIT_TEST_NAMESPACE
@@ -31,7 +34,7 @@ from thiscovery_lib.notifications import get_notifications, NotificationStatus,
     NotificationAttributes
 from api.endpoints.user import create_user_api
 from api.endpoints.user_task import list_user_tasks_api, create_user_task_api
-from api.endpoints.user_project import list_user_projects_api
+from api.endpoints.user_project import list_user_projects_api, list_user_projects
 from thiscovery_dev_tools.testing_tools import test_get, test_post
 
 TEST_SQL_FOLDER = '../test_sql/'
@@ -524,6 +527,77 @@ class TestUserTask(test_utils.DbTestCase):
                 container=url,
             )
 
+    def test_18_anon_user_task_id_resolves_to_user_and_user_task(self):
+        anon_user_task_id = USER_TASK_01_EXPECTED_BODY['anon_user_task_id']
+        expected_identity = idn.Identity(
+            kind=idn.USER_TASK,
+            user_id=USER_TASK_01_EXPECTED_BODY['user_id'],
+            user_project_id=USER_TASK_01_EXPECTED_BODY['user_project_id'],
+            user_task_id=USER_TASK_01_EXPECTED_BODY['user_task_id'],
+        )
+        self.assertEqual(expected_identity, idn.resolve(anon_user_task_id))
+        self.assertIsNone(idn.resolve(anon_user_task_id, kinds=(idn.USER_PROJECT,)))
+        self.assertEqual(USER_TASK_01_EXPECTED_BODY['user_task_id'], ut.anon_user_task_id_2_user_task_id(anon_user_task_id))
+        self.assertEqual(USER_TASK_01_EXPECTED_BODY['user_id'], ut.anon_user_task_id_2_user_id(anon_user_task_id))
+
+    def test_19_anon_user_task_id_not_exists(self):
+        with self.assertRaises(utils.ObjectDoesNotExistError):
+            ut.anon_user_task_id_2_user_id('4f9a9e1e-4b0b-4a3c-9c1e-2a9f2a2d3d3c')
+
+    def test_20_create_user_tasks_api(self):
+        project_task_id = '6cf2f34e-e73f-40b1-99a1-d06c1f24381a'
+        delia_id = '35224bd5-f8a8-41f6-8502-f96e12d6ddde'
+        eddie_id = '1cbe9aad-b29f-46b5-920e-b4c496d42515'
+        body = json.dumps({
+            'user_ids': [
+                delia_id,
+                'd1070e81-557e-40eb-a7ba-b951ddb7ebdc',  # altha, already signed up
+                '0b4a2e43-54f6-4d8e-8e61-0a4d2b6b4c0d',  # does not exist
+                'not-a-uuid',
+                eddie_id,
+                delia_id,
+            ],
+            'project_task_id': project_task_id,
+            'consented': '2018-06-12 16:16:56.087895+01',
+        })
+        result = test_post(ut.create_user_tasks_api, 'v1/usertask-batch', None, body, None)
+        self.assertEqual(HTTPStatus.OK, result['statusCode'])
+        result_json = json.loads(result['body'])
+        self.assertEqual(
+            [
+                HTTPStatus.CREATED,
+                HTTPStatus.CONFLICT,
+                HTTPStatus.NOT_FOUND,
+                HTTPStatus.BAD_REQUEST,
+                HTTPStatus.CREATED,
+                HTTPStatus.BAD_REQUEST,
+            ],
+            [x['status'] for x in result_json]
+        )
+        self.assertIn('&first_name=Delia', result_json[0]['user_task']['url'])
+        for user_id in [delia_id, eddie_id]:
+            self.assertIn(project_task_id, [x['project_task_id'] for x in ut.list_user_tasks_by_user(user_id)])
+
+    def test_21_anon_ids_not_cached_if_deletions_cannot_be_checked(self):
+        anon_user_task_id = USER_TASK_01_EXPECTED_BODY['anon_user_task_id']
+        user_task_id = USER_TASK_01_EXPECTED_BODY['user_task_id']
+        idn.clear_cache()
+        self.assertEqual(user_task_id, idn.resolve(anon_user_task_id).user_task_id)
+        self.assertIsNotNone(idn._cache_get(anon_user_task_id))
+
+        def failing_l2_get(key, correlation_id):
+            raise RuntimeError('lookups table could not be read')
+
+        original_l2_get = idn.shared_cache._l2_get
+        idn.shared_cache._l2_get = failing_l2_get
+        idn._generation['checked_at'] = None  # skip the wait for the next generation check
+        try:
+            self.assertEqual(user_task_id, idn.resolve(anon_user_task_id).user_task_id)
+            self.assertIsNone(idn._cache_get(anon_user_task_id))
+        finally:
+            idn.shared_cache._l2_get = original_l2_get
+            idn.clear_cache()
+
 
 class TestUserTaskSpecificUrl(test_utils.DbTestCase):
     delete_notifications = True
@@ -589,3 +663,66 @@ class TestUserTaskSpecificUrl(test_utils.DbTestCase):
         project_task_id = "f60d5204-57c1-437f-a085-1943ad9d174f"
         deleted_row_count = ut.clear_user_tasks_for_project_task_id(project_task_id)
         self.assertEqual(2, deleted_row_count)
+
+    def test_16_create_user_task_api_specific_url_not_found_rolls_back_user_project(self):
+        user_id = "1cbe9aad-b29f-46b5-920e-b4c496d42515"  # no user specific url in Dynamodb
+        project_id = '3ffc498f-8add-4448-b452-4fc7f463aa21'
+        ut_json = {
+            'user_id': user_id,
+            'project_task_id': '4ee70544-6797-4e21-8cec-5653c8d5b234',
+            'consented': '2018-07-19 16:16:56.087895+01',
+        }
+        result = test_post(create_user_task_api, ENTITY_BASE_URL, None, json.dumps(ut_json), None)
+        self.assertEqual(HTTPStatus.NOT_FOUND, result['statusCode'])
+        self.assertIn('User specific url not found', json.loads(result['body'])['message'])
+        self.assertNotIn(project_id, [x['project_id'] for x in list_user_projects(user_id, None)])
+
+
+class TestTaskUrls(test_utils.BaseTestCase):
+    base_url = 'https://www.qualtrics.com?survey=1234'
+    external_task_id = '8e368360-a708-4336-8feb-a8903fde0210'
+    project_task_id = '6cf2f34e-e73f-40b1-99a1-d06c1f24381a'
+    values = {
+        'user_id': '8518c7ed-1df4-45e9-8dc4-d49b57ae0663',
+        'first_name': 'Clive',
+        'last_name': 'Cantor',
+        'email': 'clive@email.co.uk',
+        'user_task_id': '9620089b-e9a4-46fd-bb78-091c8449d777',
+        'anon_project_specific_user_id': '82ca200e-66d6-455d-95bc-617f974bcb26',
+        'anon_user_task_id': '47e98896-33b4-4401-b667-da95db9122a2',
+    }
+
+    def setUp(self):
+        task_urls.compile_task_url.cache_clear()
+
+    def check_template_matches_url_helpers(self, anonymise_url, interview):
+        template = task_urls.compile_task_url(self.base_url, anonymise_url, interview, self.external_task_id, self.project_task_id)
+        self.assertIsInstance(template, task_urls.TaskUrlTemplate)
+        for values in [self.values, task_urls.SAMPLE_VALUES]:
+            expected_url = task_urls._build_url(self.base_url, anonymise_url, interview, self.external_task_id, self.project_task_id, values)
+            self.assertEqual(expected_url, template.render(values))
+
+    def test_01_template_matches_url_helpers(self):
+        self.check_template_matches_url_helpers(anonymise_url=False, interview=False)
+
+    def test_02_anonymised_template_matches_url_helpers(self):
+        self.check_template_matches_url_helpers(anonymise_url=True, interview=False)
+
+    def test_03_interview_template_matches_url_helpers(self):
+        self.check_template_matches_url_helpers(anonymise_url=False, interview=True)
+
+    def test_04_falls_back_to_url_helpers_if_template_does_not_match(self):
+        build_url = task_urls._build_url
+
+        def build_url_encoding_names(base_url, anonymise_url, interview, external_task_id, project_task_id, values):
+            values = {**values, 'first_name': values['first_name'].replace(' ', '+')}
+            return build_url(base_url, anonymise_url, interview, external_task_id, project_task_id, values)
+
+        task_urls._build_url = build_url_encoding_names
+        try:
+            template = task_urls.compile_task_url(self.base_url, False, False, self.external_task_id, self.project_task_id)
+            self.assertIsInstance(template, task_urls.UncompiledTaskUrl)
+            values = {**self.values, 'first_name': 'Mary Ann'}
+            self.assertIn('first_name=Mary+Ann', template.render(values))
+        finally:
+            task_urls._build_url = build_url